@@ -0,0 +1,153 @@
+"""
+Dashboard load test for the /api/steam/* endpoints
+
+A snapshot (and some history) for N synthetic games is written to a temp
+data dir, the dashboard is started in a separate process on a threaded
+werkzeug server with STEAM_DATA_DIR pointing at it, and `concurrency`
+client threads hammer each endpoint for `duration` seconds. Clients send
+Accept-Encoding: gzip like a browser does.
+
+The clients run in this process under the GIL, so for small responses the
+reported RPS is a lower bound on what the server can do.
+"""
+import logging
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import requests
+
+from stub_steam import app_details
+
+from change_log import ChangeTracker
+from snapshot import SnapshotWriter
+from steam_producer import extract_game_data
+from timeseries import TimeSeriesStore
+
+FIRST_APP_ID = 10
+
+
+def write_dataset(data_dir: Path, size: int, cycles: int = 3) -> Dict[str, Any]:
+    """Snapshot with `size` games after `cycles` updates, plus matching history"""
+    writer = SnapshotWriter(data_dir)
+    changes = ChangeTracker()
+    history = TimeSeriesStore(data_dir / "history")
+    now = int(time.time())
+    snapshot: Dict[str, Any] = {}
+    for tick in range(cycles):
+        games = []
+        for app_id in range(FIRST_APP_ID, FIRST_APP_ID + size):
+            details = app_details(app_id, payload_bytes=64, tick=tick, price_period=1)
+            games.append(extract_game_data(app_id, details, (app_id * 37 + tick * 11) % 200000))
+        published, _, _ = changes.apply(games)
+        ts = now - (cycles - tick) * 300
+        snapshot = writer.write(published, dict(changes.snapshot_fields(), updated_at=ts))
+        history.append(games, ts)
+    history.flush()
+    return snapshot
+
+
+def _serve(data_dir: str, port: int):
+    os.environ["STEAM_DATA_DIR"] = data_dir
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no per-request access log
+    from werkzeug.serving import make_server
+    from dashboard.app import create_app
+    make_server("127.0.0.1", port, create_app(), threaded=True).serve_forever()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def load_test(url: str, duration: float, concurrency: int) -> Dict[str, Any]:
+    latencies: List[List[float]] = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    sizes = [0] * concurrency
+    deadline = time.perf_counter() + duration
+
+    def worker(i: int):
+        session = requests.Session()
+        session.headers["Accept-Encoding"] = "gzip"
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = session.get(url, timeout=30)
+                response.content
+            except requests.RequestException:
+                errors[i] += 1
+                continue
+            latencies[i].append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors[i] += 1
+            sizes[i] = int(response.headers.get("Content-Length") or len(response.content))
+        session.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    merged = sorted(x for per_thread in latencies for x in per_thread)
+    return {
+        "requests": len(merged),
+        "errors": sum(errors),
+        "rps": round(len(merged) / elapsed, 1),
+        "p50_ms": round(percentile(merged, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(merged, 0.99) * 1000, 2),
+        "max_ms": round((merged[-1] if merged else 0.0) * 1000, 2),
+        "wire_bytes": max(sizes),
+    }
+
+
+def bench_dashboard(sizes: List[int], duration: float = 5.0, concurrency: int = 8) -> List[Dict[str, Any]]:
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="steam-bench-dash-") as tmp:
+            snapshot = write_dataset(Path(tmp), size)
+            port = _free_port()
+            server = context.Process(target=_serve, args=(tmp, port), daemon=True)
+            server.start()
+            base = f"http://127.0.0.1:{port}"
+            try:
+                for _ in range(200):
+                    try:
+                        requests.get(f"{base}/metrics", timeout=1)
+                        break
+                    except requests.RequestException:
+                        time.sleep(0.05)
+                endpoints = {
+                    "games": "/api/steam/games",
+                    "games_since": f"/api/steam/games?since={max(0, snapshot['change_seq'] - size // 10)}",
+                    "players": "/api/steam/players",
+                    "discounts": "/api/steam/discounts",
+                    "rollups": "/api/steam/rollups",
+                    "history": f"/api/steam/history/{FIRST_APP_ID}?from={snapshot['updated_at'] - 3600}",
+                }
+                for name, path in endpoints.items():
+                    requests.get(base + path, timeout=30)  # warm the response cache
+                    result = load_test(base + path, duration, concurrency)
+                    result.update({"apps": size, "endpoint": name, "concurrency": concurrency})
+                    results.append(result)
+                    print(f"  dashboard {size:>6} apps {name:<12} {result['rps']:>8} req/s  "
+                          f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  ({result['errors']} errors)")
+            finally:
+                server.terminate()
+                server.join()
+    return results
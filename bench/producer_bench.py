@@ -0,0 +1,92 @@
+"""
+Producer throughput: one cold and one warm cycle per watchlist size
+
+The cold cycle has an empty metadata cache, so every app gets a full
+appdetails call plus a player count. The warm cycle only refreshes prices in
+batches. Both go through the real SteamAPIClient, fetch_games and
+publish_cycle (snapshot + history sinks) against the local stub server.
+"""
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from stub_steam import StubSteamServer
+
+from change_log import ChangeTracker
+from http_resilience import RetryPolicy
+from metadata_cache import MetadataCache
+from rate_limiter import HostRateLimiter
+from sinks import HistorySink, SnapshotSink
+from snapshot import SnapshotWriter
+from steam_producer import SteamAPIClient, fetch_games, publish_cycle
+from timeseries import TimeSeriesStore
+
+FIRST_APP_ID = 10
+
+
+def stub_client(stub: StubSteamServer, workers: int, rate: Optional[float] = None, retries: int = 4) -> SteamAPIClient:
+    limiter = HostRateLimiter({}, default_rate=rate, burst=max(1.0, rate / 10)) if rate else None
+    client = SteamAPIClient(
+        rate_limiter=limiter,
+        retry=RetryPolicy(max_attempts=retries, base_delay=0.05, max_delay=2.0),
+        pool_size=workers,
+    )
+    client.BASE_URL = f"{stub.url}/api"
+    # Same server under another name, so store and stats get separate rate buckets as on Steam
+    client.STATS_URL = stub.url.replace("127.0.0.1", "localhost")
+    return client
+
+
+def run_cycle(stub: StubSteamServer, client: SteamAPIClient, app_ids: List[int], data_dir: Path,
+              metadata: MetadataCache, changes: ChangeTracker, sinks: list, workers: int,
+              price_chunk: int) -> Dict[str, Any]:
+    stub.reset_counts()
+    quiet = io.StringIO()
+    with contextlib.redirect_stdout(quiet):
+        started = time.perf_counter()
+        games, failures = fetch_games(client, app_ids, workers=workers, metadata=metadata, price_chunk=price_chunk)
+        fetched = time.perf_counter()
+        cycle = publish_cycle(games, changes, sinks)
+        published = time.perf_counter()
+
+    fetch_seconds = fetched - started
+    requests_made = sum(count for key, count in stub.counts.items() if key != "404")
+    return {
+        "fetch_seconds": round(fetch_seconds, 4),
+        "publish_seconds": round(published - fetched, 4),
+        "cycle_seconds": round(published - started, 4),
+        "requests": requests_made,
+        "requests_by_kind": dict(stub.counts),
+        "rps": round(requests_made / fetch_seconds, 1) if fetch_seconds > 0 else None,
+        "apps_per_second": round(len(app_ids) / (published - started), 1),
+        "games": len(games),
+        "failures": len(failures),
+        "changed": len(cycle.changed),
+        "snapshot_bytes": (cycle.snapshot or {}).get("bytes_written"),
+    }
+
+
+def bench_producer(stub: StubSteamServer, sizes: List[int], workers: int = 8, rate: Optional[float] = None,
+                   price_chunk: int = 100, retries: int = 4) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        app_ids = list(range(FIRST_APP_ID, FIRST_APP_ID + size))
+        with tempfile.TemporaryDirectory(prefix="steam-bench-") as tmp:
+            data_dir = Path(tmp)
+            client = stub_client(stub, workers, rate, retries)
+            metadata = MetadataCache(data_dir / "metadata_cache.json", ttl=86400)
+            changes = ChangeTracker()
+            history = TimeSeriesStore(data_dir / "history")
+            sinks = [SnapshotSink(SnapshotWriter(data_dir)), HistorySink(history)]
+            for phase in ("cold", "warm"):
+                result = run_cycle(stub, client, app_ids, data_dir, metadata, changes, sinks, workers, price_chunk)
+                result.update({"apps": size, "cycle": phase, "workers": workers})
+                results.append(result)
+                print(f"  producer {size:>6} apps {phase}: {result['cycle_seconds']:.2f}s, "
+                      f"{result['requests']} requests ({result['rps']} req/s), {result['failures']} failures")
+            history.flush()
+            client.session.close()
+    return results
@@ -0,0 +1,146 @@
+"""
+Memory and time per 10k game records: GameSnapshot vs the old per-game dict
+
+Each record is built from a freshly parsed appdetails payload (as the
+producer does), so the dict baseline holds its own copies of every genre,
+category, developer and publisher string just like the original code did.
+
+What GameSnapshot buys is memory (interned vocabularies, slots), cheaper
+change detection, and steady-state serialization, where unchanged records
+reuse their cached JSON. Cold serialization of fresh records is about the
+same speed as json.dumps on the dict, and the run reports it as such.
+
+    python bench/record_bench.py --records 10000
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from stub_steam import app_details  # noqa: E402
+
+from change_log import ChangeTracker  # noqa: E402
+from game_record import GameSnapshot, record_json  # noqa: E402
+
+
+def legacy_extract(app_id: int, details: Dict[str, Any], player_count: Optional[int]) -> Dict[str, Any]:
+    """The dict-per-game extract_game_data this benchmark compares against"""
+    price_overview = details.get('price_overview', {})
+    discount_percent = price_overview.get('discount_percent', 0) if price_overview else 0
+    dlc_list = details.get('dlc', [])
+    dlc_count = len(dlc_list) if dlc_list else 0
+    release_date = details.get('release_date', {})
+    now = datetime.now(timezone.utc)
+    return {
+        'app_id': app_id,
+        'name': details.get('name', 'Unknown'),
+        'type': details.get('type', 'game'),
+        'timestamp': int(now.timestamp() * 1000),
+        'event_time': now.isoformat(),
+        'is_free': details.get('is_free', False),
+        'initial_price': price_overview.get('initial', 0) / 100 if price_overview else 0,
+        'final_price': price_overview.get('final', 0) / 100 if price_overview else 0,
+        'discount_percent': discount_percent,
+        'on_sale': discount_percent > 0,
+        'currency': price_overview.get('currency', 'USD') if price_overview else 'USD',
+        'metacritic_score': (details.get('metacritic') or {}).get('score', None),
+        'total_recommendations': (details.get('recommendations') or {}).get('total', 0),
+        'dlc_count': dlc_count,
+        'has_dlc': dlc_count > 0,
+        'genres': [g.get('description', '') for g in details.get('genres') or []],
+        'categories': [c.get('description', '') for c in details.get('categories') or []],
+        'release_date': release_date.get('date', 'TBA') if release_date else 'TBA',
+        'is_coming_soon': release_date.get('coming_soon', False) if release_date else False,
+        'current_players': player_count,
+        'short_description': details.get('short_description', '')[:200],
+        'header_image': details.get('header_image', ''),
+        'developers': details.get('developers', []),
+        'publishers': details.get('publishers', []),
+    }
+
+
+def build(payloads: List[bytes], extract: Callable) -> tuple:
+    """(records, seconds, retained bytes) building one record per raw payload"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    records = []
+    for app_id, raw in enumerate(payloads, start=10):
+        records.append(extract(app_id, json.loads(raw), app_id * 7))
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return records, elapsed, retained
+
+
+def timed(fn: Callable, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def bench_records(count: int = 10000) -> Dict[str, Any]:
+    payloads = [json.dumps(app_details(app_id, payload_bytes=256)).encode() for app_id in range(10, 10 + count)]
+    results: Dict[str, Any] = {"records": count}
+    for name, extract in (("dict", legacy_extract), ("game_snapshot", GameSnapshot.from_details)):
+        records, build_seconds, retained = build(payloads, extract)
+        second_cycle, _, _ = build(payloads, extract)
+
+        tracker = ChangeTracker(max_entries=count * 2)
+        tracker.apply(records)
+        diff_seconds = timed(lambda: tracker.apply(second_cycle), repeat=1)
+        published = list(tracker.records.values())
+        cold = timed(lambda: [record_json(r) for r in second_cycle], repeat=1)
+        warm = timed(lambda: [record_json(r) for r in published])
+
+        results[name] = {
+            "build_seconds": round(build_seconds, 4),
+            "retained_bytes": retained,
+            "bytes_per_record": round(retained / count),
+            "diff_seconds": round(diff_seconds, 4),
+            "serialize_cold_seconds": round(cold, 4),
+            "serialize_steady_seconds": round(warm, 4),
+        }
+    old, new = results["dict"], results["game_snapshot"]
+    results["saved"] = {
+        "bytes": old["retained_bytes"] - new["retained_bytes"],
+        "memory_ratio": round(new["retained_bytes"] / old["retained_bytes"], 3),
+        "build_ratio": round(new["build_seconds"] / old["build_seconds"], 3),
+        "serialize_cold_ratio": round(new["serialize_cold_seconds"] / old["serialize_cold_seconds"], 3),
+        "serialize_steady_ratio": round(new["serialize_steady_seconds"] / old["serialize_steady_seconds"], 3),
+    }
+    return results
+
+
+def print_records(results: Dict[str, Any]):
+    print(f"  {'':<14}{'build s':>9}{'bytes/rec':>11}{'diff s':>9}{'json cold':>11}{'json steady':>13}")
+    for name in ("dict", "game_snapshot"):
+        r = results[name]
+        print(f"  {name:<14}{r['build_seconds']:>9}{r['bytes_per_record']:>11}{r['diff_seconds']:>9}"
+              f"{r['serialize_cold_seconds']:>11}{r['serialize_steady_seconds']:>13}")
+    saved = results["saved"]
+    print(f"  per {results['records']:,} records: {saved['bytes'] / 1e6:.1f} MB saved "
+          f"(x{saved['memory_ratio']} memory, x{saved['serialize_steady_ratio']} steady-state serialization, "
+          f"x{saved['serialize_cold_ratio']} cold serialization)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GameSnapshot vs dict record benchmark")
+    parser.add_argument("--records", type=int, default=10000)
+    args = parser.parse_args()
+    print_records(bench_records(args.records))
+
+
+if __name__ == "__main__":
+    main()
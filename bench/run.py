@@ -0,0 +1,131 @@
+"""
+Benchmark runner: producer throughput and dashboard latency against a local stub
+
+    python bench/run.py                               # 10/100/1k/10k apps
+    python bench/run.py --sizes 10,100 --latency 0.05 --rate-429 0.02
+    python bench/run.py --baseline bench/results/previous.json
+
+Results are written as JSON (bench/results/bench-<time>.json by default).
+With --baseline, rows are matched against an earlier run. The run exits
+with status 1 when cycle time or p99 latency gets worse, or RPS drops, by
+more than --tolerance.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+
+from dashboard_bench import bench_dashboard  # noqa: E402
+from producer_bench import bench_producer  # noqa: E402
+from record_bench import bench_records, print_records  # noqa: E402
+from stub_steam import StubConfig, StubSteamServer  # noqa: E402
+
+DEFAULT_SIZES = "10,100,1000,10000"
+
+# (section, key fields, metric, True if higher is better)
+COMPARED: List[Tuple[str, Tuple[str, ...], str, bool]] = [
+    ("producer", ("apps", "cycle"), "cycle_seconds", False),
+    ("producer", ("apps", "cycle"), "rps", True),
+    ("dashboard", ("apps", "endpoint"), "p99_ms", False),
+    ("dashboard", ("apps", "endpoint"), "rps", True),
+]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for section, keys, metric, higher_is_better in COMPARED:
+        old_rows = {tuple(row[k] for k in keys): row for row in baseline.get(section, [])}
+        for row in current.get(section, []):
+            old = old_rows.get(tuple(row[k] for k in keys))
+            if not old or not old.get(metric) or row.get(metric) is None:
+                continue
+            change = (row[metric] - old[metric]) / old[metric]
+            worse = -change if higher_is_better else change
+            label = f"{section} {'/'.join(str(row[k]) for k in keys)} {metric}: {old[metric]} -> {row[metric]}"
+            print(f"  {label} ({change:+.0%})")
+            if worse > tolerance:
+                regressions.append(label)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Steam monitor benchmarks (local stub, no network)")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Watchlist sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument("--skip-producer", action="store_true")
+    parser.add_argument("--skip-dashboard", action="store_true")
+    parser.add_argument("--records", type=int, default=10000,
+                        help="Records for the GameSnapshot vs dict benchmark (default: 10000, 0 = skip)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub response latency in seconds (default: 0.02)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of stub responses that are 429")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After sent with stub 429s")
+    parser.add_argument("--payload-bytes", type=int, default=8192, help="Approximate appdetails size (default: 8192)")
+    parser.add_argument("--workers", type=int, default=8, help="Producer fetch workers (default: 8)")
+    parser.add_argument("--rate", type=float, default=None, help="Producer requests/sec limit (default: unlimited)")
+    parser.add_argument("--price-chunk", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per dashboard endpoint (default: 5)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent dashboard clients (default: 8)")
+    parser.add_argument("--output", help="Result file (default: bench/results/bench-<time>.json)")
+    parser.add_argument("--baseline", help="Earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.20,
+                        help="Allowed relative slowdown before a regression is reported (default: 0.20)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    config = StubConfig(latency=args.latency, rate_429=args.rate_429, retry_after=args.retry_after,
+                        payload_bytes=args.payload_bytes)
+    results: Dict[str, Any] = {
+        "meta": {
+            "started_at": int(time.time()),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "stub": vars(config),
+            "args": vars(args),
+        },
+    }
+
+    if not args.skip_producer:
+        print("🏭 Producer cycles")
+        with StubSteamServer(config) as stub:
+            results["producer"] = bench_producer(stub, sizes, args.workers, args.rate, args.price_chunk)
+    if not args.skip_dashboard:
+        print("📊 Dashboard endpoints")
+        results["dashboard"] = bench_dashboard(sizes, args.duration, args.concurrency)
+    if args.records:
+        print("🧱 Game records")
+        results["records"] = bench_records(args.records)
+        print_records(results["records"])
+
+    output = Path(args.output) if args.output else BENCH_DIR / "results" / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"\n💾 Results written to {output}")
+
+    if args.baseline:
+        print(f"\n📐 Compared with {args.baseline}")
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
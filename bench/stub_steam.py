@@ -0,0 +1,276 @@
+"""
+Local stand-in for the Steam endpoints the producer calls
+
+Serves appdetails (single app, or several with filters=price_overview),
+GetNumberOfCurrentPlayers and the header images appdetails points at
+(/images/<app_id>/header.png, 460x215 PNGs) with realistic payload shapes,
+plus a few knobs:
+
+- latency:        seconds added to every response
+- rate_429:       fraction of requests answered 429 with `retry_after`
+- payload_bytes:  padding in detailed_description, so full appdetails
+                  responses are roughly this big (real ones are 5-50 KB)
+- image_version:  part of every header_image URL and image; bump it to
+                  make the games' header images change
+
+Payloads are deterministic per app_id; player counts drift per request and a
+fraction of apps change price every `price_period` requests so the change
+detection downstream has something to do. The `cc` parameter picks a
+storefront region from REGIONS: prices are converted to its currency and
+sales run on a per-region schedule.
+
+Run standalone: python bench/stub_steam.py --port 8901 --latency 0.05
+"""
+import argparse
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+GENRES = ["Action", "Adventure", "Indie", "RPG", "Strategy", "Simulation", "Casual", "Sports", "Racing", "Free to Play"]
+CATEGORIES = ["Single-player", "Multi-player", "Co-op", "Steam Achievements", "Full controller support",
+              "Steam Cloud", "Steam Trading Cards", "In-App Purchases", "Online PvP", "Remote Play Together"]
+
+# cc -> (currency, price factor against USD, sale phase offset)
+REGIONS = {
+    "us": ("USD", 1.0, 0), "gb": ("GBP", 0.8, 1), "eu": ("EUR", 0.92, 2), "de": ("EUR", 0.92, 2),
+    "fr": ("EUR", 0.92, 2), "jp": ("JPY", 150.0, 3), "br": ("BRL", 2.5, 4), "ca": ("CAD", 1.35, 5),
+    "au": ("AUD", 1.5, 6), "ru": ("RUB", 45.0, 7), "cn": ("CNY", 3.5, 8), "in": ("INR", 40.0, 9),
+}
+
+
+class StubConfig:
+    def __init__(self, latency: float = 0.0, rate_429: float = 0.0, retry_after: float = 0.1,
+                 payload_bytes: int = 8192, price_period: int = 5, seed: int = 1, image_version: int = 0):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.payload_bytes = payload_bytes
+        self.price_period = price_period
+        self.seed = seed
+        self.image_version = image_version
+
+
+def app_details(app_id: int, payload_bytes: int, tick: int = 0, price_period: int = 5,
+                image_base: str = "https://cdn.example.invalid", image_version: int = 0) -> Dict[str, Any]:
+    """Deterministic appdetails `data` object for an app"""
+    rng = random.Random(app_id)
+    is_free = rng.random() < 0.15
+    description = f"Stub game {app_id}. " * max(1, payload_bytes // 16)
+    data: Dict[str, Any] = {
+        "type": "game",
+        "name": f"Stub Game {app_id}",
+        "steam_appid": app_id,
+        "is_free": is_free,
+        "detailed_description": description[:payload_bytes],
+        "short_description": description[:300],
+        "header_image": f"{image_base}/images/{app_id}/header.png?t={image_version}",
+        "developers": [f"Studio {app_id % 97}"],
+        "publishers": [f"Publisher {app_id % 31}"],
+        "genres": [{"id": str(i), "description": g} for i, g in enumerate(rng.sample(GENRES, 3))],
+        "categories": [{"id": i, "description": c} for i, c in enumerate(rng.sample(CATEGORIES, 5))],
+        "release_date": {"coming_soon": False, "date": f"{rng.randint(1, 28)} Mar, {rng.randint(2005, 2024)}"},
+        "recommendations": {"total": rng.randint(0, 500000)},
+        "dlc": list(range(app_id * 10, app_id * 10 + rng.randint(0, 8))),
+    }
+    if rng.random() < 0.4:
+        data["metacritic"] = {"score": rng.randint(40, 97), "url": ""}
+    price = price_overview(app_id, tick, price_period) if not is_free else None
+    if price:
+        data["price_overview"] = price
+    return data
+
+
+def price_overview(app_id: int, tick: int, price_period: int, cc: str = "us") -> Optional[Dict[str, Any]]:
+    rng = random.Random(app_id)
+    if rng.random() < 0.15:
+        return None  # free (same draw as app_details)
+    currency, factor, offset = REGIONS.get(cc, REGIONS["us"])
+    initial = int(rng.choice([499, 999, 1499, 1999, 2999, 3999, 5999, 6999]) * factor)
+    # A tenth of the apps go on/off sale every `price_period` requests
+    phase = tick // max(1, price_period) + offset
+    on_sale = app_id % 10 == phase % 10
+    discount = rng.choice([10, 25, 33, 50, 75]) if on_sale else 0
+    final = initial * (100 - discount) // 100
+    formatted = "${:.2f}" if currency == "USD" else "{:.2f} " + currency
+    return {"currency": currency, "initial": initial, "final": final, "discount_percent": discount,
+            "initial_formatted": formatted.format(initial / 100) if discount else "",
+            "final_formatted": formatted.format(final / 100)}
+
+
+def header_png(app_id: int, version: int, width: int = 460, height: int = 215) -> bytes:
+    """A gradient PNG whose colours depend on the app and the image version"""
+    rng = random.Random(app_id * 1000 + version)
+    top, bottom = [rng.randrange(256) for _ in range(3)], [rng.randrange(256) for _ in range(3)]
+    rows = []
+    for y in range(height):
+        colour = bytes(top[i] + (bottom[i] - top[i]) * y // max(1, height - 1) for i in range(3))
+        rows.append(b"\x00" + colour * width)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"".join(rows))) + chunk(b"IEND", b""))
+
+
+class StubSteamServer:
+    """Threaded HTTP server; use as a context manager or call start()/stop()"""
+
+    def __init__(self, config: Optional[StubConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or StubConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self._ticks: Dict[int, int] = {}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubSteamServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stub-steam", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts = {}
+
+    def _count(self, key: str) -> int:
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+            return self.counts[key]
+
+    def _tick(self, app_id: int) -> int:
+        with self._lock:
+            tick = self._ticks.get(app_id, 0)
+            self._ticks[app_id] = tick + 1
+            return tick
+
+    def _peek_tick(self, app_id: int) -> int:
+        with self._lock:
+            return self._ticks.get(app_id, 0)
+
+    def _throttle(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.config.rate_429
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: Any = None, headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(payload, separators=(",", ":")).encode("utf-8") if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_bytes(self, body: bytes, content_type: str):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                config = server.config
+                if config.latency:
+                    time.sleep(config.latency)
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if server._throttle():
+                    server._count("429")
+                    return self._send(429, {}, {"Retry-After": f"{config.retry_after:g}"})
+
+                if url.path.endswith("/api/appdetails"):
+                    app_ids = [int(a) for a in params.get("appids", "").split(",") if a.strip().isdigit()]
+                    if params.get("filters") == "price_overview":
+                        cc = params.get("cc", "us").lower()
+                        server._count("price_overview" if cc == "us" else f"price_overview_{cc}")
+                        out = {}
+                        for app_id in app_ids:
+                            # Only the primary region's refreshes move the app's price schedule along
+                            tick = server._tick(app_id) if cc == "us" else server._peek_tick(app_id)
+                            price = price_overview(app_id, tick, config.price_period, cc)
+                            out[str(app_id)] = {"success": True, "data": {"price_overview": price} if price else []}
+                        return self._send(200, out)
+                    server._count("appdetails")
+                    if len(app_ids) != 1:
+                        return self._send(400, None)
+                    app_id = app_ids[0]
+                    data = app_details(app_id, config.payload_bytes, server._tick(app_id), config.price_period,
+                                       f"http://{self.headers.get('Host', 'localhost')}", config.image_version)
+                    return self._send(200, {str(app_id): {"success": True, "data": data}})
+
+                if url.path.endswith("/GetNumberOfCurrentPlayers/v1/"):
+                    server._count("player_count")
+                    app_id = int(params.get("appid", 0))
+                    base = random.Random(app_id).randint(0, 200000)
+                    with server._lock:
+                        drift = server._rng.uniform(0.9, 1.1)
+                    return self._send(200, {"response": {"player_count": int(base * drift), "result": 1}})
+
+                parts = url.path.strip("/").split("/")
+                if len(parts) == 3 and parts[0] == "images" and parts[1].isdigit() and parts[2] == "header.png":
+                    server._count("image")
+                    version = int(params.get("t", "0")) if params.get("t", "0").isdigit() else 0
+                    return self._send_bytes(header_png(int(parts[1]), version), "image/png")
+
+                server._count("404")
+                return self._send(404, None)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of the Steam store/stats API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--payload-bytes", type=int, default=8192, help="Approximate appdetails payload size")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.rate_429, args.retry_after, args.payload_bytes)
+    server = StubSteamServer(config, args.host, args.port)
+    print(f"Stub Steam API on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Reading the alerts file the producer's AlertFile appends to (dashboard side)
+
+Kept apart from alerts.py, which registers the producer's alert and sink
+metrics: importing it would put producer_* families in the dashboard's
+/metrics next to the ones it copies from producer_metrics.prom.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ALERTS_FILENAME = "alerts.jsonl"
+
+
+class AlertTail:
+    """Reads alerts appended to the alerts file since the last call (dashboard side)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._inode: Optional[int] = None
+        self._offset = 0
+
+    def skip_to_end(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            self._inode, self._offset = None, 0
+            return
+        self._inode, self._offset = st.st_ino, st.st_size
+
+    def read(self) -> List[Dict[str, Any]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return []
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            # Rotated (or recreated): the new file is all unread
+            self._inode, self._offset = st.st_ino, 0
+        if st.st_size == self._offset:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(st.st_size - self._offset)
+        # Only whole lines; a batch still being written is picked up next time
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        alerts = []
+        for line in data[:end].splitlines():
+            try:
+                alerts.append(json.loads(line))
+            except ValueError:
+                continue
+        return alerts
+
+
+def recent_alerts(path: Path, limit: int, max_bytes: int = 1024 * 1024) -> List[Dict[str, Any]]:
+    """Newest `limit` alerts, newest first, from the end of the alerts file"""
+    try:
+        with open(path, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - max_bytes))
+            data = f.read()
+    except OSError:
+        return []
+    lines = data.splitlines()
+    if size > max_bytes:
+        lines = lines[1:]  # probably cut mid-line
+    alerts: List[Dict[str, Any]] = []
+    for line in reversed(lines):
+        if len(alerts) >= limit:
+            break
+        try:
+            alerts.append(json.loads(line))
+        except ValueError:
+            continue
+    return alerts
@@ -0,0 +1,459 @@
+"""
+Alert rules evaluated on every producer cycle
+
+Rules live in a JSON file (default config/alert_rules.json, reloaded when
+it changes):
+
+    {"rules": [
+        {"id": "hades-under-10", "app_id": 1145360, "field": "final_price", "op": "<", "value": 10},
+        {"id": "player-spike", "field": "current_players", "op": "rise_pct", "value": 50, "window": 600},
+        {"id": "deep-sale", "field": "discount_percent", "op": ">=", "value": 75, "cooldown": 86400}
+    ]}
+
+`op` is a comparison (<, <=, >, >=) against `value`, or rise_pct/drop_pct:
+the field moved by at least `value` percent from its lowest/highest point
+in the last `window` seconds. Without `app_id` a rule applies to every game.
+
+Rules are indexed by (app_id, field), and the engine remembers the last
+value of each rule-able field per game, so a cycle only looks at rules
+whose field actually changed on a changed record: the cost follows the
+number of changes, not rules x games.
+
+A rule fires when its condition becomes true, and not again until it has
+been false in between and `cooldown` seconds (default 1h) have passed, so
+a price hovering around a threshold does not flood the sinks. Conditions
+that already hold when the engine starts, when a rule is (re)loaded or
+when a game is first seen are taken as the starting state, not alerted.
+
+Alerts are appended to data/steam/alerts.jsonl, which the dashboard
+streams as `alert` events on /api/steam/stream (read with alert_log.py),
+and can be POSTed to webhooks.
+"""
+import json
+import operator
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import requests
+
+import metrics
+from alert_log import ALERTS_FILENAME
+from sinks import CycleResult, Sink
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent shard writers are not serialized
+    fcntl = None
+
+COMPARISONS: Dict[str, Callable[[Any, Any], bool]] = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+WINDOW_OPS = ("rise_pct", "drop_pct")
+
+# Numeric record fields rules can watch
+FIELDS = (
+    "final_price", "initial_price", "discount_percent", "current_players",
+    "metacritic_score", "total_recommendations", "dlc_count",
+)
+
+DEFAULT_COOLDOWN = 3600
+MAX_WINDOW = 7 * 86400
+
+# alerts.jsonl is rotated to alerts.jsonl.1 past this size
+ALERT_FILE_MAX_BYTES = 8 * 1024 * 1024
+
+ALERT_RULES = metrics.gauge("producer_alert_rules", "Alert rules loaded")
+ALERTS_FIRED = metrics.counter("producer_alerts_total", "Alerts fired by rule operator", ("op",))
+ALERT_RULES_EVALUATED = metrics.counter("producer_alert_rules_evaluated_total",
+                                        "Rule evaluations triggered by changed fields")
+ALERT_DELIVERY_ERRORS = metrics.counter("producer_alert_delivery_errors_total",
+                                        "Alert batches an output failed to deliver", ("output",))
+
+_MISSING = object()
+
+
+class RuleError(ValueError):
+    """A rule definition that cannot be used"""
+
+
+@dataclass(frozen=True)
+class Rule:
+    id: str
+    field: str
+    op: str
+    value: float
+    app_id: Optional[int] = None
+    window: int = 0
+    cooldown: int = DEFAULT_COOLDOWN
+
+    @classmethod
+    def from_dict(cls, data: Any) -> "Rule":
+        if not isinstance(data, dict):
+            raise RuleError(f"Rule must be an object, got {data!r}")
+        rule_id = str(data.get("id") or "").strip()
+        if not rule_id:
+            raise RuleError(f"Rule without an id: {data!r}")
+        field_name, op = data.get("field"), data.get("op")
+        if field_name not in FIELDS:
+            raise RuleError(f"{rule_id}: field must be one of {', '.join(FIELDS)}")
+        if op not in COMPARISONS and op not in WINDOW_OPS:
+            raise RuleError(f"{rule_id}: op must be one of {', '.join([*COMPARISONS, *WINDOW_OPS])}")
+        try:
+            value = float(data["value"])
+            app_id = int(data["app_id"]) if data.get("app_id") is not None else None
+            window = int(data.get("window") or 0)
+            cooldown = int(data.get("cooldown", DEFAULT_COOLDOWN))
+        except (KeyError, TypeError, ValueError) as e:
+            raise RuleError(f"{rule_id}: invalid value, app_id, window or cooldown ({e})") from e
+        if op in WINDOW_OPS and not 0 < window <= MAX_WINDOW:
+            raise RuleError(f"{rule_id}: {op} needs a window between 1 and {MAX_WINDOW} seconds")
+        if op in WINDOW_OPS and value <= 0:
+            raise RuleError(f"{rule_id}: {op} needs a positive percentage")
+        return cls(rule_id, field_name, op, value, app_id, window if op in WINDOW_OPS else 0, max(0, cooldown))
+
+
+def load_rules(path: Path) -> List[Rule]:
+    """Rules from a JSON file; raises OSError/ValueError (RuleError names the bad rule)"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data.get("rules", []) if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        raise RuleError("'rules' must be a list")
+    rules = [Rule.from_dict(entry) for entry in entries]
+    ids = [rule.id for rule in rules]
+    if len(set(ids)) != len(ids):
+        raise RuleError("Rule ids must be unique")
+    return rules
+
+
+def _percent(change: float, reference: float) -> float:
+    return change / reference * 100 if reference > 0 else 0.0
+
+
+class AlertEngine:
+    """Rules indexed by (app_id, field) plus the per-game state they need"""
+
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self.rules: List[Rule] = []
+        self._index: Dict[Tuple[Optional[int], str], List[Rule]] = {}
+        self._fields: Tuple[str, ...] = ()
+        # field -> longest window any rule looks back over it
+        self._spans: Dict[str, int] = {}
+        self._values: Dict[int, Dict[str, Any]] = {}
+        # (app_id, field) -> [(timestamp, value)], oldest first; the first sample may
+        # predate the window and stands for the value the window started with
+        self._samples: Dict[Tuple[int, str], Deque[Tuple[float, float]]] = {}
+        self._active: Dict[int, Set[Rule]] = {}
+        self._fired: Dict[int, Dict[Rule, float]] = {}
+        self.set_rules(rules)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def set_rules(self, rules: Iterable[Rule]):
+        """Swap the rule set; unchanged rules keep their state, new ones are armed silently"""
+        self.rules = list(rules)
+        index: Dict[Tuple[Optional[int], str], List[Rule]] = {}
+        spans: Dict[str, int] = {}
+        for rule in self.rules:
+            index.setdefault((rule.app_id, rule.field), []).append(rule)
+            if rule.window:
+                spans[rule.field] = max(spans.get(rule.field, 0), rule.window)
+        self._index, self._spans = index, spans
+        self._fields = tuple(dict.fromkeys(rule.field for rule in self.rules))
+
+        kept = set(self.rules)
+        for app_id in list(self._active):
+            self._active[app_id] &= kept
+        for app_id, fired in list(self._fired.items()):
+            self._fired[app_id] = {rule: at for rule, at in fired.items() if rule in kept}
+        for key in [key for key in self._samples if key[1] not in spans]:
+            del self._samples[key]
+        # New rules start from the values already known instead of firing on them
+        for app_id, values in self._values.items():
+            for rule in self._rules_for(app_id, values):
+                self._arm(rule, app_id, values)
+
+    def _rules_for(self, app_id: int, values: Dict[str, Any]) -> List[Rule]:
+        rules = []
+        for field_name in self._fields:
+            if field_name in values:
+                rules.extend(self._index.get((app_id, field_name), ()))
+                rules.extend(self._index.get((None, field_name), ()))
+        return rules
+
+    def _arm(self, rule: Rule, app_id: int, values: Dict[str, Any]):
+        """Record whether a condition holds now without alerting"""
+        active = self._active.setdefault(app_id, set())
+        if rule in active:
+            return
+        holds, _ = self._check(rule, app_id, values.get(rule.field), time.time())
+        if holds:
+            active.add(rule)
+
+    def prime(self, records: Iterable[Dict[str, Any]], now: Optional[float] = None):
+        """Start from already published records (e.g. after a restart) without alerting"""
+        now = time.time() if now is None else now
+        for record in records:
+            self._observe(record, now, alerts=None)
+
+    def evaluate(self, changed: Iterable[Dict[str, Any]], removed: Iterable[int],
+                 now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Alerts for one cycle's changed and removed records"""
+        now = time.time() if now is None else now
+        alerts: List[Dict[str, Any]] = []
+        for record in changed:
+            self._observe(record, now, alerts)
+        for app_id in removed:
+            self._values.pop(app_id, None)
+            self._active.pop(app_id, None)
+            self._fired.pop(app_id, None)
+            for field_name in self._spans:
+                self._samples.pop((app_id, field_name), None)
+        return alerts
+
+    def _observe(self, record: Dict[str, Any], now: float, alerts: Optional[List[Dict[str, Any]]]):
+        app_id = record["app_id"]
+        values = self._values.get(app_id)
+        first = values is None
+        if first:
+            values = self._values[app_id] = {}
+        # Every rule-able field is remembered, so rules loaded later start from known values
+        for field_name in FIELDS:
+            new = record.get(field_name)
+            old = values.get(field_name, _MISSING)
+            if new == old:
+                continue
+            values[field_name] = new
+            span = self._spans.get(field_name)
+            if span and new is not None:
+                samples = self._samples.setdefault((app_id, field_name), deque())
+                samples.append((now, new))
+                cutoff = now - span
+                while len(samples) > 1 and samples[1][0] <= cutoff:
+                    samples.popleft()
+            rules = self._index.get((app_id, field_name), []) + self._index.get((None, field_name), [])
+            if not rules:
+                continue
+            ALERT_RULES_EVALUATED.inc(len(rules))
+            active = self._active.setdefault(app_id, set())
+            for rule in rules:
+                holds, reference = self._check(rule, app_id, new, now)
+                if not holds:
+                    active.discard(rule)
+                    continue
+                if rule in active:
+                    continue
+                active.add(rule)
+                if alerts is None or first or old is _MISSING:
+                    continue
+                fired = self._fired.setdefault(app_id, {})
+                last = fired.get(rule)
+                if last is not None and now - last < rule.cooldown:
+                    continue
+                fired[rule] = now
+                alerts.append(self._alert(rule, record, None if old is _MISSING else old, new, reference, now))
+
+    def _check(self, rule: Rule, app_id: int, value: Any, now: float) -> Tuple[bool, Optional[float]]:
+        """(condition holds, window reference value)"""
+        if value is None:
+            return False, None
+        if rule.window == 0:
+            return COMPARISONS[rule.op](value, rule.value), None
+        samples = self._samples.get((app_id, rule.field))
+        if not samples:
+            return False, None
+        cutoff = now - rule.window
+        start = 0
+        # Skip samples older than this rule's window, keeping the one in force at its start
+        while start + 1 < len(samples) and samples[start + 1][0] <= cutoff:
+            start += 1
+        window = [v for _, v in list(samples)[start:]]
+        if rule.op == "rise_pct":
+            reference = min(window)
+            return _percent(value - reference, reference) >= rule.value, reference
+        reference = max(window)
+        return _percent(reference - value, reference) >= rule.value, reference
+
+    @staticmethod
+    def _alert(rule: Rule, record: Dict[str, Any], old: Any, new: Any, reference: Optional[float],
+               now: float) -> Dict[str, Any]:
+        name = record.get("name") or f"App {record['app_id']}"
+        if rule.window:
+            direction = "rose" if rule.op == "rise_pct" else "fell"
+            change = abs(_percent(new - reference, reference))
+            message = (f"{name}: {rule.field} {direction} {change:.0f}% within {rule.window}s "
+                       f"({reference:g} -> {new:g})")
+        else:
+            message = f"{name}: {rule.field} is {new:g} ({rule.op} {rule.value:g})"
+        ALERTS_FIRED.labels(rule.op).inc()
+        return {
+            "id": f"{rule.id}:{record['app_id']}:{int(now)}",
+            "rule": rule.id,
+            "app_id": record["app_id"],
+            "name": name,
+            "field": rule.field,
+            "op": rule.op,
+            "threshold": rule.value,
+            "window": rule.window,
+            "value": new,
+            "previous": old,
+            "reference": reference,
+            "timestamp": int(now),
+            "message": message,
+        }
+
+
+class AlertOutput:
+    """Delivers alert batches; `close()` is called once on shutdown"""
+
+    name = "output"
+
+    def send(self, alerts: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class AlertFile(AlertOutput):
+    """Appends alerts as JSON lines; shards share one file, so each batch is one locked write"""
+
+    name = "file"
+
+    def __init__(self, path: Path, max_bytes: int = ALERT_FILE_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+
+    def send(self, alerts: List[Dict[str, Any]]):
+        data = "".join(json.dumps(alert, separators=(",", ":")) + "\n" for alert in alerts).encode("utf-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            size = os.fstat(fd).st_size
+            if size and size + len(data) > self.max_bytes:
+                os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+                os.close(fd)
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+
+class WebhookOutput(AlertOutput):
+    """POSTs {"alerts": [...]} to a URL from a background thread, so a slow endpoint never stalls a cycle"""
+
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 5.0, attempts: int = 3, queue_size: int = 100):
+        self.url = url
+        self.timeout = timeout
+        self.attempts = attempts
+        self._queue: "queue.Queue[Optional[List[Dict[str, Any]]]]" = queue.Queue(maxsize=queue_size)
+        self._session = requests.Session()
+        self._thread = threading.Thread(target=self._run, name="alert-webhook", daemon=True)
+        self._thread.start()
+
+    def send(self, alerts: List[Dict[str, Any]]):
+        try:
+            self._queue.put_nowait(alerts)
+        except queue.Full:
+            ALERT_DELIVERY_ERRORS.labels(self.name).inc()
+            print(f"  ⚠️  Alert webhook backlog full, dropped {len(alerts)} alerts")
+
+    def _post(self, alerts: List[Dict[str, Any]]):
+        for attempt in range(1, self.attempts + 1):
+            try:
+                response = self._session.post(self.url, json={"alerts": alerts}, timeout=self.timeout)
+                if response.status_code < 500:
+                    if response.status_code >= 400:
+                        print(f"  ⚠️  Alert webhook rejected {len(alerts)} alerts: HTTP {response.status_code}")
+                        ALERT_DELIVERY_ERRORS.labels(self.name).inc()
+                    return
+                error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+            if attempt < self.attempts:
+                time.sleep(2 ** (attempt - 1))
+        ALERT_DELIVERY_ERRORS.labels(self.name).inc()
+        print(f"  ⚠️  Alert webhook failed after {self.attempts} attempts: {error}")
+
+    def _run(self):
+        while True:
+            alerts = self._queue.get()
+            if alerts is None:
+                return
+            self._post(alerts)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=self.timeout * self.attempts)
+        self._session.close()
+
+
+def _file_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class AlertSink(Sink):
+    """Runs the engine on each cycle's changes and hands alerts to the outputs"""
+
+    name = "alerts"
+
+    def __init__(self, engine: AlertEngine, outputs: List[AlertOutput], rules_path: Optional[Path] = None):
+        self.engine = engine
+        self.outputs = outputs
+        self.rules_path = Path(rules_path) if rules_path else None
+        self._rules_stamp: Any = _MISSING
+        self.reload_rules()
+
+    def reload_rules(self):
+        """Re-read the rules file if it changed; a broken file keeps the current rules"""
+        if self.rules_path is None:
+            return
+        stamp = _file_stamp(self.rules_path)
+        if stamp == self._rules_stamp:
+            return
+        self._rules_stamp = stamp
+        if stamp is None:
+            rules = []
+        else:
+            try:
+                rules = load_rules(self.rules_path)
+            except (OSError, ValueError) as e:
+                print(f"  ⚠️  Alert rules not loaded from {self.rules_path}: {e}")
+                return
+        self.engine.set_rules(rules)
+        ALERT_RULES.set(len(rules))
+        if stamp is not None:
+            print(f"🔔 {len(rules)} alert rules loaded from {self.rules_path}")
+
+    def publish(self, cycle: CycleResult):
+        self.reload_rules()
+        alerts = self.engine.evaluate(cycle.changed, cycle.removed, cycle.timestamp)
+        if not alerts:
+            return
+        for alert in alerts:
+            print(f"🔔 {alert['message']}")
+        for output in self.outputs:
+            try:
+                output.send(alerts)
+            except Exception as e:
+                ALERT_DELIVERY_ERRORS.labels(output.name).inc()
+                print(f"  ⚠️  Alert output {output.name} failed: {e}")
+
+    def close(self):
+        for output in self.outputs:
+            output.close()
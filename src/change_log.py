@@ -0,0 +1,151 @@
+"""
+Change detection for producer cycles
+
+Each cycle's records are compared with the previous ones on their meaningful
+fields (everything except the fetch timestamps). Records are GameSnapshot
+objects; plain dicts (e.g. read back from a snapshot) work too. A record that did not
+change is carried over untouched, including its original timestamp; one
+that did gets the next change sequence number in `change_seq`. The last
+`max_entries` changes are kept as `[change_seq, app_id, removed]` entries so
+readers can ask for "everything since change N" without a full download.
+The same old/new pairs feed the Rollups deltas written with the snapshot.
+"""
+import bisect
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from game_record import GameSnapshot
+from rollups import Rollups
+
+# Fields that differ on every fetch and say nothing about the game itself
+VOLATILE_FIELDS = ('timestamp', 'event_time', 'change_seq')
+
+DEFAULT_MAX_ENTRIES = 5000
+
+
+def comparable(record: Dict[str, Any]) -> Any:
+    if isinstance(record, GameSnapshot):
+        return record.content_key()
+    return {k: v for k, v in record.items() if k not in VOLATILE_FIELDS}
+
+
+class ChangeTracker:
+    """Assigns change sequence numbers and keeps a bounded change log"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.change_seq = 0
+        self.log: Deque[Tuple[int, int, int]] = deque(maxlen=max_entries)
+        self.records: Dict[int, Dict[str, Any]] = {}
+        self.rollups = Rollups()
+
+    def restore(self, snapshot: Dict[str, Any]):
+        """Continue from a previously written snapshot"""
+        if 'change_seq' not in snapshot:
+            # Written before change tracking: every record counts as new
+            return
+        self.change_seq = snapshot.get('change_seq', 0)
+        self.records = {g['app_id']: GameSnapshot.from_dict(g) for g in snapshot.get('games', [])}
+        self.log.clear()
+        self.log.extend(tuple(entry) for entry in snapshot.get('changes', []))
+        self.rollups.rebuild(self.records.values())
+
+    def apply(self, games_data: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[int]]:
+        """Diff a cycle against the previous one
+
+        Returns (records to publish, changed records, removed app_ids). Unchanged
+        records are the previous objects, so they keep their timestamps.
+        """
+        published: List[Dict[str, Any]] = []
+        changed: List[Dict[str, Any]] = []
+        seen = set()
+        for record in games_data:
+            app_id = record['app_id']
+            seen.add(app_id)
+            previous = self.records.get(app_id)
+            if previous is not None and comparable(previous) == comparable(record):
+                published.append(previous)
+                continue
+            record = self._change(previous, record)
+            changed.append(record)
+            published.append(record)
+
+        removed = [app_id for app_id in self.records if app_id not in seen]
+        for app_id in removed:
+            self._remove(app_id)
+
+        self.records = {g['app_id']: g for g in published}
+        return published, changed, removed
+
+    def update(self, records: Iterable[Dict[str, Any]],
+               removed: Iterable[int] = ()) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """Diff only the given records (others are kept as they are); returns (changed, removed)
+
+        The incremental form of `apply` for callers that know which records
+        were refreshed, e.g. a replay: its cost follows the records passed in
+        rather than the whole watchlist.
+        """
+        changed: List[Dict[str, Any]] = []
+        for record in records:
+            app_id = record['app_id']
+            previous = self.records.get(app_id)
+            if previous is not None and comparable(previous) == comparable(record):
+                continue
+            record = self.records[app_id] = self._change(previous, record)
+            changed.append(record)
+        gone = [app_id for app_id in removed if app_id in self.records]
+        for app_id in gone:
+            self._remove(app_id)
+            del self.records[app_id]
+        return changed, gone
+
+    def _change(self, previous: Optional[Dict[str, Any]], record: Dict[str, Any]) -> Dict[str, Any]:
+        self.change_seq += 1
+        if isinstance(record, GameSnapshot):
+            record = record.with_change_seq(self.change_seq)
+        else:
+            record = dict(record, change_seq=self.change_seq)
+        self.log.append((self.change_seq, record['app_id'], 0))
+        self.rollups.update(previous, record)
+        return record
+
+    def _remove(self, app_id: int):
+        self.change_seq += 1
+        self.log.append((self.change_seq, app_id, 1))
+        self.rollups.update(self.records[app_id], None)
+
+    def snapshot_fields(self) -> Dict[str, Any]:
+        return {
+            'change_seq': self.change_seq,
+            'changes': [list(entry) for entry in self.log],
+            'rollups': self.rollups.to_dict(),
+        }
+
+
+def changes_since(snapshot: Dict[str, Any], since: int,
+                  by_id: Optional[Dict[int, Dict[str, Any]]] = None) -> Optional[Tuple[List[Dict[str, Any]], List[int]]]:
+    """(changed records, removed app_ids) after change `since`, or None if the log no longer reaches back that far"""
+    log = snapshot.get('changes', [])
+    current = snapshot.get('change_seq', 0)
+    if since == current:
+        return [], []
+    if since > current:
+        # The producer's history was reset; the client must resync
+        return None
+    if not log or log[0][0] > since + 1:
+        return None
+    by_id = by_id if by_id is not None else {g['app_id']: g for g in snapshot.get('games', [])}
+    start = bisect.bisect_right(log, since, key=lambda entry: entry[0])
+    changed, removed, seen = [], [], set()
+    # Newest entry per app wins, so walk backwards
+    for _, app_id, _ in reversed(log[start:]):
+        if app_id in seen:
+            continue
+        seen.add(app_id)
+        if app_id in by_id:
+            changed.append(by_id[app_id])
+        else:
+            removed.append(app_id)
+    changed.reverse()
+    removed.reverse()
+    return changed, removed
+
@@ -1,34 +1,212 @@
 from __future__ import annotations
 
-import json
 import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
-from flask import Flask, jsonify, render_template, redirect
-import requests
+from flask import Flask, Response, g, jsonify, render_template, redirect, request, send_file, stream_with_context
 
 ROOT = Path(__file__).resolve().parent
 
-# Steam data files
-STEAM_DATA_DIR = ROOT.parent.parent / "data" / "steam"
-STEAM_GAMES_FILE = STEAM_DATA_DIR / "latest_games.json"
-STEAM_PLAYERS_FILE = STEAM_DATA_DIR / "player_stats.json"
-STEAM_DISCOUNTS_FILE = STEAM_DATA_DIR / "discounts.json"
+# Modules shared with the producer live in src/
+if str(ROOT.parent) not in sys.path:
+    sys.path.insert(0, str(ROOT.parent))
+
+import metrics  # noqa: E402
+from alert_log import ALERTS_FILENAME, AlertTail, recent_alerts  # noqa: E402
+from change_log import changes_since  # noqa: E402
+from dashboard.app_catalog import CATALOG_FILENAME, AppCatalog  # noqa: E402
+from dashboard.event_stream import SnapshotBroadcaster  # noqa: E402
+from dashboard.export import (  # noqa: E402
+    EXPORT_FORMATS, EXPORT_MAX_CONCURRENT, EXPORT_RETRY_AFTER, EXPORTS_REJECTED, check_fields, check_resolution,
+    encode_games, encode_history, export_filename, history_rows, parse_cursor, parse_format, parse_kind,
+    shared_games, snapshot_games, stream_body,
+)
+from dashboard.game_index import GameIndex, QueryError  # noqa: E402
+from dashboard.response_cache import ResponseCache, file_stamp  # noqa: E402
+from dashboard.shared_views import SharedViews, send_shared  # noqa: E402
+from dashboard.thumbnails import DEFAULT_SIZE, SIZES, THUMBNAILS_DIRNAME, ThumbnailCache, url_version  # noqa: E402
+from rollups import DIMENSIONS as ROLLUP_DIMENSIONS  # noqa: E402
+from snapshot import (  # noqa: E402
+    SNAPSHOT_FILENAME, discounts_view, empty_snapshot, games_by_id, games_view, load_snapshot, players_view,
+    price_comparison, prices_view, rollups_view,
+)
+from timeseries import RESOLUTIONS, TimeSeriesStore  # noqa: E402
+from watchlist_store import WATCHLIST_DB_FILENAME, WatchlistError, open_watchlist  # noqa: E402
+
+# Steam data files (STEAM_DATA_DIR overrides, e.g. to serve a benchmark's data)
+STEAM_DATA_DIR = Path(os.environ.get("STEAM_DATA_DIR") or ROOT.parent.parent / "data" / "steam")
+STEAM_SNAPSHOT_FILE = STEAM_DATA_DIR / SNAPSHOT_FILENAME
+STEAM_HISTORY_DIR = STEAM_DATA_DIR / "history"
+STEAM_ALERTS_FILE = STEAM_DATA_DIR / ALERTS_FILENAME
+# Written by the producer after every cycle, served as part of /metrics
+PRODUCER_METRICS_FILE = STEAM_DATA_DIR / "producer_metrics.prom"
+# Label telling dashboard/serve.py's pre-forked workers apart on /metrics
+WORKER_LABEL = "worker"
+
+# Auto-picked history steps (seconds), smallest one giving at most HISTORY_MAX_POINTS
+HISTORY_STEPS = (60, 300, 900, 3600, 6 * 3600, 86400, 7 * 86400)
+HISTORY_MAX_POINTS = 500
+
+# Seconds between keep-alive comments on idle event streams
+STREAM_KEEPALIVE = 15
+# Event streams open at once per process; more get 503 and the page falls back to polling
+STREAM_MAX_OPEN = 256
+STREAM_RETRY_AFTER = 30
+# WSGI environ key of a callable that stops counting the current request against the
+# server's request threads (set by dashboard/serve.py; event streams stay open for hours)
+DETACH_ENVIRON_KEY = "dashboard.detach_request"
+
+# Header-image thumbnails (THUMBNAIL_CACHE_MB bounds the disk they use)
+STEAM_THUMBNAILS_DIR = STEAM_DATA_DIR / THUMBNAILS_DIRNAME
+THUMBNAIL_CACHE_BYTES = int(os.environ.get("THUMBNAIL_CACHE_MB", "256")) * 1024 * 1024
+# Cache lifetime of /img responses without a matching ?v= (they revalidate by ETag afterwards)
+THUMBNAIL_MAX_AGE = 3600
 
 # Config files
 CONFIG_DIR = ROOT.parent.parent / "config"
-WATCHLIST_FILE = CONFIG_DIR / "games_watchlist.json"
+WATCHLIST_DB = CONFIG_DIR / WATCHLIST_DB_FILENAME
 AVAILABLE_GAMES_FILE = CONFIG_DIR / "available_games.json"
 
+# Views of the whole snapshot served through snapshot_response(); dashboard/serve.py
+# pre-encodes these once in its master process and shares them with all workers
+SNAPSHOT_VIEWS = {
+    "games": games_view,
+    "players": players_view,
+    "discounts": discounts_view,
+    "prices": prices_view,
+    "rollups-all": rollups_view,
+    **{f"rollups-{dimension}": partial(rollups_view, dimension=dimension) for dimension in ROLLUP_DIMENSIONS},
+}
+
+REQUEST_SECONDS = metrics.histogram("dashboard_request_seconds", "Dashboard response time by route", ("route",))
+REQUESTS = metrics.counter("dashboard_requests_total", "Dashboard requests by route and status", ("route", "status"))
+SNAPSHOT_AGE = metrics.gauge("dashboard_snapshot_age_seconds", "Seconds since the producer last wrote the snapshot")
+STREAMS_REJECTED = metrics.counter("dashboard_streams_rejected_total",
+                                   "Event streams refused because the process had its maximum open")
+
+
+def parse_duration(value: str) -> int:
+    """Seconds from '90', '5m', '1h', '1d', '2w' or a resolution name like 'raw'"""
+    value = value.strip().lower()
+    if value in RESOLUTIONS:
+        return RESOLUTIONS[value] or 1
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+    if value and value[-1] in units:
+        return int(value[:-1]) * units[value[-1]]
+    return int(value)
+
+
+GAMES_QUERY_PARAMS = ("limit", "cursor", "sort", "order", "genre", "on_sale", "is_free", "min_players")
+
+
+def _parse_bool(name: str, value: Optional[str]) -> Optional[bool]:
+    if value is None or value == "":
+        return None
+    lowered = value.strip().lower()
+    if lowered in ("1", "true", "yes"):
+        return True
+    if lowered in ("0", "false", "no"):
+        return False
+    raise QueryError(f"{name} must be true or false")
+
+
+def _parse_int(name: str, value: Optional[str]) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise QueryError(f"{name} must be an integer")
+
+
+def parse_fields(args) -> Optional[List[str]]:
+    """?fields=a,b,c (or repeated) -> field names, None when not given"""
+    if "fields" not in args:
+        return None
+    return [f.strip() for value in args.getlist("fields") for f in value.split(",") if f.strip()]
+
+
+def parse_games_query(args) -> Dict[str, Any]:
+    """GameIndex.query() keyword arguments from /api/steam/games query parameters"""
+    return {
+        "sort": args.get("sort", "").strip().lower(),
+        "order": args.get("order", "").strip().lower(),
+        "genres": [g.strip() for value in args.getlist("genre") for g in value.split(",") if g.strip()],
+        "on_sale": _parse_bool("on_sale", args.get("on_sale")),
+        "is_free": _parse_bool("is_free", args.get("is_free")),
+        "min_players": _parse_int("min_players", args.get("min_players")),
+        "fields": parse_fields(args),
+        "limit": _parse_int("limit", args.get("limit")),
+        "cursor": args.get("cursor") or None,
+    }
+
+
+def worker_metrics_file(metrics_dir: Path, pid: int) -> Path:
+    """Where pre-forked worker `pid` keeps its rendered metrics for the other workers"""
+    return metrics_dir / f"worker-{pid}.prom"
+
+
+def create_app(shared_views: Optional[SharedViews] = None, max_streams: int = STREAM_MAX_OPEN,
+               metrics_dir: Optional[Path] = None) -> Flask:
+    """The dashboard app
 
-def create_app() -> Flask:
+    `shared_views` is the view pack of dashboard/serve.py's master and
+    `metrics_dir` the directory its workers write their metrics to.
+    """
     app = Flask(
         __name__,
         template_folder=str(ROOT / "templates"),
         static_folder=str(ROOT / "static"),
     )
 
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            # Label by URL rule, not path, so /api/steam/history/<id> stays one series
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            REQUEST_SECONDS.labels(route).observe(time.perf_counter() - started)
+            REQUESTS.labels(route, response.status_code).inc()
+        return response
+
+    @app.get("/metrics")
+    def prometheus_metrics():
+        """Dashboard and producer metrics in the Prometheus text format"""
+        stamp = file_stamp(STEAM_SNAPSHOT_FILE)
+        if stamp is not None:
+            SNAPSHOT_AGE.set(max(0.0, time.time() - stamp[0] / 1e9))
+        if metrics_dir is None:
+            body = metrics.REGISTRY.render()
+        else:
+            # A scrape lands on one worker, which reports all of them: its own series live,
+            # the others' from their last textfile, each labelled with the worker's pid
+            own = worker_metrics_file(metrics_dir, os.getpid())
+            texts = [metrics.REGISTRY.render({WORKER_LABEL: str(os.getpid())})]
+            for path in sorted(metrics_dir.glob("worker-*.prom")):
+                if path == own:
+                    continue
+                try:
+                    texts.append(path.read_text(encoding="utf-8"))
+                except OSError:
+                    continue  # worker just exited
+            body = metrics.merge_rendered(texts)
+        try:
+            body += PRODUCER_METRICS_FILE.read_text(encoding="utf-8")
+        except OSError:
+            pass  # producer not running yet
+        return Response(body, mimetype="text/plain; version=0.0.4")
+
     @app.get("/")
     def index():
         """Redirect to Steam dashboard"""
@@ -39,44 +217,333 @@ def create_app() -> Flask:
         """Steam games dashboard page"""
         return render_template("steam.html")
     
+    cache = ResponseCache()
+    app.extensions["response_cache"] = cache
+    if shared_views is not None:
+        app.extensions["shared_views"] = shared_views
+
+    # With a view pack, everything below reads the snapshot from it; the cache
+    # paths parse it in this process (development server, or no pack yet)
+
+    def snapshot_response(view: str):
+        """Serve a view of the producer snapshot from the shared view pack or the response cache"""
+        if shared_views is not None:
+            entry = shared_views.get(view)
+            if entry is not None:
+                return send_shared(view, entry)
+        build = SNAPSHOT_VIEWS[view]
+        return cache.file_response(
+            STEAM_SNAPSHOT_FILE, view, lambda data: build(data or empty_snapshot()), loader=load_snapshot,
+        )
+
+    def indexed_snapshot():
+        """Current snapshot and its app_id -> record map, built once per snapshot"""
+        shared = shared_views.snapshot() if shared_views is not None else None
+        if shared is not None:
+            return shared.view(), shared.by_id
+
+        def build(data):
+            data = data or empty_snapshot()
+            return data, games_by_id(data)
+        try:
+            return cache.derived(STEAM_SNAPSHOT_FILE, "by_id", build, loader=load_snapshot)
+        except Exception:
+            return build(None)
+
+    def query_index() -> GameIndex:
+        """Sort/filter indexes over the current snapshot, built once per snapshot"""
+        shared = shared_views.snapshot() if shared_views is not None else None
+        if shared is not None:
+            return shared.index()
+
+        def build(data):
+            return GameIndex(data or empty_snapshot())
+        try:
+            return cache.derived(STEAM_SNAPSHOT_FILE, "query_index", build, loader=load_snapshot)
+        except Exception:
+            return build(None)
+
     @app.get("/api/steam/games")
     def steam_games():
-        """Get latest Steam game data"""
-        if STEAM_GAMES_FILE.exists():
+        """Get latest Steam game data
+        
+        ?since=<change_seq> returns only what changed. limit/cursor paginate,
+        sort=players|discount|price|name (&order=asc|desc) orders, genre,
+        on_sale, is_free and min_players filter, and fields=a,b picks fields.
+        """
+        from flask import request
+        since_arg = request.args.get("since")
+        querying = any(param in request.args for param in GAMES_QUERY_PARAMS)
+        if since_arg is None and not querying and "fields" not in request.args:
+            return snapshot_response("games")
+        if since_arg is None:
             try:
-                with open(STEAM_GAMES_FILE, "r", encoding="utf-8") as f:
-                    data: Dict[str, Any] = json.load(f)
-            except Exception as e:
-                data = {"updated_at": 0, "game_count": 0, "games": [], "error": str(e)}
+                return jsonify(query_index().query(**parse_games_query(request.args)))
+            except QueryError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+
+        if querying:
+            return jsonify({"success": False, "error": "since can only be combined with fields"}), 400
+        try:
+            since = int(since_arg)
+        except ValueError:
+            return jsonify({"success": False, "error": "since must be an integer"}), 400
+        fields = parse_fields(request.args)
+
+        snapshot, by_id = indexed_snapshot()
+        delta = changes_since(snapshot, since, by_id)
+        view = games_view(snapshot)
+        view["since"] = since
+        if delta is None:
+            # Change log no longer reaches back to `since`: send everything
+            view["full"] = True
+            view["removed"] = []
+            view["games"] = list(view["games"])  # decodes the records when they come from the view pack
         else:
-            data = {"updated_at": 0, "game_count": 0, "games": []}
-        return jsonify(data)
+            view["full"] = False
+            view["games"], view["removed"] = delta
+        if fields is not None:
+            wanted = ["app_id"] + [f for f in fields if f != "app_id"]
+            view["games"] = [{f: game[f] for f in wanted if f in game} for game in view["games"]]
+        return jsonify(view)
     
     @app.get("/api/steam/players")
     def steam_players():
         """Get player statistics"""
-        if STEAM_PLAYERS_FILE.exists():
-            try:
-                with open(STEAM_PLAYERS_FILE, "r", encoding="utf-8") as f:
-                    data: Dict[str, Any] = json.load(f)
-            except Exception as e:
-                data = {"updated_at": 0, "total_games": 0, "total_players": 0, "games": [], "error": str(e)}
-        else:
-            data = {"updated_at": 0, "total_games": 0, "total_players": 0, "games": []}
-        return jsonify(data)
+        return snapshot_response("players")
     
     @app.get("/api/steam/discounts")
     def steam_discounts():
         """Get current discounts"""
-        if STEAM_DISCOUNTS_FILE.exists():
+        return snapshot_response("discounts")
+
+    @app.get("/api/steam/prices")
+    def steam_prices():
+        """Prices of every game across storefront regions (producer --regions), with per-region sale stats"""
+        return snapshot_response("prices")
+
+    @app.get("/api/steam/prices/<int:app_id>")
+    def steam_game_prices(app_id: int):
+        """One game's prices across regions"""
+        _, by_id = indexed_snapshot()
+        game = by_id.get(app_id)
+        if game is None:
+            return jsonify({"success": False, "error": f"app {app_id} is not in the snapshot"}), 404
+        row = price_comparison(game)
+        if row is None:
+            return jsonify({"success": False, "error": f"app {app_id} is not priced in several regions"}), 404
+        return jsonify(row)
+
+    @app.get("/api/steam/rollups")
+    def steam_rollups():
+        """Stats per genre, category, publisher, developer and discount bucket
+
+        ?dimension=genre returns one dimension; limit=N keeps its top N groups.
+        Rollups are maintained by the producer, so this never scans the games.
+        """
+        dimension = request.args.get("dimension") or None
+        if dimension is not None and dimension not in ROLLUP_DIMENSIONS:
+            return jsonify({"success": False, "error": f"dimension must be one of {', '.join(ROLLUP_DIMENSIONS)}"}), 400
+        try:
+            limit = _parse_int("limit", request.args.get("limit"))
+            if limit is not None and limit < 1:
+                raise QueryError("limit must be at least 1")
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        if limit is None:
+            return snapshot_response(f"rollups-{dimension or 'all'}")
+        full = shared_views.parsed("rollups-all") if shared_views is not None else None
+        if full is None:
             try:
-                with open(STEAM_DISCOUNTS_FILE, "r", encoding="utf-8") as f:
-                    data: Dict[str, Any] = json.load(f)
-            except Exception as e:
-                data = {"updated_at": 0, "discount_count": 0, "discounts": [], "error": str(e)}
+                full = cache.derived(STEAM_SNAPSHOT_FILE, "rollups",
+                                     lambda data: rollups_view(data or empty_snapshot()), loader=load_snapshot)
+            except Exception:
+                full = rollups_view(empty_snapshot())
+        view = {k: v[:limit] if k in ROLLUP_DIMENSIONS else v for k, v in full.items()
+                if dimension is None or k not in ROLLUP_DIMENSIONS or k == dimension}
+        return jsonify(view)
+
+    @app.get("/api/steam/alerts")
+    def steam_alerts():
+        """Latest alerts raised by the producer's rules, newest first (?limit=, default 50, ?app_id=)"""
+        try:
+            limit = _parse_int("limit", request.args.get("limit"))
+            app_id = _parse_int("app_id", request.args.get("app_id"))
+            if limit is not None and not 1 <= limit <= 1000:
+                raise QueryError("limit must be between 1 and 1000")
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        limit = limit or 50
+        if app_id is None:
+            alerts = recent_alerts(STEAM_ALERTS_FILE, limit)
+        else:
+            alerts = [a for a in recent_alerts(STEAM_ALERTS_FILE, 1000) if a.get("app_id") == app_id][:limit]
+        return jsonify({"alerts": alerts, "count": len(alerts)})
+
+    history = TimeSeriesStore(STEAM_HISTORY_DIR)
+
+    @app.get("/api/steam/history/<int:app_id>")
+    def steam_history(app_id: int):
+        """Downsampled player/price history: ?from=&to= (epoch seconds) &step= (e.g. 1h)"""
+        from flask import request
+        try:
+            end = int(request.args.get("to") or time.time())
+            start = int(request.args.get("from") or end - 86400)
+            step_arg = request.args.get("step")
+            if step_arg:
+                step = parse_duration(step_arg)
+            else:
+                span = max(1, end - start)
+                step = next((s for s in HISTORY_STEPS if span / s <= HISTORY_MAX_POINTS), HISTORY_STEPS[-1])
+        except ValueError:
+            return jsonify({"success": False, "error": "Invalid from/to/step"}), 400
+        if start >= end or step <= 0:
+            return jsonify({"success": False, "error": "Invalid range"}), 400
+        return jsonify(history.query(app_id, start, end, step))
+
+    thumbnails = ThumbnailCache(STEAM_THUMBNAILS_DIR, max_bytes=THUMBNAIL_CACHE_BYTES)
+    app.extensions["thumbnails"] = thumbnails
+
+    @app.get("/img/<int:app_id>")
+    def game_image(app_id: int):
+        """Thumbnail of a game's header image: ?size=sm|md|lg, ?v=<url version> to cache it for good
+
+        Until the thumbnail is cached this redirects to the original image.
+        """
+        size = request.args.get("size") or DEFAULT_SIZE
+        if size not in SIZES:
+            return jsonify({"success": False, "error": f"size must be one of {', '.join(SIZES)}"}), 400
+        _, by_id = indexed_snapshot()
+        game = by_id.get(app_id)
+        url = game.get("header_image") if game is not None else None
+        if not url:
+            return jsonify({"success": False, "error": f"no header image for app {app_id}"}), 404
+        thumbnail = thumbnails.get(app_id, url, size)
+        if thumbnail is None:
+            response = redirect(url)
+            response.headers["Cache-Control"] = "no-store"
+            return response
+        response = send_file(thumbnail.path, mimetype=thumbnail.mimetype, etag=thumbnail.digest, conditional=True)
+        if request.args.get("v") == url_version(url):
+            # The URL names this exact image: a new header_image gets a new ?v=
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
         else:
-            data = {"updated_at": 0, "discount_count": 0, "discounts": []}
-        return jsonify(data)
+            response.headers["Cache-Control"] = f"public, max-age={THUMBNAIL_MAX_AGE}"
+        return response
+
+    export_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+
+    @app.get("/api/steam/export")
+    def steam_export():
+        """Stream games (or history with kind=history) as NDJSON or CSV, see dashboard/export.py
+
+        format=ndjson|csv, fields=a,b (games), since=<change_seq> (games),
+        app_id=a,b, resolution=raw|1m|1h|1d & from= & to= (history, epoch
+        seconds), cursor=<key of the last row received> to resume.
+        """
+        try:
+            kind = parse_kind(request.args.get("kind"))
+            fmt = parse_format(request.args.get("format"))
+            cursor = parse_cursor(kind, request.args.get("cursor"))
+            app_ids = [_parse_int("app_id", a.strip()) for value in request.args.getlist("app_id")
+                       for a in value.split(",") if a.strip()]
+            if kind == "games":
+                fields = check_fields(parse_fields(request.args))
+                since = _parse_int("since", request.args.get("since"))
+            else:
+                resolution = check_resolution(request.args.get("resolution") or "raw")
+                start = _parse_int("from", request.args.get("from")) or 0
+                end = _parse_int("to", request.args.get("to")) or int(time.time()) + 1
+                if start >= end:
+                    raise QueryError("from must be before to")
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        if not export_slots.acquire(blocking=False):
+            EXPORTS_REJECTED.inc()
+            return jsonify({"success": False, "error": "too many exports running, retry later"}), 503, {
+                "Retry-After": str(EXPORT_RETRY_AFTER)}
+        try:
+            if kind == "games":
+                after = cursor[0] if cursor else None
+                shared = shared_views.snapshot() if shared_views is not None else None
+                try:
+                    if shared is not None:
+                        seq, rows = shared_games(shared, after, since, app_ids)
+                    else:
+                        seq, rows = snapshot_games(STEAM_SNAPSHOT_FILE, after, since, app_ids)
+                except FileNotFoundError:
+                    seq, rows = 0, iter(())
+                pieces = encode_games(rows, fmt, fields)
+                headers = {"X-Snapshot-Seq": str(seq)}
+                filename = export_filename("games", fmt, seq)
+            else:
+                pieces = encode_history(history_rows(history, resolution, start, end, app_ids, cursor), fmt, resolution)
+                headers = {}
+                filename = export_filename("history", fmt, resolution)
+            compress = "gzip" in request.accept_encodings
+            headers.update({
+                "Content-Disposition": f'attachment; filename="{filename}"',
+                "Cache-Control": "no-store",
+                "Vary": "Accept-Encoding",
+                "X-Accel-Buffering": "no",
+            })
+            if compress:
+                headers["Content-Encoding"] = "gzip"
+            response = Response(stream_body(pieces, compress), mimetype=EXPORT_FORMATS[fmt], headers=headers)
+        except BaseException:
+            export_slots.release()
+            raise
+        response.call_on_close(export_slots.release)
+        return response
+
+    watchlist = open_watchlist(WATCHLIST_DB)
+    app.extensions["watchlist"] = watchlist
+    broadcaster = SnapshotBroadcaster(STEAM_SNAPSHOT_FILE, watchlist, cache, alerts=AlertTail(STEAM_ALERTS_FILE),
+                                      shared=shared_views)
+    app.extensions["snapshot_broadcaster"] = broadcaster
+    stream_slots = threading.BoundedSemaphore(max_streams)
+
+    @app.get("/api/steam/stream")
+    def steam_stream():
+        """Server-Sent Events: one event per new snapshot (changed games only), watchlist change or alert"""
+        if not stream_slots.acquire(blocking=False):
+            STREAMS_REJECTED.inc()
+            return jsonify({"success": False, "error": "too many open event streams"}), 503, {
+                "Retry-After": str(STREAM_RETRY_AFTER)}
+        try:
+            q, initial = broadcaster.subscribe()
+        except BaseException:
+            stream_slots.release()
+            raise
+        detach = request.environ.get(DETACH_ENVIRON_KEY)
+        if detach is not None:
+            # Streams are capped by max_streams instead; the request threads stay free for everything else
+            detach()
+
+        def events():
+            try:
+                yield "retry: 3000\n\n"
+                yield from initial
+                while True:
+                    try:
+                        message = q.get(timeout=STREAM_KEEPALIVE)
+                    except queue.Empty:
+                        yield ": keep-alive\n\n"
+                        continue
+                    if message is None:
+                        return
+                    yield message
+            finally:
+                broadcaster.unsubscribe(q)
+
+        response = Response(
+            stream_with_context(events()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        response.call_on_close(stream_slots.release)
+        return response
     
     @app.get("/games")
     def games_manager():
@@ -86,115 +553,82 @@ def create_app() -> Flask:
     @app.get("/api/games/available")
     def available_games():
         """Get list of available games"""
-        if AVAILABLE_GAMES_FILE.exists():
-            try:
-                with open(AVAILABLE_GAMES_FILE, "r", encoding="utf-8") as f:
-                    data: Dict[str, Any] = json.load(f)
-            except Exception as e:
-                data = {"games": [], "error": str(e)}
-        else:
-            data = {"games": []}
-        return jsonify(data)
+        return cache.file_response(AVAILABLE_GAMES_FILE, "available", lambda data: data or {"games": []})
     
     @app.get("/api/games/watchlist")
     def get_watchlist():
-        """Get current watchlist"""
-        if WATCHLIST_FILE.exists():
-            try:
-                with open(WATCHLIST_FILE, "r", encoding="utf-8") as f:
-                    data: Dict[str, Any] = json.load(f)
-            except Exception as e:
-                data = {"games": [], "error": str(e)}
-        else:
-            data = {"games": []}
-        return jsonify(data)
+        """Get current watchlist (ETag is the store's change counter)"""
+        response = jsonify(watchlist.document())
+        response.set_etag(f"watchlist-{watchlist.version()}")
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
     
     @app.post("/api/games/watchlist")
     def update_watchlist():
-        """Update watchlist"""
-        from flask import request
+        """Replace the whole watchlist"""
+        new_watchlist = request.get_json(silent=True)
+        if not new_watchlist or not isinstance(new_watchlist.get("games"), list):
+            return jsonify({"success": False, "error": "Invalid data"}), 400
+        info = new_watchlist.get("game_info") or {}
+        entries = [{"app_id": app_id, "name": info.get(str(app_id))} for app_id in new_watchlist["games"]]
         try:
-            new_watchlist = request.get_json()
-            if not new_watchlist or "games" not in new_watchlist:
-                return jsonify({"success": False, "error": "Invalid data"}), 400
-            
-            # Ensure config directory exists
-            CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-            
-            # Save watchlist
-            with open(WATCHLIST_FILE, "w", encoding="utf-8") as f:
-                json.dump(new_watchlist, f, indent=2)
-            
-            return jsonify({"success": True, "message": "Watchlist updated"})
-        except Exception as e:
+            result = watchlist.replace(entries, new_watchlist.get("description"))
+        except WatchlistError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        except sqlite3.Error as e:
+            return jsonify({"success": False, "error": str(e)}), 500
+        broadcaster.poke()
+        return jsonify({"success": True, "message": "Watchlist updated", **result})
+    
+    @app.patch("/api/games/watchlist")
+    def patch_watchlist():
+        """Add and remove many games in one transaction: {"add": [id | {app_id, name}], "remove": [id]}"""
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({"success": False, "error": "Expected a JSON object with add/remove lists"}), 400
+        add, remove = body.get("add") or [], body.get("remove") or []
+        if not isinstance(add, list) or not isinstance(remove, list):
+            return jsonify({"success": False, "error": "add and remove must be lists"}), 400
+        try:
+            result = watchlist.apply(add=add, remove=remove)
+        except WatchlistError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        except sqlite3.Error as e:
             return jsonify({"success": False, "error": str(e)}), 500
+        if result["added"] or result["removed"]:
+            broadcaster.poke()
+        return jsonify({"success": True, "game_count": len(watchlist), **result})
 
     @app.delete("/api/games/watchlist/<int:app_id>")
     def remove_from_watchlist(app_id: int):
         """Remove a single game from the watchlist by app_id"""
         try:
-            # Load current watchlist (create empty structure if missing)
-            if WATCHLIST_FILE.exists():
-                with open(WATCHLIST_FILE, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            else:
-                data = {"description": "Steam games watchlist", "games": [], "game_info": {}}
-
-            games = set(data.get("games", []))
-            info = data.get("game_info", {})
-
-            if app_id not in games:
-                return jsonify({"success": False, "error": "Game not in watchlist"}), 404
-
-            # Remove
-            games.discard(app_id)
-            if str(app_id) in info:
-                info.pop(str(app_id), None)
-            if app_id in info:
-                info.pop(app_id, None)
-
-            # Persist
-            CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-            with open(WATCHLIST_FILE, "w", encoding="utf-8") as f:
-                json.dump({
-                    "description": data.get("description", "Steam games watchlist"),
-                    "games": sorted(list(games)),
-                    "game_info": info,
-                }, f, indent=2)
-
-            return jsonify({"success": True, "message": f"Removed {app_id} from watchlist"})
-        except Exception as e:
+            result = watchlist.apply(remove=[app_id])
+        except sqlite3.Error as e:
             return jsonify({"success": False, "error": str(e)}), 500
+        if not result["removed"]:
+            return jsonify({"success": False, "error": "Game not in watchlist"}), 404
+        broadcaster.poke()
+        return jsonify({"success": True, "message": f"Removed {app_id} from watchlist", "version": result["version"]})
+
+    catalog = AppCatalog(STEAM_DATA_DIR / CATALOG_FILENAME, AVAILABLE_GAMES_FILE,
+                         api_key=os.environ.get("STEAM_API_KEY"))
+    app.extensions["app_catalog"] = catalog
 
     @app.get("/api/steam/search")
     def steam_search():
-        """Search Steam store for apps by name (server-side helper for UI)"""
+        """Search all Steam apps by name (local catalog; Steam storesearch until it is downloaded)"""
         from flask import request
         q = request.args.get("q", "").strip()
-        limit = int(request.args.get("limit", "50"))
+        try:
+            limit = max(1, min(200, int(request.args.get("limit", "50"))))
+        except ValueError:
+            return jsonify({"success": False, "error": "limit must be an integer", "results": []}), 400
         if not q or len(q) < 2:
             return jsonify({"success": True, "count": 0, "results": []})
         try:
-            url = "https://store.steampowered.com/api/storesearch"
-            params = {"term": q, "cc": "us", "l": "english"}
-            r = requests.get(url, params=params, timeout=10)
-            r.raise_for_status()
-            data = r.json() if r.headers.get("content-type", "").startswith("application/json") else {}
-            items = data.get("items", [])
-            results = []
-            for it in items[:limit]:
-                # Normalize fields we use in Game Manager
-                app_id = it.get("id") or it.get("appid")
-                name = it.get("name")
-                if not app_id or not name:
-                    continue
-                results.append({
-                    "app_id": app_id,
-                    "name": name,
-                    "category": "Steam",
-                    "genre": (it.get("type") or "Game"),
-                })
-            return jsonify({"success": True, "count": len(results), "results": results})
+            results, source = catalog.search(q, limit)
+            return jsonify({"success": True, "count": len(results), "source": source, "results": results})
         except Exception as e:
             return jsonify({"success": False, "error": str(e), "results": []}), 500
 
@@ -207,6 +641,7 @@ if __name__ == "main__":  # pragma: no cover
 
 
 if __name__ == "__main__":
+    # Development server; use dashboard/serve.py in production
     # Allow host/port override via env vars
     host = os.environ.get("FLASK_HOST", "127.0.0.1")
     port = int(os.environ.get("FLASK_PORT", "8080"))
@@ -0,0 +1,352 @@
+"""
+Local catalog of every Steam app, searchable without network
+
+The full app list (~200k id/name pairs) is downloaded in bulk in a
+background thread, stored gzipped under data/steam, and refreshed once a
+day. Searches run against in-memory indexes:
+
+- word prefix: sorted (token, app) pairs, so "elde" finds "Elden Ring"
+  while the user is still typing
+- trigrams: posting lists per 3-gram of the normalized name; a query only
+  walks its rarest trigrams (within a posting budget), so typos and
+  partial words still match without touching common grams like "the"
+
+Candidates are ranked by trigram overlap plus bonuses for exact, prefix
+and whole-word matches. config/available_games.json is indexed separately
+(small, reloaded when the file changes) and wins over catalog entries, so
+curated category/genre labels show up and curated games rank first.
+
+Until the catalog has been downloaded once, searches fall back to Steam's
+storesearch through a shared session with an LRU cache in front of it.
+"""
+from __future__ import annotations
+
+import bisect
+import gzip
+import heapq
+import json
+import re
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from dashboard.response_cache import Stamp, file_stamp
+from snapshot import atomic_write_bytes
+
+APP_LIST_URL = "https://api.steampowered.com/ISteamApps/GetAppList/v2/"
+STORE_APP_LIST_URL = "https://api.steampowered.com/IStoreService/GetAppList/v1/"
+STORE_SEARCH_URL = "https://store.steampowered.com/api/storesearch"
+
+CATALOG_FILENAME = "app_catalog.json.gz"
+REFRESH_INTERVAL = 24 * 3600
+RETRY_INTERVAL = 15 * 60
+
+# Most postings walked per query (rarest trigrams first)
+POSTING_BUDGET = 8000
+# Most entries taken from one word-prefix range (shortest names first)
+PREFIX_CAP = 100
+# Trigram candidates re-scored per query
+RESCORE_TOP = 100
+# Weaker matches are dropped
+MIN_SCORE = 0.25
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+# (app_id, name, category, genre)
+Entry = Tuple[int, str, Optional[str], Optional[str]]
+
+
+def normalize(text: str) -> str:
+    """Casefolded words separated by single spaces ("Half-Life 2" -> "half life 2")"""
+    return _NON_WORD.sub(" ", text.casefold()).strip()
+
+
+def trigrams(norm: str) -> set:
+    padded = f" {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CatalogIndex:
+    """Immutable prefix + trigram index over a list of entries"""
+
+    def __init__(self, entries: Iterable[Entry]):
+        self.ids = array("I")
+        self.names: List[str] = []
+        self.norms: List[str] = []
+        self.labels: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+        self.positions: Dict[int, int] = {}
+
+        grams: Dict[str, List[int]] = {}
+        pairs: List[Tuple[str, int, int]] = []
+        for app_id, name, category, genre in entries:
+            norm = normalize(name)
+            if not norm or app_id in self.positions:
+                continue
+            pos = len(self.names)
+            self.positions[app_id] = pos
+            self.ids.append(app_id)
+            self.names.append(name)
+            self.norms.append(norm)
+            if category or genre:
+                self.labels[pos] = (category, genre)
+            for gram in trigrams(norm):
+                grams.setdefault(gram, []).append(pos)
+            for token in set(norm.split()):
+                pairs.append((token, len(norm), pos))
+
+        self._grams = {gram: array("I", postings) for gram, postings in grams.items()}
+        pairs.sort()
+        self._tokens = [token for token, _, _ in pairs]
+        self._token_ids = array("I", (pos for _, _, pos in pairs))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _prefix(self, tokens: List[str]) -> List[int]:
+        """Entries with a word starting with the query's most selective token"""
+        ranges = []
+        for token in tokens:
+            lo = bisect.bisect_left(self._tokens, token)
+            ranges.append((bisect.bisect_left(self._tokens, token + "\uffff", lo) - lo, lo))
+        size, lo = min(ranges)
+        return list(self._token_ids[lo:lo + min(size, PREFIX_CAP)])
+
+    def _trigram_candidates(self, grams: set) -> List[int]:
+        postings = sorted((self._grams[g] for g in grams if g in self._grams), key=len)
+        counts: Counter = Counter()
+        walked = 0
+        for posting in postings:
+            # Grams too common to walk are left to the prefix index
+            if walked + len(posting) > POSTING_BUDGET:
+                break
+            counts.update(posting)
+            walked += len(posting)
+        return [pos for pos, _ in counts.most_common(RESCORE_TOP)]
+
+    def search(self, query: str, limit: int) -> List[Tuple[float, int]]:
+        """(score, position) of the best matches, best first"""
+        q = normalize(query)
+        if not q:
+            return []
+        tokens = q.split()
+        qgrams = trigrams(q)
+
+        pool = set(self._prefix(tokens))
+        if len(q) >= 3:
+            pool.update(self._trigram_candidates(qgrams))
+
+        scored = []
+        for pos in pool:
+            norm = self.norms[pos]
+            name_grams = trigrams(norm)
+            shared = len(qgrams & name_grams)
+            # Mostly how much of the query is covered, a little how close the lengths are
+            score = 0.7 * shared / len(qgrams) + 0.3 * shared / len(qgrams | name_grams)
+            if norm == q:
+                score += 2.0
+            elif norm.startswith(q):
+                score += 1.0
+            words = norm.split()
+            if all(any(w.startswith(t) for w in words) for t in tokens):
+                score += 0.5
+            if score >= MIN_SCORE:
+                scored.append((score, pos))
+        return heapq.nlargest(limit, scored)
+
+    def result(self, pos: int) -> Dict[str, Any]:
+        category, genre = self.labels.get(pos, (None, None))
+        return {
+            "app_id": self.ids[pos],
+            "name": self.names[pos],
+            "category": category or "Steam",
+            "genre": genre or "Game",
+        }
+
+
+class UpstreamSearch:
+    """Steam storesearch behind an LRU cache with a TTL"""
+
+    def __init__(self, session: Optional[requests.Session] = None, maxsize: int = 256, ttl: float = 600.0,
+                 timeout: float = 5.0):
+        self.session = session or requests.Session()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timeout = timeout
+        self._cache: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        key = normalize(query)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and now - cached[0] < self.ttl:
+                self._cache.move_to_end(key)
+                return cached[1][:limit]
+
+        r = self.session.get(STORE_SEARCH_URL, params={"term": query, "cc": "us", "l": "english"},
+                             timeout=self.timeout)
+        r.raise_for_status()
+        data = r.json() if r.headers.get("content-type", "").startswith("application/json") else {}
+        results = []
+        for it in data.get("items", []):
+            app_id = it.get("id") or it.get("appid")
+            name = it.get("name")
+            if app_id and name:
+                results.append({"app_id": app_id, "name": name, "category": "Steam",
+                                "genre": it.get("type") or "Game"})
+
+        with self._lock:
+            self._cache[key] = (now, results)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return results[:limit]
+
+
+def fetch_app_list(session: requests.Session, api_key: Optional[str] = None, timeout: float = 60.0) -> List[Tuple[int, str]]:
+    """Every (app_id, name) on Steam; paged IStoreService with a key, GetAppList v2 without"""
+    apps: List[Tuple[int, str]] = []
+    if api_key:
+        last_appid = 0
+        while True:
+            r = session.get(STORE_APP_LIST_URL, timeout=timeout, params={
+                "key": api_key, "max_results": 50000, "last_appid": last_appid,
+                "include_games": "true", "include_software": "true",
+            })
+            r.raise_for_status()
+            body = r.json().get("response", {})
+            apps.extend((a["appid"], a.get("name", "")) for a in body.get("apps", []))
+            if not body.get("have_more_results"):
+                break
+            last_appid = body.get("last_appid", apps[-1][0] if apps else 0)
+    else:
+        r = session.get(APP_LIST_URL, timeout=timeout)
+        r.raise_for_status()
+        apps = [(a["appid"], a.get("name", "")) for a in r.json().get("applist", {}).get("apps", [])]
+    return [(app_id, name.strip()) for app_id, name in apps if name and name.strip()]
+
+
+class AppCatalog:
+    """The on-disk app list plus curated games, with a background refresher
+
+    The refresher thread starts on the first search, so processes that
+    never search (tests, benchmarks) never touch the network.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        curated_path: Path,
+        refresh_interval: float = REFRESH_INTERVAL,
+        api_key: Optional[str] = None,
+        fetch: Optional[Callable[[], List[Tuple[int, str]]]] = None,
+        upstream: Optional[UpstreamSearch] = None,
+    ):
+        self.path = Path(path)
+        self.curated_path = Path(curated_path)
+        self.refresh_interval = refresh_interval
+        self.session = requests.Session()
+        self._fetch = fetch or (lambda: fetch_app_list(self.session, api_key))
+        self.upstream = upstream or UpstreamSearch(self.session)
+        self.index = CatalogIndex(())
+        self.fetched_at = 0.0
+        self._curated = CatalogIndex(())
+        self._curated_stamp: Stamp = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return len(self.index) > 0
+
+    def load(self) -> bool:
+        """Index the stored app list, if there is one"""
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.index = CatalogIndex((app_id, name, None, None) for app_id, name in data.get("apps", []))
+        self.fetched_at = data.get("fetched_at", 0)
+        return True
+
+    def refresh(self):
+        """Download the app list, store it and swap in a new index"""
+        apps = self._fetch()
+        fetched_at = time.time()
+        payload = json.dumps({"fetched_at": fetched_at, "apps": apps}, separators=(",", ":"), ensure_ascii=False)
+        atomic_write_bytes(self.path, gzip.compress(payload.encode("utf-8"), compresslevel=6))
+        self.index = CatalogIndex((app_id, name, None, None) for app_id, name in apps)
+        self.fetched_at = fetched_at
+        print(f"📚 Steam app catalog refreshed: {len(self.index):,} apps")
+
+    def _run(self):
+        if not self.ready:
+            self.load()
+        while True:
+            wait = self.fetched_at + self.refresh_interval - time.time()
+            if wait <= 0:
+                try:
+                    self.refresh()
+                    wait = self.refresh_interval
+                except (requests.RequestException, ValueError, OSError) as e:
+                    print(f"⚠️  Steam app catalog refresh failed: {e}")
+                    wait = RETRY_INTERVAL
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="app-catalog", daemon=True)
+                self._thread.start()
+
+    def curated(self) -> CatalogIndex:
+        """Index over available_games.json, rebuilt when the file changes"""
+        stamp = file_stamp(self.curated_path)
+        if stamp != self._curated_stamp:
+            entries: List[Entry] = []
+            try:
+                with open(self.curated_path, "r", encoding="utf-8") as f:
+                    for game in json.load(f).get("games", []):
+                        entries.append((int(game["app_id"]), game.get("name", ""),
+                                        game.get("category"), game.get("genre")))
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+            self._curated = CatalogIndex(entries)
+            self._curated_stamp = stamp
+        return self._curated
+
+    def search(self, query: str, limit: int = 50) -> Tuple[List[Dict[str, Any]], str]:
+        """Ranked results and where they came from ("catalog", "steam", or "local" when offline)"""
+        self.start()
+        curated = self.curated()
+        index = self.index
+        if not len(index):
+            # Catalog not downloaded yet: curated games plus a cached upstream search
+            results = [curated.result(pos) for _, pos in curated.search(query, limit)]
+            seen = {r["app_id"] for r in results}
+            try:
+                upstream = self.upstream.search(query, limit)
+            except (requests.RequestException, ValueError):
+                return results, "local"
+            results += [r for r in upstream if r["app_id"] not in seen]
+            return results[:limit], "steam"
+
+        # Curated entries win on app_id and get a small boost
+        ranked: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        for score, pos in index.search(query, limit * 2):
+            ranked[index.ids[pos]] = (score, index.result(pos))
+        for score, pos in curated.search(query, limit):
+            app_id = curated.ids[pos]
+            previous = ranked.get(app_id, (0.0, None))[0]
+            ranked[app_id] = (max(score, previous) + 0.25, curated.result(pos))
+        best = heapq.nlargest(limit, ranked.values(), key=lambda item: item[0])
+        return [result for _, result in best], "catalog"
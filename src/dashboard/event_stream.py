@@ -0,0 +1,236 @@
+"""
+Server-Sent Events push for the Steam dashboard
+
+One background thread per dashboard process watches the producer snapshot,
+the watchlist and the producer's alerts file (a few stat() calls and a
+change-counter read every `poll_interval` seconds, and only while someone
+is subscribed). When one changes it pushes events to every open stream: for
+snapshots only the game records that changed, for the watchlist the (small)
+full document, and one `alert` event per new alert.
+
+Under dashboard/serve.py the snapshot events come ready-made from the view
+pack: the master diffs each new snapshot once (SnapshotEvents) and every
+worker forwards the same bytes, so no worker parses the snapshot for its
+streams. A worker that missed a pack in between sends the full state
+instead of a delta that does not apply.
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import queue
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from alert_log import AlertTail
+from dashboard.response_cache import ResponseCache, file_stamp
+from dashboard.shared_views import SharedSnapshot, SharedViews, iter_chunks
+from snapshot import empty_snapshot, load_snapshot
+from watchlist_store import WatchlistStore
+
+# Stamped per cycle by the producer; a record that differs only in these is unchanged
+VOLATILE_FIELDS = ("timestamp", "event_time")
+
+SUBSCRIBER_QUEUE_SIZE = 64
+
+_UNSEEN = object()
+
+
+def format_event(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+def _comparable(game: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in game.items() if k not in VOLATILE_FIELDS}
+
+
+def snapshot_event(snapshot: Dict[str, Any], games: List[Dict[str, Any]], removed: List[int], full: bool) -> Dict[str, Any]:
+    return {
+        "full": full,
+        "seq": snapshot.get("seq", 0),
+        "updated_at": snapshot.get("updated_at", 0),
+        "game_count": snapshot.get("game_count", 0),
+        "total_players": snapshot.get("total_players", 0),
+        "app_ids": [g["app_id"] for g in snapshot.get("games", [])],
+        "discount_ids": snapshot.get("discount_ids", []),
+        "player_ids": snapshot.get("player_ids", []),
+        "games": games,
+        "removed": removed,
+    }
+
+
+class SnapshotEvents:
+    """Successive snapshots as SSE `snapshot` events: deltas, and the full state for new streams"""
+
+    def __init__(self):
+        self.seq: Optional[int] = None
+        self._snapshot: Dict[str, Any] = empty_snapshot()
+        self._games: Dict[int, Dict[str, Any]] = {}
+        self._full: Optional[str] = None
+
+    def update(self, snapshot: Dict[str, Any]) -> Tuple[Optional[int], Optional[str]]:
+        """Take the next snapshot; returns the previous one's seq and the event with the changes since it
+
+        Both are None for the first snapshot.
+        """
+        games = {g["app_id"]: g for g in snapshot.get("games", [])}
+        changed = [
+            g for app_id, g in games.items()
+            if app_id not in self._games or _comparable(self._games[app_id]) != _comparable(g)
+        ]
+        removed = [app_id for app_id in self._games if app_id not in games]
+        base_seq = self.seq
+        self.seq, self._snapshot, self._games, self._full = snapshot.get("seq", 0), snapshot, games, None
+        if base_seq is None:
+            return None, None
+        return base_seq, format_event("snapshot", snapshot_event(snapshot, changed, removed, False), self.seq)
+
+    def full(self) -> str:
+        if self._full is None:
+            self._full = format_event("snapshot", snapshot_event(self._snapshot, self._snapshot.get("games", []), [], True),
+                                      self._snapshot.get("seq", 0))
+        return self._full
+
+
+Message = Union[str, bytes]
+
+
+class SnapshotBroadcaster:
+    """Watches the data files and fans change events out to SSE subscribers"""
+
+    def __init__(self, snapshot_path: Path, watchlist: WatchlistStore, cache: ResponseCache, poll_interval: float = 0.5,
+                 alerts: Optional[AlertTail] = None, shared: Optional[SharedViews] = None):
+        self.snapshot_path = snapshot_path
+        self.watchlist = watchlist
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.alerts = alerts
+        self.shared = shared
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._snapshot_stamp: Any = _UNSEEN
+        self._watchlist_stamp: Any = _UNSEEN
+        self._events = SnapshotEvents()
+        self._shared_snapshot: Optional[SharedSnapshot] = None
+        self._watchlist: Dict[str, Any] = {"games": []}
+
+    def subscribe(self) -> Tuple[queue.Queue, Iterable[Message]]:
+        """Register a stream; returns its queue and the events describing current state"""
+        with self._lock:
+            if not self._subscribers and self.alerts is not None:
+                # Alerts raised while nobody listened are not replayed
+                self.alerts.skip_to_end()
+            try:
+                # Changes not yet pushed go to the existing streams; the new one starts from full state
+                for message in self._refresh_locked():
+                    self._publish_locked(message)
+            except Exception as e:
+                print(f"SSE refresh failed: {e}")
+            q: queue.Queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+            self._subscribers.append(q)
+            if self._shared_snapshot is not None:
+                full: Iterable[Message] = iter_chunks(self._shared_snapshot.events.full)
+            else:
+                full = [self._events.full()]
+            initial = itertools.chain(full, [format_event("watchlist", self._watchlist)])
+            self._ensure_thread()
+        self._wakeup.set()
+        return q, initial
+
+    def poke(self):
+        """Check for changes now instead of at the next poll (e.g. after a local write)"""
+        self._wakeup.set()
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def close(self):
+        """End every open stream (e.g. on worker shutdown); EventSource clients reconnect"""
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+            for q in subscribers:
+                self._close(q)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="sse-broadcaster", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self._lock:
+                if not self._subscribers:
+                    continue
+                try:
+                    messages = self._refresh_locked()
+                except Exception as e:
+                    print(f"SSE refresh failed: {e}")
+                    continue
+                for message in messages:
+                    self._publish_locked(message)
+
+    def _publish_locked(self, message: Message):
+        for q in list(self._subscribers):
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # Slow client: drop it, EventSource reconnects and gets a full resync
+                self._subscribers.remove(q)
+                self._close(q)
+
+    @staticmethod
+    def _close(q: queue.Queue):
+        """Replace a subscriber's backlog with the end-of-stream marker"""
+        while True:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                break
+        q.put_nowait(None)
+
+    def _refresh_locked(self) -> List[Message]:
+        """Reload changed files; returns events for whatever changed"""
+        messages: List[Message] = []
+
+        if self.shared is not None:
+            current = self.shared.snapshot()
+            previous = self._shared_snapshot
+            if current is not None and current is not previous:
+                self._shared_snapshot = current
+                if previous is not None:
+                    events = current.events
+                    if events.delta is not None and events.base_seq == previous.head["seq"]:
+                        messages.append(bytes(events.delta))
+                    else:
+                        messages.append(bytes(events.full))
+        else:
+            stamp = file_stamp(self.snapshot_path)
+            if stamp != self._snapshot_stamp:
+                _, snapshot = self.cache.parsed(self.snapshot_path, load_snapshot, stamp)
+                self._snapshot_stamp = stamp
+                _, delta = self._events.update(snapshot or empty_snapshot())
+                if delta is not None:
+                    messages.append(delta)
+
+        version = self.watchlist.version()
+        if version != self._watchlist_stamp:
+            first = self._watchlist_stamp is _UNSEEN
+            self._watchlist_stamp, self._watchlist = version, self.watchlist.document()
+            if not first:
+                messages.append(format_event("watchlist", self._watchlist))
+
+        if self.alerts is not None:
+            messages.extend(format_event("alert", alert) for alert in self.alerts.read())
+
+        return messages
@@ -0,0 +1,296 @@
+"""
+Bulk export of the snapshot and history for /api/steam/export
+
+    GET /api/steam/export                                   every game, NDJSON
+    GET /api/steam/export?format=csv&fields=app_id,name,final_price
+    GET /api/steam/export?since=<change_seq>                games changed since
+    GET /api/steam/export?kind=history&resolution=1h&from=<t>&to=<t>&app_id=570,730
+
+Responses are generated row by row, so memory stays bounded however large
+the snapshot or the history range is:
+
+- games are read from the snapshot file a line at a time (snapshot.game_lines).
+  One pass keeps (app_id, offset, length) per game, the second reads the
+  records back in app_id order; NDJSON rows are the stored record bytes.
+  Under dashboard/serve.py they come from the shared view pack instead,
+  which already has the records and their app_id order
+- history is read one segment file at a time, apps in app_id order
+- rows go out in ~64 KB writes, gzip-compressed on the fly when the client
+  sends Accept-Encoding: gzip
+
+Rows are ordered by their key (app_id, or app_id and t for history), and
+`cursor` is the key of the last row received: `570`, or `570:1700000000`.
+It can be read off the last complete line of a broken download and passed
+back to continue after it. Exports are long, so only EXPORT_MAX_CONCURRENT
+run per process; the others get 503 and Retry-After, which keeps the
+threads of a dashboard worker free for the UI.
+"""
+from __future__ import annotations
+
+import bisect
+import csv
+import io
+import json
+import re
+import zlib
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import metrics
+from dashboard.game_index import QueryError
+from dashboard.shared_views import SharedSnapshot
+from game_record import FIELDS, record_json
+from snapshot import game_lines
+from timeseries import RESOLUTIONS, TimeSeriesStore
+
+EXPORT_KINDS = ("games", "history")
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Bytes per write to the client
+EXPORT_CHUNK = 64 * 1024
+# Exports running at once per dashboard process
+EXPORT_MAX_CONCURRENT = 4
+EXPORT_RETRY_AFTER = 5
+
+GAME_COLUMNS = FIELDS + ("change_seq",)
+HISTORY_COLUMNS = {
+    "raw": ("app_id", "t", "players", "price", "discount"),
+    "rollup": ("app_id", "t", "samples", "player_samples", "players_min", "players_max", "players_avg",
+               "price_min", "price_max", "price_avg", "discount_min", "discount_max", "discount_avg"),
+}
+
+EXPORT_ROWS = metrics.counter("dashboard_export_rows_total", "Rows streamed by /api/steam/export", ("kind", "format"))
+EXPORT_BYTES = metrics.counter("dashboard_export_bytes_total", "Bytes sent by /api/steam/export, after compression")
+EXPORTS_REJECTED = metrics.counter("dashboard_exports_rejected_total",
+                                   "Exports refused because EXPORT_MAX_CONCURRENT were already running")
+
+_APP_ID_RE = re.compile(rb'^\{"app_id":(\d+)[,}]')
+_CHANGE_SEQ_RE = re.compile(rb',"change_seq":(\d+)\}$')
+_SEQ_RE = re.compile(rb'^\{"seq":(\d+)')
+
+GameRow = Tuple[int, bytes]
+
+
+def parse_cursor(kind: str, value: Optional[str]) -> Optional[Tuple[int, ...]]:
+    """`570` (games) or `570:1700000000` (history) -> key tuple"""
+    if not value:
+        return None
+    parts = value.split(":")
+    try:
+        key = tuple(int(part) for part in parts)
+    except ValueError:
+        raise QueryError("invalid cursor")
+    if len(key) != (1 if kind == "games" else 2):
+        raise QueryError("cursor must be <app_id>" if kind == "games" else "cursor must be <app_id>:<t>")
+    return key
+
+
+def _app_id(text: bytes) -> int:
+    match = _APP_ID_RE.match(text)
+    return int(match.group(1)) if match else int(json.loads(text)["app_id"])
+
+
+def _change_seq(text: bytes) -> int:
+    match = _CHANGE_SEQ_RE.search(text)
+    return int(match.group(1)) if match else json.loads(text).get("change_seq") or 0
+
+
+def snapshot_games(path: Path, after: Optional[int] = None, since: Optional[int] = None,
+                   app_ids: Optional[Sequence[int]] = None) -> Tuple[int, Iterator[GameRow]]:
+    """The snapshot's seq and its (app_id, record JSON) rows in app_id order
+
+    Rows with app_id <= `after`, change_seq <= `since` or outside `app_ids`
+    are left out. The file stays open until the rows are consumed or closed,
+    so a snapshot replaced meanwhile is still read consistently.
+    """
+    wanted = set(app_ids) if app_ids else None
+    f = open(path, "rb")
+    try:
+        match = _SEQ_RE.match(f.read(32))
+        seq = int(match.group(1)) if match else 0
+        f.seek(0)
+        lines = game_lines(f)
+        if lines is None:
+            # Format 1 snapshot (one line): small enough to load, and rewritten by the next producer cycle
+            f.seek(0)
+            records = [(record["app_id"], record_json(record).encode("utf-8"))
+                       for record in json.load(f).get("games", [])]
+            f.close()
+            index = [(app_id, text) for app_id, text in sorted(records, key=lambda item: item[0])
+                     if (after is None or app_id > after) and (wanted is None or app_id in wanted)
+                     and (since is None or _change_seq(text) > since)]
+            return seq, iter(index)
+        spans: List[Tuple[int, int, int]] = []
+        for offset, text in lines:
+            app_id = _app_id(text)
+            if after is not None and app_id <= after or wanted is not None and app_id not in wanted:
+                continue
+            if since is not None and _change_seq(text) <= since:
+                continue
+            spans.append((app_id, offset, len(text)))
+        spans.sort()
+    except BaseException:
+        f.close()
+        raise
+
+    def rows() -> Iterator[GameRow]:
+        try:
+            for app_id, offset, length in spans:
+                f.seek(offset)
+                yield app_id, f.read(length)
+        finally:
+            f.close()
+
+    return seq, rows()
+
+
+def shared_games(shared: SharedSnapshot, after: Optional[int] = None, since: Optional[int] = None,
+                 app_ids: Optional[Sequence[int]] = None) -> Tuple[int, Iterator[GameRow]]:
+    """snapshot_games() over the records of a mapped view pack"""
+    wanted = set(app_ids) if app_ids else None
+    order = shared.by_app_id
+    start = 0 if after is None else bisect.bisect_right(order, after, key=shared.app_ids.__getitem__)
+
+    def rows() -> Iterator[GameRow]:
+        for pos in order[start:]:
+            app_id = shared.app_ids[pos]
+            if wanted is not None and app_id not in wanted or since is not None and shared.change_seqs[pos] <= since:
+                continue
+            yield app_id, bytes(shared.record_bytes(pos))
+
+    return shared.head["seq"], rows()
+
+
+def history_rows(store: TimeSeriesStore, resolution: str, start: int, end: int,
+                 app_ids: Optional[Sequence[int]] = None,
+                 after: Optional[Tuple[int, int]] = None) -> Iterator[Tuple[Any, ...]]:
+    """History records as HISTORY_COLUMNS rows, by app_id then time, after the `after` key"""
+    stored = store.app_ids(resolution)
+    if app_ids:
+        wanted = set(app_ids)
+        stored = [app_id for app_id in stored if app_id in wanted]
+    for app_id in stored:
+        if after is not None and app_id < after[0]:
+            continue
+        since = after[1] if after is not None and app_id == after[0] else None
+        for values in store.records(resolution, app_id, start, end):
+            if since is not None and values[0] <= since:
+                continue
+            if resolution == "raw":
+                ts, players, price, discount = values
+                yield app_id, ts, None if players < 0 else players, price / 100, discount
+            else:
+                ts, n, pn, p_min, p_max, p_sum, c_min, c_max, c_sum, d_min, d_max, d_sum = values
+                yield (app_id, ts, n, pn, p_min if pn else None, p_max if pn else None,
+                       round(p_sum / pn, 1) if pn else None, c_min / 100, c_max / 100,
+                       round(c_sum / n / 100, 2) if n else None, d_min, d_max, round(d_sum / n, 1) if n else None)
+
+
+def encode_games(rows: Iterable[GameRow], fmt: str, fields: Optional[List[str]] = None) -> Iterator[bytes]:
+    """Game rows as NDJSON lines or CSV lines (with a header), `fields` picking columns"""
+    counter = EXPORT_ROWS.labels("games", fmt)
+    if fmt == "ndjson":
+        wanted = None if fields is None else ["app_id"] + [f for f in fields if f != "app_id"]
+        for _, text in rows:
+            if wanted is not None:
+                record = json.loads(text)
+                text = json.dumps({f: record[f] for f in wanted if f in record},
+                                  separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+            counter.inc()
+            yield text + b"\n"
+        return
+    columns = fields or list(GAME_COLUMNS)
+    yield from _csv_lines([columns])
+    for _, text in rows:
+        record = json.loads(text)
+        counter.inc()
+        yield from _csv_lines([[csv_value(record.get(column)) for column in columns]])
+
+
+def encode_history(rows: Iterable[Tuple[Any, ...]], fmt: str, resolution: str) -> Iterator[bytes]:
+    columns = HISTORY_COLUMNS["raw" if resolution == "raw" else "rollup"]
+    counter = EXPORT_ROWS.labels("history", fmt)
+    if fmt == "csv":
+        yield from _csv_lines([columns])
+    for row in rows:
+        counter.inc()
+        if fmt == "csv":
+            yield from _csv_lines([[csv_value(value) for value in row]])
+        else:
+            yield json.dumps(dict(zip(columns, row)), separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def csv_value(value: Any) -> Any:
+    """A record value as a CSV cell: lists joined with |, objects as JSON, JSON spelling of null/booleans"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return "|".join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+    return value
+
+
+def _csv_lines(rows: Iterable[Iterable[Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_body(pieces: Iterable[bytes], compress: bool = False) -> Iterator[bytes]:
+    """Join `pieces` into EXPORT_CHUNK-sized writes, gzip-compressed when `compress`"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffered: List[bytes] = []
+    size = 0
+    for piece in pieces:
+        buffered.append(piece)
+        size += len(piece)
+        if size >= EXPORT_CHUNK:
+            data = b"".join(buffered)
+            buffered, size = [], 0
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                EXPORT_BYTES.inc(len(data))
+                yield data
+    data = b"".join(buffered)
+    if compressor is not None:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        EXPORT_BYTES.inc(len(data))
+        yield data
+
+
+def check_resolution(resolution: str) -> str:
+    if resolution not in RESOLUTIONS:
+        raise QueryError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+    return resolution
+
+
+def check_fields(fields: Optional[List[str]]) -> Optional[List[str]]:
+    if fields is None:
+        return None
+    unknown = [f for f in fields if f not in GAME_COLUMNS and f != "prices"]
+    if unknown:
+        raise QueryError(f"unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def export_filename(kind: str, fmt: str, tag: Any) -> str:
+    return f"steam-{kind}-{tag}.{fmt}"
+
+
+def parse_format(value: Optional[str]) -> str:
+    fmt = (value or "ndjson").strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        raise QueryError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    return fmt
+
+
+def parse_kind(value: Optional[str]) -> str:
+    kind = (value or "games").strip().lower()
+    if kind not in EXPORT_KINDS:
+        raise QueryError(f"kind must be one of {', '.join(EXPORT_KINDS)}")
+    return kind
+
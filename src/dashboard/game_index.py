@@ -0,0 +1,240 @@
+"""
+Query indexes over one snapshot for /api/steam/games
+
+Built once per snapshot version so requests with sort/filter/pagination
+never scan or re-sort the game list. An index works on positions (a game's
+place in the snapshot) over flat GameColumns, so the same index runs on
+columns built in process from the parsed snapshot (snapshot_columns) or on
+columns mapped from the view pack that serve.py's master shares with every
+worker (dashboard/shared_views.py):
+
+- one precomputed order per sort key; each game has a (value, app_id) key
+  with direction folded in, so a keyset cursor is just the last key sent
+- posting lists of positions per filter value (genre, on_sale, is_free),
+  intersected smallest-first; min_players is a bisect on the players order
+- filtered, sorted match lists are memoized per query on the index, so
+  paging through one result set costs a bisect and a slice per page
+"""
+from __future__ import annotations
+
+import base64
+import bisect
+import json
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+SORTS = ("players", "discount", "price", "name")
+DEFAULT_ORDER = {"players": "desc", "discount": "desc", "price": "asc", "name": "asc"}
+# Precomputed orders (names are only sorted ascending)
+SORT_ORDERS = tuple((sort, order) for sort in SORTS for order in ("asc", "desc")
+                    if not (sort == "name" and order == "desc"))
+FLAGS = ("on_sale", "is_free")
+MAX_LIMIT = 1000
+MATCH_CACHE_SIZE = 128
+
+SortKey = Tuple[Any, int]
+
+
+class QueryError(ValueError):
+    """Bad query parameter; the message is safe to send to the client"""
+
+
+def encode_cursor(sort: str, order: str, key: SortKey) -> str:
+    raw = json.dumps([sort, order, list(key)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> SortKey:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_order, key = json.loads(raw)
+        key = (key[0], int(key[1]))
+    except (ValueError, TypeError, IndexError):
+        raise QueryError("invalid cursor")
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise QueryError("cursor belongs to a different sort order")
+    return key
+
+
+def sort_value(game: Dict[str, Any], sort: str) -> Any:
+    if sort == "players":
+        return game.get("current_players") or 0
+    if sort == "discount":
+        return game.get("discount_percent") or 0
+    if sort == "price":
+        return game.get("final_price") or 0.0
+    if sort == "name":
+        return (game.get("name") or "").casefold()
+    return 0
+
+
+def sort_key(values: Sequence[Any], app_ids: Sequence[int], descending: bool, pos: int) -> SortKey:
+    value = values[pos]
+    return (-value if descending else value), app_ids[pos]
+
+
+def _contains(positions: Sequence[int], pos: int) -> bool:
+    i = bisect.bisect_left(positions, pos)
+    return i < len(positions) and positions[i] == pos
+
+
+@dataclass
+class GameColumns:
+    """What a GameIndex reads, per position in the snapshot's games
+
+    Position lists (orders aside) are ascending, so membership is a bisect.
+    """
+    app_ids: Sequence[int]
+    values: Dict[str, Sequence[Any]]                 # sort -> sort_value per position
+    orders: Dict[Tuple[str, str], Sequence[int]]     # SORT_ORDERS -> positions in key order
+    genres: Dict[str, Tuple[str, Sequence[int]]]     # casefolded genre -> (name, positions)
+    flags: Dict[str, Sequence[int]]                  # FLAGS -> positions where true
+    fields: FrozenSet[str]
+    record: Callable[[int], Dict[str, Any]]
+
+
+def snapshot_columns(snapshot: Dict[str, Any]) -> GameColumns:
+    games: List[Dict[str, Any]] = snapshot.get("games", [])
+    app_ids = [g.get("app_id", 0) for g in games]
+    values = {sort: [sort_value(g, sort) for g in games] for sort in SORTS}
+    orders = {
+        (sort, order): sorted(range(len(games)), key=partial(sort_key, values[sort], app_ids, order == "desc"))
+        for sort, order in SORT_ORDERS
+    }
+    genres: Dict[str, Tuple[str, List[int]]] = {}
+    flags: Dict[str, List[int]] = {flag: [] for flag in FLAGS}
+    fields = set()
+    for pos, game in enumerate(games):
+        for genre in game.get("genres") or []:
+            positions = genres.setdefault(genre.casefold(), (genre, []))[1]
+            if not positions or positions[-1] != pos:
+                positions.append(pos)
+        for flag in FLAGS:
+            if game.get(flag):
+                flags[flag].append(pos)
+        fields.update(game)
+    return GameColumns(app_ids, values, orders, genres, flags, frozenset(fields), games.__getitem__)
+
+
+class GameIndex:
+    """Sort orders, filter posting lists and field names for one snapshot
+
+    `snapshot` supplies the seq/change_seq/updated_at/game_count echoed in
+    responses; the columns are built from its games unless given.
+    """
+
+    def __init__(self, snapshot: Dict[str, Any], columns: Optional[GameColumns] = None):
+        self.snapshot = snapshot
+        self.columns = columns if columns is not None else snapshot_columns(snapshot)
+        self.count = len(self.columns.app_ids)
+        self._matches: Dict[Tuple, Sequence[int]] = {}
+
+    def _key(self, sort: str, order: str) -> Callable[[int], SortKey]:
+        app_ids = self.columns.app_ids
+        if not sort:
+            # Snapshot (watchlist) order
+            return lambda pos: (pos, app_ids[pos])
+        return partial(sort_key, self.columns.values[sort], app_ids, order == "desc")
+
+    def _min_players(self, minimum: int) -> List[int]:
+        order = self.columns.orders[("players", "asc")]
+        start = bisect.bisect_left(order, minimum, key=self.columns.values["players"].__getitem__)
+        return sorted(order[start:])
+
+    def _candidates(self, genres: Sequence[str], on_sale: Optional[bool], is_free: Optional[bool],
+                    min_players: Optional[int]) -> Optional[List[int]]:
+        """Positions matching every filter, or None when there are no filters"""
+        include: List[Sequence[int]] = [self.columns.genres.get(genre.casefold(), ("", ()))[1] for genre in genres]
+        exclude: List[Sequence[int]] = []
+        for flag, wanted in (("on_sale", on_sale), ("is_free", is_free)):
+            if wanted is not None:
+                (include if wanted else exclude).append(self.columns.flags[flag])
+        if min_players is not None:
+            include.append(self._min_players(min_players))
+        if not include and not exclude:
+            return None
+        include.sort(key=len)
+        base = include[0] if include else range(self.count)
+        return [pos for pos in base
+                if all(_contains(other, pos) for other in include[1:])
+                and not any(_contains(other, pos) for other in exclude)]
+
+    def matches(
+        self,
+        sort: str = "",
+        order: str = "asc",
+        genres: Sequence[str] = (),
+        on_sale: Optional[bool] = None,
+        is_free: Optional[bool] = None,
+        min_players: Optional[int] = None,
+    ) -> Sequence[int]:
+        """Positions of matching games in sort order"""
+        cache_key = (sort, order, tuple(sorted(g.casefold() for g in genres)), on_sale, is_free, min_players)
+        cached = self._matches.get(cache_key)
+        if cached is not None:
+            return cached
+
+        candidates = self._candidates(genres, on_sale, is_free, min_players)
+        if candidates is not None:
+            positions: Sequence[int] = sorted(candidates, key=self._key(sort, order))
+        elif sort:
+            positions = self.columns.orders[(sort, order)]
+        else:
+            positions = range(self.count)
+
+        if len(self._matches) >= MATCH_CACHE_SIZE:
+            self._matches.clear()
+        self._matches[cache_key] = positions
+        return positions
+
+    def query(
+        self,
+        sort: str = "",
+        order: str = "",
+        genres: Sequence[str] = (),
+        on_sale: Optional[bool] = None,
+        is_free: Optional[bool] = None,
+        min_players: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """One page of games plus `total` matches and the `next_cursor` (None on the last page)"""
+        if sort and sort not in SORTS:
+            raise QueryError(f"sort must be one of: {', '.join(SORTS)}")
+        order = order or (DEFAULT_ORDER[sort] if sort else "asc")
+        if order not in ("asc", "desc") or (order == "desc" and sort in ("", "name")):
+            raise QueryError("order must be asc or desc (desc needs sort=players|discount|price)")
+        if limit is not None and not 1 <= limit <= MAX_LIMIT:
+            raise QueryError(f"limit must be between 1 and {MAX_LIMIT}")
+        if fields is not None:
+            unknown = sorted(set(fields) - self.columns.fields)
+            if unknown and self.count:
+                raise QueryError(f"unknown fields: {', '.join(unknown)}")
+
+        positions = self.matches(sort, order, genres, on_sale, is_free, min_players)
+        key = self._key(sort, order)
+        start = 0
+        if cursor:
+            start = bisect.bisect_right(positions, decode_cursor(cursor, sort, order), key=key)
+        end = len(positions) if limit is None else min(len(positions), start + limit)
+
+        page = [self.columns.record(pos) for pos in positions[start:end]]
+        if fields is not None:
+            wanted = ["app_id"] + [f for f in fields if f != "app_id"]
+            page = [{f: game[f] for f in wanted if f in game} for game in page]
+
+        next_cursor = encode_cursor(sort, order, key(positions[end - 1])) if end < len(positions) and end > start else None
+        return {
+            "seq": self.snapshot.get("seq", 0),
+            "change_seq": self.snapshot.get("change_seq", 0),
+            "updated_at": self.snapshot.get("updated_at", 0),
+            "game_count": self.snapshot.get("game_count", 0),
+            "total": len(positions),
+            "count": len(page),
+            "sort": sort or None,
+            "order": order,
+            "next_cursor": next_cursor,
+            "games": page,
+        }
@@ -0,0 +1,159 @@
+"""
+In-memory response cache for the dashboard's file-backed JSON endpoints
+
+Each data file is parsed once per (mtime, size) and every view built from it
+is kept as ready-to-send bytes, plus a gzipped copy and an ETag. A request in
+steady state costs one stat() and a dict lookup: no JSON parsing or encoding.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import Response, current_app, request
+
+import metrics
+
+GZIP_MIN_BYTES = 512
+
+CACHE_REQUESTS = metrics.counter(
+    "dashboard_response_cache_requests_total", "Cached file responses by view and result (hit/miss)",
+    ("view", "result"),
+)
+
+Stamp = Optional[Tuple[int, int]]
+
+
+@dataclass
+class CachedResponse:
+    stamp: Stamp
+    etag: str
+    body: bytes
+    gzip_body: Optional[bytes]
+
+
+def file_stamp(path: Path) -> Stamp:
+    """(mtime_ns, size) of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def load_json(path: Path) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ResponseCache:
+    """Caches parsed files and the encoded responses derived from them"""
+
+    def __init__(self):
+        self._parsed: Dict[str, Tuple[Stamp, Any]] = {}
+        self._responses: Dict[Tuple[str, str], CachedResponse] = {}
+        self._derived: Dict[Tuple[str, str], Tuple[Stamp, Any]] = {}
+        self._lock = threading.Lock()
+
+    def parsed(self, path: Path, loader: Callable[[Path], Any] = load_json, stamp: Stamp = ...) -> Tuple[Stamp, Any]:
+        """Parsed contents of `path` (None if missing), reparsed only when the file changes"""
+        if stamp is ...:
+            stamp = file_stamp(path)
+        key = str(path)
+        cached = self._parsed.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached
+        data = loader(path) if stamp is not None else None
+        # Re-stat so a write that landed mid-parse is not cached under the old stamp
+        if file_stamp(path) == stamp:
+            self._parsed[key] = (stamp, data)
+        return stamp, data
+
+    def derived(
+        self,
+        path: Path,
+        name: str,
+        build: Callable[[Any], Any],
+        loader: Callable[[Path], Any] = load_json,
+    ) -> Any:
+        """`build(parsed file)` computed once per file version (indexes, lookup maps)"""
+        stamp, data = self.parsed(path, loader)
+        key = (str(path), name)
+        cached = self._derived.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        value = build(data)
+        self._derived[key] = (stamp, value)
+        return value
+
+    def file_response(
+        self,
+        path: Path,
+        view: str,
+        build: Callable[[Any], Dict[str, Any]],
+        loader: Callable[[Path], Any] = load_json,
+    ) -> Response:
+        """Serve `build(parsed file)` with ETag/304 and gzip, rebuilding only on change
+
+        `build` receives None when the file does not exist. If the file cannot
+        be parsed the response is `build(None)` plus an `error` field, and is
+        not cached.
+        """
+        stamp = file_stamp(path)
+        key = (str(path), view)
+        entry = self._responses.get(key)
+        if entry is not None and entry.stamp == stamp:
+            CACHE_REQUESTS.labels(view, "hit").inc()
+            return self._send(entry)
+
+        with self._lock:
+            entry = self._responses.get(key)
+            if entry is None or entry.stamp != stamp:
+                CACHE_REQUESTS.labels(view, "miss").inc()
+                try:
+                    _, data = self.parsed(path, loader, stamp)
+                except Exception as e:
+                    payload = build(None)
+                    payload["error"] = str(e)
+                    return Response(current_app.json.dumps(payload), mimetype="application/json")
+                entry = self._encode(stamp, view, build(data))
+                self._responses[key] = entry
+        return self._send(entry)
+
+    def invalidate(self, path: Optional[Path] = None):
+        """Drop cached entries for one file, or everything"""
+        with self._lock:
+            if path is None:
+                self._parsed.clear()
+                self._responses.clear()
+                self._derived.clear()
+                return
+            self._parsed.pop(str(path), None)
+            for cache in (self._responses, self._derived):
+                for key in [k for k in cache if k[0] == str(path)]:
+                    cache.pop(key, None)
+
+    @staticmethod
+    def _encode(stamp: Stamp, view: str, payload: Dict[str, Any]) -> CachedResponse:
+        body = current_app.json.dumps(payload).encode("utf-8")
+        gzip_body = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+        if stamp is None:
+            etag = f'"{view}-missing"'
+        else:
+            etag = f'"{view}-{stamp[0]:x}-{stamp[1]:x}"'
+        return CachedResponse(stamp=stamp, etag=etag, body=body, gzip_body=gzip_body)
+
+    @staticmethod
+    def _send(entry: CachedResponse) -> Response:
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if request.if_none_match.contains(entry.etag.strip('"')):
+            return Response(status=304, headers=headers)
+        if entry.gzip_body is not None and "gzip" in request.accept_encodings:
+            headers["Content-Encoding"] = "gzip"
+            return Response(entry.gzip_body, mimetype="application/json", headers=headers)
+        return Response(entry.body, mimetype="application/json", headers=headers)
@@ -0,0 +1,322 @@
+"""
+Production server for the dashboard: pre-forked workers, each multi-threaded
+
+    python src/dashboard/serve.py --workers 4 --threads 64
+
+The master binds the listening socket, forks the workers (each runs a
+threaded werkzeug server on the shared socket, so the kernel spreads
+connections across them) and supervises them: a worker that dies is
+replaced. The master also watches the producer snapshot and, whenever it
+changes, encodes the standard views, the game records with their sort
+and filter columns, and the event-stream payloads once into a memory-mapped
+view pack that every worker serves from (see shared_views.py), so N workers
+do not parse N copies of the snapshot.
+
+Each worker runs at most --threads ordinary requests at a time. Event
+streams leave that budget once they are open and are capped separately by
+--max-streams, so open dashboards cannot starve the API of threads.
+
+Signals to the master:
+  TERM / INT  stop: workers stop accepting, finish in-flight requests (up
+              to --graceful-timeout) and close event streams, which reconnect
+  HUP         rolling restart: new workers are started before old ones stop
+
+Every worker labels its metrics with worker="<pid>" and rewrites them to a
+file in the runtime directory every METRICS_WRITE_INTERVAL seconds; /metrics
+on any worker serves its own series plus the other workers' files, so each
+scrape reports every worker and no counter jumps between unrelated values.
+Without fork() (Windows) a single threaded server runs in-process.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from flask import Flask
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler, make_server
+
+ROOT = Path(__file__).resolve().parent
+if str(ROOT.parent) not in sys.path:
+    sys.path.insert(0, str(ROOT.parent))
+
+import metrics  # noqa: E402
+from dashboard.app import (  # noqa: E402
+    DETACH_ENVIRON_KEY, SNAPSHOT_VIEWS, STEAM_SNAPSHOT_FILE, STREAM_MAX_OPEN, WORKER_LABEL, create_app,
+    worker_metrics_file,
+)
+from dashboard.event_stream import SnapshotEvents  # noqa: E402
+from dashboard.response_cache import file_stamp  # noqa: E402
+from dashboard.shared_views import PACK_FILENAME, SharedViews, build_pack  # noqa: E402
+
+# Seconds between master checks (dead workers, new snapshot, signals)
+SUPERVISE_INTERVAL = 0.25
+# A worker dying sooner than this after its start counts as a crash loop
+MIN_WORKER_LIFETIME = 5.0
+# Seconds between a worker's metrics textfile writes (how stale other workers' series are on a scrape)
+METRICS_WRITE_INTERVAL = 5.0
+
+
+class _RequestHandler(WSGIRequestHandler):
+    """Lets the app give back its request slot (see BoundedThreadedServer.detach)"""
+
+    def make_environ(self):
+        environ = super().make_environ()
+        environ[DETACH_ENVIRON_KEY] = self.server.detach
+        return environ
+
+
+class BoundedThreadedServer(ThreadedWSGIServer):
+    """Threaded server with at most `max_threads` requests in flight
+
+    When all threads are busy the accept loop waits, leaving connections in
+    the shared backlog for other workers. A long-lived request (an event
+    stream) calls detach() to stop counting against `max_threads`.
+    """
+
+    def __init__(self, host: str, port: int, app: Flask, fd: Optional[int] = None, max_threads: int = 64):
+        super().__init__(host, port, app, handler=_RequestHandler, fd=fd)
+        self.max_threads = max_threads
+        self._slots = threading.BoundedSemaphore(max_threads)
+        self._local = threading.local()
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        self._local.holds_slot = True
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            if self._local.holds_slot:
+                self._slots.release()
+
+    def detach(self):
+        """Release the calling request's slot; its thread keeps running outside the budget"""
+        if getattr(self._local, "holds_slot", False):
+            self._local.holds_slot = False
+            self._slots.release()
+
+    def drain(self, timeout: float) -> bool:
+        """Wait until no request is in flight (True) or `timeout` passes (False)"""
+        deadline = time.monotonic() + timeout
+        taken = 0
+        while taken < self.max_threads:
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                return False
+            taken += 1
+        return True
+
+
+def write_worker_metrics(metrics_dir: Path):
+    """Keep this worker's metrics file current for the other workers' /metrics (runs in a daemon thread)"""
+    path = worker_metrics_file(metrics_dir, os.getpid())
+    labels = {WORKER_LABEL: str(os.getpid())}
+    while True:
+        try:
+            metrics.REGISTRY.write_textfile(path, labels)
+        except OSError as e:
+            print(f"⚠️  Worker {os.getpid()} could not write its metrics: {e}", file=sys.stderr)
+        time.sleep(METRICS_WRITE_INTERVAL)
+
+
+def worker_main(listener: socket.socket, host: str, port: int, threads: int, max_streams: int,
+                pack_path: Optional[Path], metrics_dir: Path, graceful_timeout: float):
+    """Body of a forked worker; never returns"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C reaches the master, which stops us
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    app = create_app(SharedViews(pack_path) if pack_path is not None else None, max_streams, metrics_dir)
+    threading.Thread(target=write_worker_metrics, args=(metrics_dir,), name="worker-metrics", daemon=True).start()
+    server = BoundedThreadedServer(host, port, app, fd=listener.fileno(), max_threads=threads)
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    code = 0
+    try:
+        server.serve_forever()
+        # Stopped accepting; let in-flight requests finish, close event streams so clients reconnect
+        broadcaster = app.extensions.get("snapshot_broadcaster")
+        if broadcaster is not None:
+            broadcaster.close()
+        server.drain(graceful_timeout)
+    except Exception as e:
+        print(f"Worker {os.getpid()} failed: {e}", file=sys.stderr)
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+class Master:
+    """Forks and supervises workers and keeps the shared view pack current"""
+
+    def __init__(self, args: argparse.Namespace, listener: socket.socket, runtime_dir: Path):
+        self.args = args
+        self.listener = listener
+        self.pack_path = runtime_dir / PACK_FILENAME
+        self.metrics_dir = runtime_dir / "metrics"
+        self.metrics_dir.mkdir(exist_ok=True)
+        self.views_app = Flask("dashboard-views")
+        self.events = SnapshotEvents()
+        self.workers: Dict[int, int] = {}  # pid -> generation
+        self.started: Dict[int, float] = {}
+        self.generation = 0
+        self.snapshot_stamp = None
+        self.stopping = False
+        self.reloading = False
+        self.crash_backoff = 0.0
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            worker_main(self.listener, self.args.host, self.args.port, self.args.threads, self.args.max_streams,
+                        self.pack_path, self.metrics_dir, self.args.graceful_timeout)
+        self.workers[pid] = self.generation
+        self.started[pid] = time.monotonic()
+
+    def refresh_pack(self):
+        stamp = file_stamp(STEAM_SNAPSHOT_FILE)
+        if stamp is None or stamp == self.snapshot_stamp:
+            return
+        try:
+            seq = build_pack(self.views_app, STEAM_SNAPSHOT_FILE, self.pack_path, SNAPSHOT_VIEWS, self.events)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not build the view pack: {e}")
+            return
+        if seq is not None:
+            self.snapshot_stamp = stamp
+
+    def reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation = self.workers.pop(pid, None)
+            # Its series leave /metrics with it (a replacement reports under its own pid)
+            worker_metrics_file(self.metrics_dir, pid).unlink(missing_ok=True)
+            lifetime = time.monotonic() - self.started.pop(pid, time.monotonic())
+            if self.stopping or generation is None or generation != self.generation:
+                continue
+            print(f"⚠️  Worker {pid} exited ({status}); starting a replacement")
+            if lifetime < MIN_WORKER_LIFETIME:
+                self.crash_backoff = min(30.0, max(1.0, self.crash_backoff * 2))
+                time.sleep(self.crash_backoff)
+            else:
+                self.crash_backoff = 0.0
+            self.spawn()
+
+    def signal_workers(self, sig: int, generation: Optional[int] = None):
+        for pid, worker_generation in list(self.workers.items()):
+            if generation is None or worker_generation == generation:
+                try:
+                    os.kill(pid, sig)
+                except ProcessLookupError:
+                    pass
+
+    def rolling_restart(self):
+        old = self.generation
+        self.generation += 1
+        print(f"🔄 Restarting {self.args.workers} workers")
+        for _ in range(self.args.workers):
+            self.spawn()
+        self.signal_workers(signal.SIGTERM, old)
+
+    def run(self):
+        def on_stop(signum, frame):
+            self.stopping = True
+
+        def on_reload(signum, frame):
+            self.reloading = True
+
+        signal.signal(signal.SIGTERM, on_stop)
+        signal.signal(signal.SIGINT, on_stop)
+        signal.signal(signal.SIGHUP, on_reload)
+
+        self.refresh_pack()
+        for _ in range(self.args.workers):
+            self.spawn()
+        print(f"🚀 Dashboard on http://{self.args.host}:{self.args.port} "
+              f"({self.args.workers} workers x {self.args.threads} threads, master pid {os.getpid()})")
+
+        while not self.stopping:
+            time.sleep(SUPERVISE_INTERVAL)
+            if self.reloading:
+                self.reloading = False
+                self.rolling_restart()
+            self.reap()
+            self.refresh_pack()
+
+        print("🛑 Stopping workers...")
+        self.signal_workers(signal.SIGTERM)
+        deadline = time.monotonic() + self.args.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self.reap()
+        self.signal_workers(signal.SIGKILL)
+        print("✅ Dashboard stopped.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Steam dashboard production server")
+    parser.add_argument("--host", default=os.environ.get("FLASK_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("FLASK_PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Worker processes (default: CPU count, at most 4)")
+    parser.add_argument("--threads", type=int, default=64,
+                        help="Concurrent requests per worker, not counting open event streams (default: 64)")
+    parser.add_argument("--max-streams", type=int, default=STREAM_MAX_OPEN,
+                        help=f"Open event streams per worker (default: {STREAM_MAX_OPEN})")
+    parser.add_argument("--graceful-timeout", type=float, default=10.0,
+                        help="Seconds a stopping worker waits for in-flight requests (default: 10)")
+    parser.add_argument("--runtime-dir", help="Where to keep the shared view pack (default: a temp dir in /dev/shm)")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        print("fork() is not available: serving from a single process")
+        app = create_app(max_streams=args.max_streams)
+        server = make_server(args.host, args.port, app, threaded=True)
+        server.serve_forever()
+        return
+
+    listener = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((args.host, args.port))
+    listener.listen(1024)
+    listener.set_inheritable(True)
+
+    shm = Path("/dev/shm")
+    if args.runtime_dir:
+        runtime_dir = Path(args.runtime_dir)
+        runtime_dir.mkdir(parents=True, exist_ok=True)
+    else:
+        runtime_dir = Path(tempfile.mkdtemp(prefix="steam-dashboard-",
+                                            dir=shm if shm.is_dir() and os.access(shm, os.W_OK) else None))
+    try:
+        Master(args, listener, runtime_dir).run()
+    finally:
+        listener.close()
+        if not args.runtime_dir:
+            shutil.rmtree(runtime_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+Snapshot data encoded once and shared by every dashboard worker through mmap
+
+In the pre-forked server (dashboard/serve.py) the master process is the
+only one that parses the producer snapshot. For every new snapshot it
+writes one "view pack", next to the previous one and renamed into place:
+
+- the standard views, encoded (plain and gzip, same ETag as ResponseCache)
+- every game record as JSON, plus flat columns over them: app_id,
+  change_seq, the sort values, sort orders and filter posting lists of
+  dashboard/game_index.py, and the snapshot's change log
+- the SSE `snapshot` events for it: the full state, and the delta from
+  the snapshot before (see event_stream.py)
+
+Workers mmap the pack read-only, so all of it lives once in the page cache
+no matter how many workers serve it. Views are sent straight from the
+mapping; queries, ?since=, single-game lookups, exports and event streams
+work on the columns and decode only the records they return. No worker
+parses or re-encodes the snapshot.
+
+A new snapshot is picked up gracefully: workers notice the renamed pack on
+their next request and map it, while responses already streaming from the
+old mapping finish from it (the mapping lives until its last memoryview is
+released).
+
+Layout: b"SVP2", u32 header length, JSON header (padded so the data that
+follows starts 8-byte aligned), then the data. The header locates sections
+as [offset, length] into the data and columns (native arrays) as
+[typecode, offset, length]:
+{"seq", "stamp", "views": {name: [etag, offset, length, gzip_offset, gzip_length]},
+ "snapshot": {seq, change_seq, updated_at, game_count}, "fields": [...],
+ "records": section, "names": section, "columns": {name: column},
+ "genres": {casefolded genre: [name, *column]},
+ "events": {"base_seq", "delta": section or null, "full": section}}
+"""
+from __future__ import annotations
+
+import bisect
+import itertools
+import json
+import mmap
+import os
+import struct
+import threading
+from array import array
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask import Flask, Response, request
+
+from dashboard.game_index import FLAGS, SORT_ORDERS, GameColumns, GameIndex, snapshot_columns
+from dashboard.response_cache import CACHE_REQUESTS, CachedResponse, ResponseCache, Stamp, file_stamp
+from game_record import record_json
+from snapshot import atomic_write_bytes, load_snapshot
+
+if TYPE_CHECKING:
+    from dashboard.event_stream import SnapshotEvents
+
+PACK_MAGIC = b"SVP2"
+PACK_FILENAME = "views.pack"
+
+# Snapshot fields echoed by queries and ?since= responses
+HEAD_FIELDS = ("seq", "change_seq", "updated_at", "game_count")
+
+# Bytes per chunk when streaming a body out of the mapping
+STREAM_CHUNK = 256 * 1024
+
+_HEADER = struct.Struct("<4sI")
+
+
+class _PackData:
+    """The data part of a pack being encoded; every section starts 8-byte aligned"""
+
+    def __init__(self):
+        self.blobs: List[bytes] = []
+        self.size = 0
+
+    def add(self, data: bytes) -> List[int]:
+        pad = -self.size % 8
+        if pad:
+            self.blobs.append(bytes(pad))
+            self.size += pad
+        offset = self.size
+        self.blobs.append(data)
+        self.size += len(data)
+        return [offset, len(data)]
+
+    def column(self, typecode: str, values: Iterable[Any]) -> List[Any]:
+        return [typecode, *self.add(array(typecode, values).tobytes())]
+
+
+def _order_column(sort: str, order: str) -> str:
+    return f"order:{sort}:{order}"
+
+
+def encode_pack(stamp: Stamp, entries: Dict[str, CachedResponse], snapshot: Dict[str, Any],
+                events: Tuple[Optional[int], Optional[str], str]) -> bytes:
+    """The pack for one snapshot: encoded `entries`, its records and columns, and its (base_seq, delta, full) events"""
+    data = _PackData()
+    views = {}
+    for name, entry in entries.items():
+        gzip_span = data.add(entry.gzip_body) if entry.gzip_body is not None else [-1, 0]
+        views[name] = [entry.etag, *data.add(entry.body), *gzip_span]
+
+    games = snapshot.get("games", [])
+    columns = snapshot_columns(snapshot)
+    records = [record_json(game).encode("utf-8") for game in games]
+    names = [name.encode("utf-8") for name in columns.values["name"]]
+    log = snapshot.get("changes", [])
+    layout = {
+        "app_id": data.column("q", columns.app_ids),
+        "record_end": data.column("q", itertools.accumulate(map(len, records))),
+        "change_seq": data.column("q", (game.get("change_seq") or 0 for game in games)),
+        "players": data.column("q", columns.values["players"]),
+        "discount": data.column("q", columns.values["discount"]),
+        "price": data.column("d", columns.values["price"]),
+        "name_end": data.column("q", itertools.accumulate(map(len, names))),
+        "by_app_id": data.column("q", sorted(range(len(games)), key=columns.app_ids.__getitem__)),
+        "changes_seq": data.column("q", (entry[0] for entry in log)),
+        "changes_app_id": data.column("q", (entry[1] for entry in log)),
+        "changes_kind": data.column("q", (entry[2] if len(entry) > 2 else 0 for entry in log)),
+    }
+    for sort, order in SORT_ORDERS:
+        layout[_order_column(sort, order)] = data.column("q", columns.orders[(sort, order)])
+    for flag in FLAGS:
+        layout[f"flag:{flag}"] = data.column("q", columns.flags[flag])
+
+    base_seq, delta, full = events
+    header = json.dumps({
+        "seq": snapshot.get("seq", 0),
+        "stamp": list(stamp) if stamp else None,
+        "views": views,
+        "snapshot": {field: snapshot.get(field, 0) for field in HEAD_FIELDS},
+        "fields": sorted(columns.fields),
+        "records": data.add(b"".join(records)),
+        "names": data.add(b"".join(names)),
+        "columns": layout,
+        "genres": {key: [name, *data.column("q", positions)] for key, (name, positions) in columns.genres.items()},
+        "events": {
+            "base_seq": base_seq,
+            "delta": data.add(delta.encode("utf-8")) if delta is not None else None,
+            "full": data.add(full.encode("utf-8")),
+        },
+    }).encode("utf-8")
+    header += b" " * (-(_HEADER.size + len(header)) % 8)
+    return b"".join([_HEADER.pack(PACK_MAGIC, len(header)), header, *data.blobs])
+
+
+def build_pack(app: Flask, snapshot_path: Path, pack_path: Path,
+               views: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]], events: SnapshotEvents) -> Optional[int]:
+    """Parse the snapshot once and write its views, columns and SSE events into a new pack; returns its seq
+
+    Returns None (nothing written) when there is no snapshot yet or it was
+    replaced while being read; the caller tries again on its next poll.
+    """
+    stamp = file_stamp(snapshot_path)
+    if stamp is None:
+        return None
+    snapshot = load_snapshot(snapshot_path)
+    if file_stamp(snapshot_path) != stamp:
+        return None
+    with app.app_context():
+        entries = {name: ResponseCache._encode(stamp, name, build(snapshot)) for name, build in views.items()}
+    base_seq, delta = events.update(snapshot)
+    atomic_write_bytes(pack_path, encode_pack(stamp, entries, snapshot, (base_seq, delta, events.full())))
+    return snapshot.get("seq", 0)
+
+
+@dataclass
+class SharedEntry:
+    """One encoded view inside a mapped pack"""
+    etag: str
+    body: memoryview
+    gzip_body: Optional[memoryview]
+
+
+def iter_chunks(view: memoryview) -> Iterator[bytes]:
+    for start in range(0, len(view), STREAM_CHUNK):
+        yield bytes(view[start:start + STREAM_CHUNK])
+
+
+@dataclass
+class SharedEvents:
+    """A pack's SSE snapshot events; `delta` applies on top of snapshot `base_seq`"""
+    base_seq: Optional[int]
+    delta: Optional[memoryview]
+    full: memoryview
+
+
+class _Strings(Sequence):
+    """Strings stored back to back, located by their end offsets"""
+
+    def __init__(self, blob: memoryview, ends: memoryview):
+        self._blob = blob
+        self._ends = ends
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def __getitem__(self, i: int) -> str:
+        start = self._ends[i - 1] if i > 0 else 0
+        return bytes(self._blob[start:self._ends[i]]).decode("utf-8")
+
+
+class _ChangeLog(Sequence):
+    """The snapshot's `changes` entries, (change_seq, app_id, kind), as change_log.changes_since reads them"""
+
+    def __init__(self, seqs: memoryview, app_ids: memoryview, kinds: memoryview):
+        self._seqs, self._app_ids, self._kinds = seqs, app_ids, kinds
+
+    def __len__(self) -> int:
+        return len(self._seqs)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._seqs[i], self._app_ids[i], self._kinds[i]
+
+
+class SharedRecords(Mapping):
+    """app_id -> record of a mapped pack; a lookup decodes just that record"""
+
+    def __init__(self, snapshot: SharedSnapshot):
+        self._snapshot = snapshot
+
+    def __getitem__(self, app_id: int) -> Dict[str, Any]:
+        pos = self._snapshot.position(app_id)
+        if pos is None:
+            raise KeyError(app_id)
+        return self._snapshot.record(pos)
+
+    def __contains__(self, app_id: object) -> bool:
+        return isinstance(app_id, int) and self._snapshot.position(app_id) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        app_ids = self._snapshot.app_ids
+        return (app_ids[pos] for pos in self._snapshot.by_app_id)
+
+    def __len__(self) -> int:
+        return len(self._snapshot.app_ids)
+
+
+class _Games(Sequence):
+    """The snapshot's games in order, decoded as they are read"""
+
+    def __init__(self, snapshot: SharedSnapshot):
+        self._snapshot = snapshot
+
+    def __len__(self) -> int:
+        return len(self._snapshot.app_ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._snapshot.record(range(len(self))[i])
+
+
+class SharedSnapshot:
+    """The snapshot inside a mapped pack: records, GameIndex columns, change log and SSE events"""
+
+    def __init__(self, data: memoryview, header: Dict[str, Any]):
+        self._data = data
+        self.head: Dict[str, Any] = header["snapshot"]
+        columns = {name: self._column(*spec) for name, spec in header["columns"].items()}
+        self.app_ids = columns["app_id"]
+        self.change_seqs = columns["change_seq"]
+        self.by_app_id = columns["by_app_id"]
+        self._records = self._section(header["records"])
+        self._record_ends = columns["record_end"]
+        self.columns = GameColumns(
+            app_ids=self.app_ids,
+            values={
+                "players": columns["players"],
+                "discount": columns["discount"],
+                "price": columns["price"],
+                "name": _Strings(self._section(header["names"]), columns["name_end"]),
+            },
+            orders={(sort, order): columns[_order_column(sort, order)] for sort, order in SORT_ORDERS},
+            genres={key: (name, self._column(*column)) for key, (name, *column) in header["genres"].items()},
+            flags={flag: columns[f"flag:{flag}"] for flag in FLAGS},
+            fields=frozenset(header["fields"]),
+            record=self.record,
+        )
+        self.changes = _ChangeLog(columns["changes_seq"], columns["changes_app_id"], columns["changes_kind"])
+        events = header["events"]
+        self.events = SharedEvents(
+            events["base_seq"],
+            self._section(events["delta"]) if events["delta"] is not None else None,
+            self._section(events["full"]),
+        )
+        self.by_id = SharedRecords(self)
+        self._index: Optional[GameIndex] = None
+
+    def _section(self, span: List[int]) -> memoryview:
+        offset, length = span
+        return self._data[offset:offset + length]
+
+    def _column(self, typecode: str, offset: int, length: int) -> memoryview:
+        return self._data[offset:offset + length].cast(typecode)
+
+    def position(self, app_id: int) -> Optional[int]:
+        """Position of `app_id` in the snapshot's games, None if it is not there"""
+        i = bisect.bisect_left(self.by_app_id, app_id, key=self.app_ids.__getitem__)
+        if i < len(self.by_app_id) and self.app_ids[self.by_app_id[i]] == app_id:
+            return self.by_app_id[i]
+        return None
+
+    def record_bytes(self, pos: int) -> memoryview:
+        start = self._record_ends[pos - 1] if pos > 0 else 0
+        return self._records[start:self._record_ends[pos]]
+
+    def record(self, pos: int) -> Dict[str, Any]:
+        return json.loads(bytes(self.record_bytes(pos)))
+
+    def index(self) -> GameIndex:
+        if self._index is None:
+            self._index = GameIndex(self.head, self.columns)
+        return self._index
+
+    def view(self) -> Dict[str, Any]:
+        """Stand-in for the parsed snapshot where change_log.changes_since and games_view read it"""
+        return dict(self.head, changes=self.changes, games=_Games(self))
+
+
+class SharedViews:
+    """Worker side: the current pack, remapped when the master replaces it"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._entries: Dict[str, SharedEntry] = {}
+        self._snapshot: Optional[SharedSnapshot] = None
+        self._parsed: Dict[str, Tuple[SharedEntry, Any]] = {}
+        self.seq = 0
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _map(self, stamp: Tuple[int, int]):
+        with open(self.path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = memoryview(mapped)
+        magic, header_length = _HEADER.unpack_from(data)
+        if magic != PACK_MAGIC:
+            raise ValueError(f"{self.path} is not a view pack")
+        start = _HEADER.size + header_length
+        header = json.loads(bytes(data[_HEADER.size:start]))
+        entries = {}
+        for name, (etag, offset, length, gzip_offset, gzip_length) in header["views"].items():
+            body = data[start + offset:start + offset + length]
+            gzip_body = data[start + gzip_offset:start + gzip_offset + gzip_length] if gzip_offset >= 0 else None
+            entries[name] = SharedEntry(etag, body, gzip_body)
+        snapshot = SharedSnapshot(data[start:], header)
+        # Entries of the previous pack stay valid for responses still using them
+        self._entries, self._snapshot, self._parsed = entries, snapshot, {}
+        self._stamp, self.seq = stamp, header.get("seq", 0)
+
+    def _current(self) -> bool:
+        """Map the pack if it was replaced; False when there is none (yet) or it cannot be read"""
+        stamp = self._file_stamp()
+        if stamp is None:
+            return False
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    try:
+                        self._map(stamp)
+                    except (OSError, ValueError, KeyError, struct.error) as e:
+                        print(f"Could not map {self.path}: {e}")
+                        return False
+        return True
+
+    def get(self, view: str) -> Optional[SharedEntry]:
+        return self._entries.get(view) if self._current() else None
+
+    def snapshot(self) -> Optional[SharedSnapshot]:
+        return self._snapshot if self._current() else None
+
+    def parsed(self, view: str) -> Optional[Any]:
+        """A view decoded from JSON, once per pack (for responses cut down from a whole view)"""
+        entry = self.get(view)
+        if entry is None:
+            return None
+        cached = self._parsed.get(view)
+        if cached is None or cached[0] is not entry:
+            cached = self._parsed[view] = (entry, json.loads(bytes(entry.body)))
+        return cached[1]
+
+
+def send_shared(view: str, entry: SharedEntry) -> Response:
+    """ResponseCache._send for a mapped entry: ETag/304, gzip, body streamed from the mapping"""
+    CACHE_REQUESTS.labels(view, "shared").inc()
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(entry.etag.strip('"')):
+        return Response(status=304, headers=headers)
+    body = entry.body
+    if entry.gzip_body is not None and "gzip" in request.accept_encodings:
+        headers["Content-Encoding"] = "gzip"
+        body = entry.gzip_body
+    headers["Content-Length"] = str(len(body))
+    return Response(iter_chunks(body), mimetype="application/json", headers=headers, direct_passthrough=True)
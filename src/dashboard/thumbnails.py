@@ -0,0 +1,290 @@
+"""
+Header-image thumbnails for /img/<app_id>
+
+Game grids used to load every header_image straight from Steam's CDN at
+full size. The dashboard serves small resized copies instead, from a
+cache under data/steam/thumbnails:
+
+    blobs/<ab>/<digest>.<ext>   image bytes, named by their blake2b digest
+    index.db                    SQLite: the blob holding each app's image per
+                                size and the URL it was made from; blob sizes
+                                and last use
+
+- a request for an app with nothing cached, or with an image cached from
+  another URL than the snapshot's header_image (the producer saw it change),
+  queues a background fetch and is redirected to the original URL meanwhile
+- each image is fetched once and resized to every width in SIZES with
+  Pillow; without Pillow the original bytes are served for every size
+- identical outputs share one blob, so a URL that changed without the
+  picture changing costs no space; blobs nothing refers to are deleted
+- the blobs' total size stays under `max_bytes` by evicting the least
+  recently used; last use is written at most every TOUCH_INTERVAL per blob
+- every dashboard worker uses the same database and files; a blob missing
+  on disk (evicted by another worker mid-request) just counts as a miss
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import requests
+
+import metrics
+from snapshot import atomic_write_bytes
+
+try:
+    from PIL import Image
+except ImportError:  # optional: without Pillow, originals are served unresized
+    Image = None
+
+THUMBNAILS_DIRNAME = "thumbnails"
+INDEX_FILENAME = "index.db"
+
+# Output widths in pixels (Steam header images are 460 wide)
+SIZES = {"sm": 184, "md": 292, "lg": 460}
+DEFAULT_SIZE = "md"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Eviction goes down to this fraction of max_bytes, so it does not run on every store
+EVICT_TO = 0.9
+MAX_SOURCE_BYTES = 5 * 1024 * 1024
+FETCH_TIMEOUT = 10.0
+# Seconds before a URL that failed to download is tried again
+RETRY_INTERVAL = 300.0
+TOUCH_INTERVAL = 60.0
+JPEG_QUALITY = 82
+
+EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp", "image/gif": "gif"}
+
+THUMBNAIL_REQUESTS = metrics.counter("dashboard_thumbnail_requests_total", "Thumbnail requests by result", ("result",))
+THUMBNAIL_FETCHES = metrics.counter("dashboard_thumbnail_fetches_total", "Source image downloads by result", ("result",))
+THUMBNAIL_EVICTIONS = metrics.counter("dashboard_thumbnail_evictions_total", "Thumbnail blobs evicted to stay in budget")
+THUMBNAIL_BYTES = metrics.gauge("dashboard_thumbnail_cache_bytes", "Bytes of thumbnail blobs on disk")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    app_id INTEGER NOT NULL,
+    size TEXT NOT NULL,
+    url TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (app_id, size)
+);
+CREATE INDEX IF NOT EXISTS images_digest ON images (digest);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    mimetype TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blobs_last_used ON blobs (last_used);
+"""
+
+
+def url_version(url: str) -> str:
+    """32-bit FNV-1a of the URL in hex: the ?v= that makes /img responses cacheable for good
+
+    steam.html computes the same over UTF-16 code units, which are the
+    characters themselves for the ASCII URLs Steam uses.
+    """
+    h = 0x811C9DC5
+    for ch in url:
+        h = ((h ^ ord(ch)) * 0x01000193) & 0xFFFFFFFF
+    return format(h, "x")
+
+
+@dataclass(frozen=True)
+class Thumbnail:
+    path: Path
+    digest: str
+    mimetype: str
+
+
+class ThumbnailCache:
+    """Content-addressed on-disk thumbnails with size-bounded LRU eviction"""
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_MAX_BYTES, workers: int = 2,
+                 session: Optional[requests.Session] = None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.session = session or requests.Session()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending: Set[Tuple[int, str]] = set()
+        self._failed: Dict[str, float] = {}  # url -> when to try again
+        self._touched: Dict[str, float] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="thumbnails")
+        self.root.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.root / INDEX_FILENAME, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def blob_path(self, digest: str, mimetype: str) -> Path:
+        return self.root / "blobs" / digest[:2] / f"{digest}.{EXTENSIONS.get(mimetype, 'img')}"
+
+    # --- serving ---
+
+    def get(self, app_id: int, url: str, size: str = DEFAULT_SIZE) -> Optional[Thumbnail]:
+        """The `size` thumbnail of `app_id` made from `url`; None queues a fetch"""
+        row = self._conn().execute(
+            "SELECT images.url, images.digest, blobs.mimetype FROM images JOIN blobs USING (digest)"
+            " WHERE images.app_id = ? AND images.size = ?", (app_id, size),
+        ).fetchone()
+        if row is not None and row[0] == url:
+            thumbnail = Thumbnail(self.blob_path(row[1], row[2]), row[1], row[2])
+            if thumbnail.path.exists():
+                self._touch(thumbnail.digest)
+                THUMBNAIL_REQUESTS.labels("hit").inc()
+                return thumbnail
+        THUMBNAIL_REQUESTS.labels("miss" if row is None else "stale").inc()
+        self.request(app_id, url)
+        return None
+
+    def _touch(self, digest: str):
+        now = time.time()
+        if now - self._touched.get(digest, 0.0) < TOUCH_INTERVAL:
+            return
+        self._touched[digest] = now
+        self._conn().execute("UPDATE blobs SET last_used = ? WHERE digest = ?", (now, digest))
+
+    # --- fetching ---
+
+    def request(self, app_id: int, url: str):
+        """Fetch and store `url` as the image of `app_id` in the background (once at a time)"""
+        key = (app_id, url)
+        with self._lock:
+            if key in self._pending or self._failed.get(url, 0.0) > time.time():
+                return
+            self._pending.add(key)
+        self._executor.submit(self._fetch, app_id, url)
+
+    def _fetch(self, app_id: int, url: str):
+        try:
+            data, mimetype = self._download(url)
+            self._store(app_id, url, self._variants(data, mimetype))
+            THUMBNAIL_FETCHES.labels("ok").inc()
+        except Exception as e:
+            with self._lock:
+                self._failed[url] = time.time() + RETRY_INTERVAL
+            THUMBNAIL_FETCHES.labels("error").inc()
+            print(f"⚠️  Thumbnail for app {app_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard((app_id, url))
+
+    def _download(self, url: str) -> Tuple[bytes, str]:
+        with self.session.get(url, timeout=FETCH_TIMEOUT, stream=True) as r:
+            r.raise_for_status()
+            mimetype = r.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if not mimetype.startswith("image/"):
+                raise ValueError(f"not an image ({mimetype or 'no content type'})")
+            chunks: List[bytes] = []
+            total = 0
+            for chunk in r.iter_content(64 * 1024):
+                total += len(chunk)
+                if total > MAX_SOURCE_BYTES:
+                    raise ValueError(f"image larger than {MAX_SOURCE_BYTES} bytes")
+                chunks.append(chunk)
+        return b"".join(chunks), mimetype
+
+    @staticmethod
+    def _variants(data: bytes, mimetype: str) -> Dict[str, Tuple[bytes, str]]:
+        """size -> (image bytes, mimetype): JPEGs scaled down to each width (never up)"""
+        if Image is None:
+            return {size: (data, mimetype) for size in SIZES}
+        out = {}
+        with Image.open(io.BytesIO(data)) as source:
+            image = source.convert("RGB")
+        for size, width in SIZES.items():
+            resized = image
+            if image.width > width:
+                resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            out[size] = (buffer.getvalue(), "image/jpeg")
+        return out
+
+    def _store(self, app_id: int, url: str, variants: Dict[str, Tuple[bytes, str]]):
+        now = time.time()
+        stored = {}
+        for size, (data, mimetype) in variants.items():
+            stored[size] = (hashlib.blake2b(data, digest_size=16).hexdigest(), mimetype, data)
+        # Blobs are on disk before the index points at them
+        for digest, mimetype, data in stored.values():
+            path = self.blob_path(digest, mimetype)
+            if not path.exists():
+                atomic_write_bytes(path, data)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            previous = {row[0] for row in conn.execute("SELECT digest FROM images WHERE app_id = ?", (app_id,))}
+            for size, (digest, mimetype, data) in stored.items():
+                conn.execute(
+                    "INSERT INTO blobs (digest, mimetype, bytes, last_used) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (digest) DO UPDATE SET last_used = excluded.last_used",
+                    (digest, mimetype, len(data), now),
+                )
+                conn.execute("INSERT OR REPLACE INTO images (app_id, size, url, digest) VALUES (?, ?, ?, ?)",
+                             (app_id, size, url, digest))
+            current = {digest for digest, _, _ in stored.values()}
+            removed = self._drop_unreferenced(conn, previous - current)
+            removed.update(self._evict(conn))
+            total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM blobs").fetchone()[0]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        for digest, mimetype in removed.items():
+            self.blob_path(digest, mimetype).unlink(missing_ok=True)
+            self._touched.pop(digest, None)
+        THUMBNAIL_BYTES.set(total)
+
+    @staticmethod
+    def _drop_unreferenced(conn: sqlite3.Connection, digests: Set[str]) -> Dict[str, str]:
+        removed = {}
+        for digest in digests:
+            if conn.execute("SELECT 1 FROM images WHERE digest = ? LIMIT 1", (digest,)).fetchone() is None:
+                row = conn.execute("SELECT mimetype FROM blobs WHERE digest = ?", (digest,)).fetchone()
+                if row is not None:
+                    conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                    removed[digest] = row[0]
+        return removed
+
+    def _evict(self, conn: sqlite3.Connection) -> Dict[str, str]:
+        """Drop least recently used blobs (and the images using them) until under EVICT_TO of the budget"""
+        total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return {}
+        target = self.max_bytes * EVICT_TO
+        evicted = {}
+        for digest, mimetype, length in conn.execute("SELECT digest, mimetype, bytes FROM blobs ORDER BY last_used"):
+            if total <= target:
+                break
+            evicted[digest] = mimetype
+            total -= length
+        for digest in evicted:
+            conn.execute("DELETE FROM images WHERE digest = ?", (digest,))
+            conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        THUMBNAIL_EVICTIONS.inc(len(evicted))
+        return evicted
+
+    def stats(self) -> Dict[str, int]:
+        blobs, total = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM blobs").fetchone()
+        images = self._conn().execute("SELECT COUNT(DISTINCT app_id) FROM images").fetchone()[0]
+        return {"apps": images, "blobs": blobs, "bytes": total, "max_bytes": self.max_bytes}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,376 @@
+"""
+Local, file-backed, Kafka-style event log
+
+    <root>/<topic>/<partition>/<base_offset>.log    append-only segments
+    <root>/<topic>/__offsets/<group>.json           committed consumer offsets
+
+Records are appended in batches. A batch is a fixed header (base offset,
+record count, payload length, CRC32) followed by length-prefixed records
+(timestamp, key, value). Each partition has one active segment, which is
+rolled when it passes `segment_bytes`; whole old segments are deleted when a
+partition exceeds `retention_bytes` or a segment is older than
+`retention_seconds`.
+
+`LogProducer` mirrors the parts of kafka-python's `KafkaProducer` we use
+(`send`, `flush`, `close`), so a real broker can be swapped in later.
+`LogConsumer` reads any number of partitions independently per consumer
+group, with explicit `commit()`.
+"""
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from snapshot import atomic_write_bytes
+
+# base_offset, record count, payload length, crc32(payload)
+BATCH_HEADER = struct.Struct('<qIII')
+# timestamp_ms, key length (-1 = null), value length (-1 = null)
+RECORD_HEADER = struct.Struct('<qii')
+
+DEFAULT_PARTITIONS = 8
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+DEFAULT_RETENTION_BYTES = 1024 * 1024 * 1024
+DEFAULT_RETENTION_SECONDS = 7 * 86400
+
+RecordMetadata = namedtuple('RecordMetadata', ['topic', 'partition', 'offset'])
+ConsumerRecord = namedtuple('ConsumerRecord', ['topic', 'partition', 'offset', 'timestamp', 'key', 'value'])
+
+
+def partition_for(key: Optional[bytes], partitions: int) -> int:
+    """Stable key -> partition mapping (crc32, so it survives restarts)"""
+    if key is None:
+        return 0
+    return zlib.crc32(key) % partitions
+
+
+def _segment_path(partition_dir: Path, base_offset: int) -> Path:
+    return partition_dir / f"{base_offset:020d}.log"
+
+
+def _segments(partition_dir: Path) -> List[Tuple[int, Path]]:
+    try:
+        names = os.listdir(partition_dir)
+    except FileNotFoundError:
+        return []
+    return sorted((int(name[:-4]), partition_dir / name) for name in names if name.endswith('.log'))
+
+
+def _encode_batch(base_offset: int, records: List[Tuple[int, Optional[bytes], Optional[bytes]]]) -> bytes:
+    parts = []
+    for timestamp, key, value in records:
+        parts.append(RECORD_HEADER.pack(
+            timestamp, -1 if key is None else len(key), -1 if value is None else len(value),
+        ))
+        if key is not None:
+            parts.append(key)
+        if value is not None:
+            parts.append(value)
+    payload = b''.join(parts)
+    return BATCH_HEADER.pack(base_offset, len(records), len(payload), zlib.crc32(payload)) + payload
+
+
+def _decode_records(payload: bytes) -> Iterator[Tuple[int, Optional[bytes], Optional[bytes]]]:
+    pos = 0
+    while pos < len(payload):
+        timestamp, key_len, value_len = RECORD_HEADER.unpack_from(payload, pos)
+        pos += RECORD_HEADER.size
+        key = None
+        if key_len >= 0:
+            key = payload[pos:pos + key_len]
+            pos += key_len
+        value = None
+        if value_len >= 0:
+            value = payload[pos:pos + value_len]
+            pos += value_len
+        yield timestamp, key, value
+
+
+def _read_batches(path: Path, start_pos: int = 0) -> Iterator[Tuple[int, int, int, bytes]]:
+    """(position, base_offset, count, payload) for every complete, valid batch"""
+    with open(path, 'rb') as f:
+        f.seek(start_pos)
+        pos = start_pos
+        while True:
+            header = f.read(BATCH_HEADER.size)
+            if len(header) < BATCH_HEADER.size:
+                return
+            base_offset, count, length, crc = BATCH_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return  # torn or in-progress write
+            yield pos, base_offset, count, payload
+            pos += BATCH_HEADER.size + length
+
+
+class _Partition:
+    """Writer state for one partition: active segment and next offset"""
+
+    def __init__(self, directory: Path, segment_bytes: int):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        directory.mkdir(parents=True, exist_ok=True)
+        segments = _segments(directory)
+        if segments:
+            base, path = segments[-1]
+            self.next_offset, valid_end = base, 0
+            for pos, batch_base, count, payload in _read_batches(path):
+                self.next_offset = batch_base + count
+                valid_end = pos + BATCH_HEADER.size + len(payload)
+            if path.stat().st_size > valid_end:
+                # Drop a batch torn by a crash so appends continue from a clean end
+                with open(path, 'r+b') as f:
+                    f.truncate(valid_end)
+            self.active_path, self.active_size = path, valid_end
+        else:
+            self.next_offset = 0
+            self.active_path = _segment_path(directory, 0)
+            self.active_size = 0
+
+    def append(self, records: List[Tuple[int, Optional[bytes], Optional[bytes]]]) -> int:
+        """Write one batch; returns its base offset"""
+        if self.active_size >= self.segment_bytes:
+            self.active_path = _segment_path(self.directory, self.next_offset)
+            self.active_size = 0
+        base = self.next_offset
+        data = _encode_batch(base, records)
+        with open(self.active_path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.active_size += len(data)
+        self.next_offset += len(records)
+        return base
+
+    def enforce_retention(self, retention_bytes: Optional[int], retention_seconds: Optional[int]):
+        segments = _segments(self.directory)
+        sizes = [path.stat().st_size for _, path in segments]
+        total = sum(sizes)
+        cutoff = time.time() - retention_seconds if retention_seconds else None
+        for (_, path), size in zip(segments[:-1], sizes):  # never the active segment
+            too_big = retention_bytes and total > retention_bytes
+            too_old = cutoff and path.stat().st_mtime < cutoff
+            if not (too_big or too_old):
+                break
+            path.unlink()
+            total -= size
+
+
+class LogProducer:
+    """KafkaProducer-like writer for the local event log
+
+    `send()` buffers records per partition; `flush()` writes one batch per
+    partition. Keys and values may be bytes or anything the serializers accept.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        partitions: int = DEFAULT_PARTITIONS,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        retention_bytes: Optional[int] = DEFAULT_RETENTION_BYTES,
+        retention_seconds: Optional[int] = DEFAULT_RETENTION_SECONDS,
+        key_serializer=None,
+        value_serializer=None,
+    ):
+        self.root = Path(root)
+        self.partitions = partitions
+        self.segment_bytes = segment_bytes
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+        self.key_serializer = key_serializer
+        self.value_serializer = value_serializer
+        self._topics: Dict[str, List[_Partition]] = {}
+        self._pending: Dict[Tuple[str, int], List[Tuple[int, Optional[bytes], Optional[bytes]]]] = {}
+        self._lock = threading.Lock()
+
+    def _partitions(self, topic: str) -> List[_Partition]:
+        parts = self._topics.get(topic)
+        if parts is None:
+            topic_dir = self.root / topic
+            meta_path = topic_dir / 'topic.json'
+            if meta_path.exists():
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    count = json.load(f)['partitions']
+            else:
+                count = self.partitions
+                atomic_write_bytes(meta_path, json.dumps({'partitions': count}).encode('utf-8'))
+            parts = self._topics[topic] = [
+                _Partition(topic_dir / str(i), self.segment_bytes) for i in range(count)
+            ]
+        return parts
+
+    def send(self, topic: str, value: Any = None, key: Any = None, partition: Optional[int] = None,
+             timestamp_ms: Optional[int] = None) -> None:
+        if key is not None and self.key_serializer:
+            key = self.key_serializer(key)
+        if value is not None and self.value_serializer:
+            value = self.value_serializer(value)
+        with self._lock:
+            count = len(self._partitions(topic))
+            if partition is None:
+                partition = partition_for(key, count)
+            ts = timestamp_ms if timestamp_ms is not None else int(time.time() * 1000)
+            self._pending.setdefault((topic, partition), []).append((ts, key, value))
+
+    def flush(self, timeout: Optional[float] = None) -> List[RecordMetadata]:
+        """Write all buffered records; returns the base offset of each batch written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            written = []
+            for (topic, partition), records in pending.items():
+                part = self._partitions(topic)[partition]
+                written.append(RecordMetadata(topic, partition, part.append(records)))
+                part.enforce_retention(self.retention_bytes, self.retention_seconds)
+            return written
+
+    def close(self, timeout: Optional[float] = None):
+        self.flush()
+
+
+class LogConsumer:
+    """Reads a topic's partitions from committed offsets for one consumer group"""
+
+    def __init__(self, root: Path, topic: str, group_id: str, auto_offset_reset: str = 'earliest',
+                 key_deserializer=None, value_deserializer=None):
+        self.root = Path(root)
+        self.topic = topic
+        self.group_id = group_id
+        self.auto_offset_reset = auto_offset_reset
+        self.key_deserializer = key_deserializer
+        self.value_deserializer = value_deserializer
+        self._offsets_path = self.root / topic / '__offsets' / f"{group_id}.json"
+        self._committed = self._load_committed()
+        self._positions: Dict[int, int] = {}
+        # partition -> (segment base, segment path, byte position of the next batch)
+        self._cursors: Dict[int, Tuple[int, Path, int]] = {}
+
+    def _load_committed(self) -> Dict[int, int]:
+        try:
+            with open(self._offsets_path, 'r', encoding='utf-8') as f:
+                return {int(k): v for k, v in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+
+    def partitions(self) -> List[int]:
+        topic_dir = self.root / self.topic
+        try:
+            return sorted(int(name) for name in os.listdir(topic_dir) if name.isdigit())
+        except FileNotFoundError:
+            return []
+
+    def position(self, partition: int) -> int:
+        if partition not in self._positions:
+            committed = self._committed.get(partition)
+            if committed is not None:
+                self._positions[partition] = committed
+            elif self.auto_offset_reset == 'latest':
+                self._positions[partition] = self.end_offset(partition)
+            else:
+                segments = _segments(self.root / self.topic / str(partition))
+                self._positions[partition] = segments[0][0] if segments else 0
+        return self._positions[partition]
+
+    def end_offset(self, partition: int) -> int:
+        segments = _segments(self.root / self.topic / str(partition))
+        if not segments:
+            return 0
+        base, path = segments[-1]
+        end = base
+        for _, batch_base, count, _ in _read_batches(path):
+            end = batch_base + count
+        return end
+
+    def seek(self, partition: int, offset: int):
+        self._positions[partition] = offset
+        self._cursors.pop(partition, None)
+
+    def _locate(self, partition: int, offset: int) -> Optional[Tuple[int, Path, int]]:
+        """Segment and byte position of the batch containing `offset`"""
+        segments = _segments(self.root / self.topic / str(partition))
+        if not segments:
+            return None
+        if offset < segments[0][0]:
+            # Retention removed it; continue from the oldest available record
+            offset = segments[0][0]
+            self._positions[partition] = offset
+        candidates = [seg for seg in segments if seg[0] <= offset]
+        base, path = candidates[-1]
+        for pos, batch_base, count, _ in _read_batches(path):
+            if batch_base + count > offset:
+                return base, path, pos
+        return base, path, path.stat().st_size
+
+    def poll(self, max_records: int = 500) -> List[ConsumerRecord]:
+        """Up to `max_records` records across all partitions, advancing positions"""
+        out: List[ConsumerRecord] = []
+        for partition in self.partitions():
+            if len(out) >= max_records:
+                break
+            out.extend(self._poll_partition(partition, max_records - len(out)))
+        return out
+
+    def _poll_partition(self, partition: int, limit: int) -> List[ConsumerRecord]:
+        offset = self.position(partition)
+        cursor = self._cursors.get(partition)
+        if cursor is None or not cursor[1].exists():
+            # First read, after a seek, or the segment was removed by retention
+            cursor = self._locate(partition, offset)
+            if cursor is None:
+                return []
+            offset = self._positions[partition]
+        base, path, pos = cursor
+        out: List[ConsumerRecord] = []
+        while True:
+            for batch_pos, batch_base, count, payload in _read_batches(path, pos):
+                if batch_base + count <= offset:
+                    pos = batch_pos + BATCH_HEADER.size + len(payload)
+                    continue
+                start = max(0, offset - batch_base)
+                stop = min(count, start + limit - len(out))
+                for i, (timestamp, key, value) in enumerate(_decode_records(payload)):
+                    if i < start:
+                        continue
+                    if i >= stop:
+                        break
+                    if key is not None and self.key_deserializer:
+                        key = self.key_deserializer(key)
+                    if value is not None and self.value_deserializer:
+                        value = self.value_deserializer(value)
+                    out.append(ConsumerRecord(self.topic, partition, batch_base + i, timestamp, key, value))
+                offset = batch_base + stop
+                if stop < count:
+                    pos = batch_pos  # limit reached mid-batch; resume here
+                    break
+                pos = batch_pos + BATCH_HEADER.size + len(payload)
+            else:
+                # Segment exhausted: continue in the next one if the writer rolled
+                newer = [seg for seg in _segments(path.parent) if seg[0] > base]
+                if newer:
+                    base, path = newer[0]
+                    pos = 0
+                    continue
+            break
+        self._positions[partition] = offset
+        self._cursors[partition] = (base, path, pos)
+        return out
+
+    def commit(self, offsets: Optional[Dict[int, int]] = None):
+        """Persist positions (or the given partition -> next offset map) for this group"""
+        self._committed.update(offsets if offsets is not None else self._positions)
+        atomic_write_bytes(
+            self._offsets_path,
+            json.dumps({str(k): v for k, v in sorted(self._committed.items())}).encode('utf-8'),
+        )
+
+    def committed(self, partition: int) -> Optional[int]:
+        return self._committed.get(partition)
+
+    def close(self, autocommit: bool = False):
+        if autocommit:
+            self.commit()
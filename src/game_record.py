@@ -0,0 +1,345 @@
+"""
+Compact per-game record for the producer
+
+GameSnapshot replaces the ~30-key dict built per game per cycle:
+
+- `__slots__` instead of a per-record dict
+- genres, categories, developers and publishers are tuples of small ids
+  into process-wide Vocabulary objects (identical tuples are shared too),
+  so "Action" is stored once no matter how many games or cycles use it
+- derived fields (on_sale, has_dlc, event_time) are computed on access
+- `to_json()` writes the snapshot/API JSON object straight from the slots,
+  using pre-encoded vocabulary fragments, and caches the result; records
+  that did not change are carried over by ChangeTracker, so in steady state
+  most of a snapshot is serialized once and then reused
+
+GameSnapshot is also a read-only Mapping with the same keys as the old
+dict, so `game['name']` / `game.get('current_players')` keep working.
+
+With several storefront regions (steam_producer.py --regions) the price
+in each region is kept as one small tuple per region next to the shared
+metadata, and appears in the JSON object as `prices` (region -> price).
+"""
+import json
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Field order of the snapshot / API JSON object (prices, then change_seq, follow when set)
+FIELDS = (
+    'app_id', 'name', 'type', 'timestamp', 'event_time',
+    'is_free', 'initial_price', 'final_price', 'discount_percent', 'on_sale', 'currency',
+    'metacritic_score', 'total_recommendations',
+    'dlc_count', 'has_dlc',
+    'genres', 'categories',
+    'release_date', 'is_coming_soon',
+    'current_players',
+    'short_description', 'header_image', 'developers', 'publishers',
+)
+_FIELD_SET = frozenset(FIELDS)
+
+# region, currency, initial_price, final_price, discount_percent
+RegionalPrice = Tuple[str, str, float, float, int]
+
+
+_encode = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+
+
+class Vocabulary:
+    """Interns strings as small ints, and tuples of them as shared tuples"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._ids: Dict[str, int] = {}
+        self._strings: List[str] = []
+        self._tuples: Dict[Tuple[str, ...], Tuple[int, ...]] = {}
+        self._arrays: Dict[Tuple[int, ...], str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def id(self, value: str) -> int:
+        ident = self._ids.get(value)
+        if ident is None:
+            with self._lock:
+                ident = self._ids.get(value)
+                if ident is None:
+                    ident = self._ids[value] = len(self._strings)
+                    self._strings.append(value)
+        return ident
+
+    def ids(self, values: Iterable[str]) -> Tuple[int, ...]:
+        key = tuple(values)
+        ids = self._tuples.get(key)
+        if ids is None:
+            ids = self._tuples.setdefault(key, tuple(self.id(v) for v in key))
+        return ids
+
+    def strings(self, ids: Tuple[int, ...]) -> List[str]:
+        return [self._strings[i] for i in ids]
+
+    def json_array(self, ids: Tuple[int, ...]) -> str:
+        """`ids` as an encoded JSON array of strings, built once per distinct tuple"""
+        encoded = self._arrays.get(ids)
+        if encoded is None:
+            encoded = self._arrays.setdefault(ids, _encode(self.strings(ids)))
+        return encoded
+
+
+GENRES = Vocabulary('genres')
+CATEGORIES = Vocabulary('categories')
+DEVELOPERS = Vocabulary('developers')
+PUBLISHERS = Vocabulary('publishers')
+
+
+def _bool(value: bool) -> str:
+    return 'true' if value else 'false'
+
+
+def _number(value: Any) -> str:
+    return 'null' if value is None else repr(value)
+
+
+def _price_tuples(prices: Optional[Dict[str, Optional[Dict[str, Any]]]]) -> Tuple[RegionalPrice, ...]:
+    """Steam price_overview objects by region as price tuples; regions without a price are left out"""
+    if not prices:
+        return ()
+    return tuple(
+        (region, price.get('currency', ''), price.get('initial', 0) / 100, price.get('final', 0) / 100,
+         price.get('discount_percent', 0))
+        for region, price in prices.items() if price
+    )
+
+
+@dataclass(slots=True, eq=False)
+class GameSnapshot(Mapping):
+    app_id: int
+    name: str
+    type: str
+    timestamp: int
+    is_free: bool
+    initial_price: float
+    final_price: float
+    discount_percent: int
+    currency: str
+    metacritic_score: Optional[int]
+    total_recommendations: int
+    dlc_count: int
+    genre_ids: Tuple[int, ...]
+    category_ids: Tuple[int, ...]
+    release_date: str
+    is_coming_soon: bool
+    current_players: Optional[int]
+    short_description: str
+    header_image: str
+    developer_ids: Tuple[int, ...]
+    publisher_ids: Tuple[int, ...]
+    regional_prices: Tuple[RegionalPrice, ...] = ()
+    change_seq: Optional[int] = None
+    _json: Optional[str] = field(default=None, repr=False)
+
+    @classmethod
+    def from_details(cls, app_id: int, details: Dict[str, Any], player_count: Optional[int],
+                     timestamp: Optional[int] = None,
+                     prices: Optional[Dict[str, Optional[Dict[str, Any]]]] = None) -> 'GameSnapshot':
+        """Build from a Steam appdetails `data` object (and price_overview objects by region)"""
+        price_overview = details.get('price_overview') or {}
+        metacritic = details.get('metacritic') or {}
+        recommendations = details.get('recommendations') or {}
+        release_date = details.get('release_date') or {}
+        if timestamp is None:
+            timestamp = int(datetime.now(timezone.utc).timestamp() * 1000)
+        return cls(
+            app_id=app_id,
+            name=details.get('name', 'Unknown'),
+            type=details.get('type', 'game'),
+            timestamp=timestamp,
+            is_free=details.get('is_free', False),
+            initial_price=price_overview.get('initial', 0) / 100 if price_overview else 0,
+            final_price=price_overview.get('final', 0) / 100 if price_overview else 0,
+            discount_percent=price_overview.get('discount_percent', 0) if price_overview else 0,
+            currency=price_overview.get('currency', 'USD') if price_overview else 'USD',
+            metacritic_score=metacritic.get('score', None),
+            total_recommendations=recommendations.get('total', 0),
+            dlc_count=len(details.get('dlc') or []),
+            genre_ids=GENRES.ids(g.get('description', '') for g in details.get('genres') or []),
+            category_ids=CATEGORIES.ids(c.get('description', '') for c in details.get('categories') or []),
+            release_date=release_date.get('date', 'TBA') if release_date else 'TBA',
+            is_coming_soon=release_date.get('coming_soon', False) if release_date else False,
+            current_players=player_count,
+            short_description=details.get('short_description', '')[:200],
+            header_image=details.get('header_image', ''),
+            developer_ids=DEVELOPERS.ids(details.get('developers') or []),
+            publisher_ids=PUBLISHERS.ids(details.get('publishers') or []),
+            regional_prices=_price_tuples(prices),
+        )
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> 'GameSnapshot':
+        """Rebuild from the JSON object written by to_json() (e.g. a stored snapshot)"""
+        return cls(
+            app_id=record['app_id'],
+            name=record.get('name', 'Unknown'),
+            type=record.get('type', 'game'),
+            timestamp=record.get('timestamp', 0),
+            is_free=record.get('is_free', False),
+            initial_price=record.get('initial_price', 0),
+            final_price=record.get('final_price', 0),
+            discount_percent=record.get('discount_percent', 0),
+            currency=record.get('currency', 'USD'),
+            metacritic_score=record.get('metacritic_score'),
+            total_recommendations=record.get('total_recommendations', 0),
+            dlc_count=record.get('dlc_count', 0),
+            genre_ids=GENRES.ids(record.get('genres') or []),
+            category_ids=CATEGORIES.ids(record.get('categories') or []),
+            release_date=record.get('release_date', 'TBA'),
+            is_coming_soon=record.get('is_coming_soon', False),
+            current_players=record.get('current_players'),
+            short_description=record.get('short_description', ''),
+            header_image=record.get('header_image', ''),
+            developer_ids=DEVELOPERS.ids(record.get('developers') or []),
+            publisher_ids=PUBLISHERS.ids(record.get('publishers') or []),
+            regional_prices=tuple(
+                (region, price.get('currency', ''), price.get('initial_price', 0), price.get('final_price', 0),
+                 price.get('discount_percent', 0))
+                for region, price in (record.get('prices') or {}).items()
+            ),
+            change_seq=record.get('change_seq'),
+        )
+
+    # --- derived fields ---
+
+    @property
+    def event_time(self) -> str:
+        return datetime.fromtimestamp(self.timestamp / 1000, timezone.utc).isoformat()
+
+    @property
+    def on_sale(self) -> bool:
+        return self.discount_percent > 0
+
+    @property
+    def has_dlc(self) -> bool:
+        return self.dlc_count > 0
+
+    @property
+    def genres(self) -> List[str]:
+        return GENRES.strings(self.genre_ids)
+
+    @property
+    def categories(self) -> List[str]:
+        return CATEGORIES.strings(self.category_ids)
+
+    @property
+    def developers(self) -> List[str]:
+        return DEVELOPERS.strings(self.developer_ids)
+
+    @property
+    def publishers(self) -> List[str]:
+        return PUBLISHERS.strings(self.publisher_ids)
+
+    @property
+    def prices(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            region: {'currency': currency, 'initial_price': initial, 'final_price': final,
+                     'discount_percent': discount}
+            for region, currency, initial, final, discount in self.regional_prices
+        }
+
+    # --- change detection ---
+
+    def content_key(self) -> tuple:
+        """Everything except the fetch timestamp and change_seq"""
+        return (
+            self.app_id, self.name, self.type, self.is_free, self.initial_price, self.final_price,
+            self.discount_percent, self.currency, self.metacritic_score, self.total_recommendations,
+            self.dlc_count, self.genre_ids, self.category_ids, self.release_date, self.is_coming_soon,
+            self.current_players, self.short_description, self.header_image, self.developer_ids,
+            self.publisher_ids, self.regional_prices,
+        )
+
+    def with_change_seq(self, change_seq: int) -> 'GameSnapshot':
+        return replace(self, change_seq=change_seq, _json=None)
+
+    # --- Mapping interface (the old dict's keys) ---
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        if key == 'prices' and self.regional_prices:
+            return self.prices
+        if key == 'change_seq' and self.change_seq is not None:
+            return self.change_seq
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from FIELDS
+        if self.regional_prices:
+            yield 'prices'
+        if self.change_seq is not None:
+            yield 'change_seq'
+
+    def __len__(self) -> int:
+        return len(FIELDS) + bool(self.regional_prices) + (self.change_seq is not None)
+
+    # --- serialization ---
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self[key] for key in self}
+
+    def to_json(self) -> str:
+        """The record as a compact JSON object, identical to json.dumps(to_dict())"""
+        if self._json is None:
+            self._json = ''.join((
+                '{"app_id":', str(self.app_id),
+                ',"name":', _encode(self.name),
+                ',"type":', _encode(self.type),
+                ',"timestamp":', str(self.timestamp),
+                ',"event_time":"', self.event_time,
+                '","is_free":', _bool(self.is_free),
+                ',"initial_price":', _number(self.initial_price),
+                ',"final_price":', _number(self.final_price),
+                ',"discount_percent":', str(self.discount_percent),
+                ',"on_sale":', _bool(self.on_sale),
+                ',"currency":', _encode(self.currency),
+                ',"metacritic_score":', _number(self.metacritic_score),
+                ',"total_recommendations":', str(self.total_recommendations),
+                ',"dlc_count":', str(self.dlc_count),
+                ',"has_dlc":', _bool(self.has_dlc),
+                ',"genres":', GENRES.json_array(self.genre_ids),
+                ',"categories":', CATEGORIES.json_array(self.category_ids),
+                ',"release_date":', _encode(self.release_date),
+                ',"is_coming_soon":', _bool(self.is_coming_soon),
+                ',"current_players":', _number(self.current_players),
+                ',"short_description":', _encode(self.short_description),
+                ',"header_image":', _encode(self.header_image),
+                ',"developers":', DEVELOPERS.json_array(self.developer_ids),
+                ',"publishers":', PUBLISHERS.json_array(self.publisher_ids),
+                _prices_json(self.regional_prices),
+                '' if self.change_seq is None else f',"change_seq":{self.change_seq}',
+                '}',
+            ))
+        return self._json
+
+
+def _prices_json(prices: Tuple[RegionalPrice, ...]) -> str:
+    if not prices:
+        return ''
+    return ''.join((
+        ',"prices":{',
+        ','.join(
+            f'{_encode(region)}:{{"currency":{_encode(currency)},"initial_price":{_number(initial)},'
+            f'"final_price":{_number(final)},"discount_percent":{discount}}}'
+            for region, currency, initial, final, discount in prices
+        ),
+        '}',
+    ))
+
+
+def record_json(record: Any) -> str:
+    """Compact JSON for a GameSnapshot or a plain record dict"""
+    if isinstance(record, GameSnapshot):
+        return record.to_json()
+    return json.dumps(record, separators=(',', ':'), ensure_ascii=False)
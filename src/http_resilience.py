@@ -0,0 +1,159 @@
+"""
+Failure handling for Steam HTTP requests
+
+- FetchResult: typed outcome of a request, so callers can tell "app has no
+  data" from "Steam is rate limiting us" from "host is down"
+- RetryPolicy: exponential backoff with full jitter, honouring Retry-After
+- CircuitBreaker: per host; opens after consecutive failures, lets a single
+  probe through after a cool-down, and closes again on success
+"""
+import enum
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Generic, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class FetchStatus(enum.Enum):
+    OK = 'ok'
+    NO_DATA = 'no_data'            # request worked, Steam has nothing for this app
+    RATE_LIMITED = 'rate_limited'  # 429
+    SERVER_ERROR = 'server_error'  # 5xx, or a 200 whose body is not valid JSON
+    CLIENT_ERROR = 'client_error'  # other 4xx
+    NETWORK_ERROR = 'network_error'
+    CIRCUIT_OPEN = 'circuit_open'  # not sent: the host is failing
+
+    @property
+    def host_problem(self) -> bool:
+        """Failure caused by the host, not by the app being asked for"""
+        return self in (FetchStatus.RATE_LIMITED, FetchStatus.SERVER_ERROR,
+                        FetchStatus.NETWORK_ERROR, FetchStatus.CIRCUIT_OPEN)
+
+
+@dataclass
+class FetchResult(Generic[T]):
+    status: FetchStatus
+    value: Optional[T] = None
+    error: Optional[str] = None
+    retry_after: Optional[float] = None
+    attempts: int = 1
+
+    @property
+    def ok(self) -> bool:
+        return self.status is FetchStatus.OK
+
+    @classmethod
+    def success(cls, value: T, attempts: int = 1) -> 'FetchResult[T]':
+        return cls(FetchStatus.OK, value=value, attempts=attempts)
+
+
+# Outcomes worth another attempt; anything else is final for this request
+RETRYABLE = (FetchStatus.RATE_LIMITED, FetchStatus.SERVER_ERROR, FetchStatus.NETWORK_ERROR)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Sleep before retry number `attempt` (1-based); Retry-After wins when given"""
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures -> half-open probe"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, max_reset_timeout: float = 600.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._timeout = reset_timeout
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self._timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self) -> bool:
+        """Whether a request may go out now (at most one probe while half-open)"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self._timeout or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self._timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._timeout = self.reset_timeout
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing:
+                # Probe failed: stay open, wait longer before the next one
+                self._probing = False
+                self._opened_at = time.monotonic()
+                self._timeout = min(self.max_reset_timeout, self._timeout * 2)
+            elif self._opened_at is None and self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class HostBreakers:
+    """One CircuitBreaker per host"""
+
+    def __init__(self, **breaker_kwargs: Any):
+        self._kwargs = breaker_kwargs
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(host, CircuitBreaker(**self._kwargs))
+        return breaker
+
+    def states(self) -> Dict[str, str]:
+        return {host: breaker.state for host, breaker in self._breakers.items()}
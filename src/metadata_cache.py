@@ -0,0 +1,120 @@
+"""
+On-disk cache of static Steam app metadata
+
+Genres, categories, developers, publishers, header image and description
+rarely change, so they are fetched with the full appdetails call on a long
+TTL and kept here between cycles (and restarts). Volatile fields (price)
+are refreshed separately and overlaid on top. Prices in extra storefront
+regions are kept per app too, only as fallbacks for failed refreshes.
+"""
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from snapshot import atomic_write_bytes
+
+
+# appdetails keys that extract_game_data reads, minus the volatile price block
+STATIC_FIELDS = (
+    'name', 'type', 'is_free', 'metacritic', 'recommendations', 'dlc',
+    'genres', 'categories', 'release_date', 'short_description',
+    'header_image', 'developers', 'publishers',
+)
+
+
+class MetadataCache:
+    """app_id -> static appdetails fields, with fetch time for TTL checks"""
+
+    def __init__(self, path: Path, ttl: float = 24 * 3600):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+            self._entries = {int(k): v for k, v in raw.get('apps', {}).items()}
+        except FileNotFoundError:
+            self._entries = {}
+        except Exception as e:
+            print(f"Error loading metadata cache: {e}")
+            self._entries = {}
+
+    def save(self):
+        """Write the cache if anything changed since the last save"""
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {'apps': {str(k): v for k, v in self._entries.items()}}
+            self._dirty = False
+        atomic_write_bytes(self.path, json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+
+    def stale_ids(self, app_ids: Iterable[int], now: Optional[float] = None) -> List[int]:
+        """App ids with no cached metadata or metadata older than the TTL"""
+        now = now or time.time()
+        with self._lock:
+            return [
+                app_id for app_id in app_ids
+                if app_id not in self._entries
+                or now - self._entries[app_id].get('fetched_at', 0) >= self.ttl
+            ]
+
+    def put_details(self, app_id: int, details: Dict[str, Any]):
+        """Store the static part of a full appdetails payload"""
+        entry = {key: details[key] for key in STATIC_FIELDS if key in details}
+        with self._lock:
+            previous = self._entries.get(app_id) or {}
+            self._entries[app_id] = {
+                'fetched_at': int(time.time()),
+                'details': entry,
+                'price_overview': details.get('price_overview'),
+            }
+            if previous.get('regions'):
+                self._entries[app_id]['regions'] = previous['regions']
+            self._dirty = True
+
+    def put_price(self, app_id: int, price_overview: Optional[Dict[str, Any]]):
+        """Remember the latest price so a failed price refresh can fall back to it"""
+        with self._lock:
+            entry = self._entries.get(app_id)
+            if entry is not None and entry.get('price_overview') != price_overview:
+                entry['price_overview'] = price_overview
+                self._dirty = True
+
+    def put_region_price(self, app_id: int, region: str, price_overview: Optional[Dict[str, Any]]):
+        """Remember the latest price in an extra storefront region"""
+        with self._lock:
+            entry = self._entries.get(app_id)
+            if entry is None:
+                return
+            regions = entry.setdefault('regions', {})
+            if region not in regions or regions[region] != price_overview:
+                regions[region] = price_overview
+                self._dirty = True
+
+    def region_price(self, app_id: int, region: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(app_id)
+            return (entry.get('regions') or {}).get(region) if entry is not None else None
+
+    def merged_details(self, app_id: int) -> Optional[Dict[str, Any]]:
+        """Static metadata with the latest known price overlaid, in appdetails shape"""
+        with self._lock:
+            entry = self._entries.get(app_id)
+            if entry is None:
+                return None
+            details = dict(entry['details'])
+            if entry.get('price_overview'):
+                details['price_overview'] = entry['price_overview']
+            return details
+
+    def discard(self, app_id: int):
+        with self._lock:
+            if self._entries.pop(app_id, None) is not None:
+                self._dirty = True
@@ -0,0 +1,298 @@
+"""
+Prometheus-style metrics shared by the producer and the dashboard
+
+Counters, gauges and histograms with labels, rendered in the Prometheus
+text exposition format. Updates are per-thread: each thread gets its own
+cell the first time it touches a metric and afterwards only writes that
+cell, so the hot path takes no lock. Cells are summed when rendering.
+
+The producer runs in its own process, so it writes its rendered metrics to
+a text file after every cycle (`write_textfile`) and the dashboard appends
+that file to its own `/metrics` output. Pre-forked dashboard workers do the
+same with each other: each renders with a `worker` label and their files
+are combined with `merge_rendered`, so every scrape reports every worker.
+"""
+import math
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class _Cells:
+    """Per-thread accumulator cells for one labelled series"""
+
+    __slots__ = ('_cells', '_size', '_lock')
+
+    def __init__(self, size: int):
+        self._cells: Dict[int, List[float]] = {}
+        self._size = size
+        self._lock = threading.Lock()
+
+    def cell(self) -> List[float]:
+        tid = threading.get_ident()
+        cell = self._cells.get(tid)
+        if cell is None:
+            with self._lock:
+                cell = self._cells.setdefault(tid, [0.0] * self._size)
+        return cell
+
+    def total(self) -> List[float]:
+        out = [0.0] * self._size
+        for cell in list(self._cells.values()):
+            for i, value in enumerate(cell):
+                out[i] += value
+        return out
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str, **kwargs: str):
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self, labels: Sequence[Tuple[str, str]] = ()) -> List[str]:
+        """Exposition lines; `labels` are added to every sample"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child, labels))
+        return lines
+
+    def _render_child(self, values, child, labels) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ('_cells',)
+
+    def __init__(self):
+        self._cells = _Cells(1)
+
+    def inc(self, amount: float = 1.0):
+        self._cells.cell()[0] += amount
+
+    def value(self) -> float:
+        return self._cells.total()[0]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def _render_child(self, values, child, labels):
+        return [f'{self.name}{_format_labels(self.labelnames, values, labels)} {_format_value(child.value())}']
+
+
+class _GaugeChild:
+    """Gauges are set, not accumulated, so they hold a single value"""
+
+    __slots__ = ('_value',)
+
+    def __init__(self):
+        self._value = 0.0
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def _render_child(self, values, child, labels):
+        return [f'{self.name}{_format_labels(self.labelnames, values, labels)} {_format_value(child.value())}']
+
+
+class _Timer:
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', '_cells')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # one count per bucket (non-cumulative), then sum, then count
+        self._cells = _Cells(len(bounds) + 2)
+
+    def observe(self, value: float):
+        cell = self._cells.cell()
+        for i, bound in enumerate(self._bounds):
+            if value <= bound:
+                cell[i] += 1
+                break
+        cell[-2] += value
+        cell[-1] += 1
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    def totals(self) -> List[float]:
+        return self._cells.total()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def _render_child(self, values, child, labels):
+        totals = child.totals()
+        lines, cumulative = [], 0.0
+        for bound, count in zip(self.bounds, totals):
+            cumulative += count
+            bucket = _format_labels(self.labelnames, values, (*labels, ('le', _format_value(bound))))
+            lines.append(f'{self.name}_bucket{bucket} {_format_value(cumulative)}')
+        series = _format_labels(self.labelnames, values, labels)
+        lines.append(f'{self.name}_sum{series} {_format_value(totals[-2])}')
+        lines.append(f'{self.name}_count{series} {_format_value(totals[-1])}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self, labels: Optional[Dict[str, str]] = None) -> str:
+        """All metrics in the text format; `labels` (e.g. {"worker": pid}) are added to every sample"""
+        extra = tuple(labels.items()) if labels else ()
+        lines: List[str] = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render(extra))
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: Path, labels: Optional[Dict[str, str]] = None):
+        """Atomically write the rendered metrics (for another process to serve)"""
+        from snapshot import atomic_write_bytes
+        atomic_write_bytes(path, self.render(labels).encode('utf-8'))
+
+
+def merge_rendered(texts: Iterable[str]) -> str:
+    """Combine renders of the same families from several processes into one exposition
+
+    Each family keeps a single HELP/TYPE block (from the first text that has
+    it) followed by the samples of every text, so the texts must tell their
+    series apart by label (see Registry.render).
+    """
+    headers: Dict[str, List[str]] = {}
+    samples: Dict[str, List[str]] = {}
+    for text in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith('# HELP ') or line.startswith('# TYPE '):
+                family = line.split(' ', 3)[2]
+                if family not in samples:
+                    samples[family] = []
+                    headers[family] = []
+                if len(headers[family]) < 2 and line not in headers[family]:
+                    headers[family].append(line)
+            elif line and family is not None:
+                samples[family].append(line)
+    lines: List[str] = []
+    for family in sorted(samples):
+        lines.extend(headers[family])
+        lines.extend(samples[family])
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+REGISTRY = Registry()
+
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
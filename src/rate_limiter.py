@@ -0,0 +1,80 @@
+"""
+Rate limiting for Steam API requests
+
+A token bucket per Steam host, shared by all fetch workers, so the request
+rate stays within Steam's budget no matter how many threads are running.
+"""
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens if available; otherwise return seconds to wait (0 on success)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def pause(self, seconds: float):
+        """Hold back all requests for `seconds` (e.g. a server's Retry-After)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until `tokens` are available, then take them"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """One token bucket per host, looked up from the request URL"""
+
+    def __init__(self, rates: Dict[str, float], default_rate: float = 1.0, burst: Optional[float] = None):
+        self._default_rate = default_rate
+        self._burst = burst
+        self._buckets: Dict[str, TokenBucket] = {
+            host: TokenBucket(rate, burst) for host, rate in rates.items()
+        }
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(host, TokenBucket(self._default_rate, self._burst))
+        return bucket
+
+    def acquire(self, url: str):
+        """Block until a request to `url` fits in its host's budget"""
+        self.bucket(urlparse(url).netloc).acquire()
+
+    def pause(self, url: str, seconds: float):
+        """Hold back every request to `url`'s host for `seconds`"""
+        self.bucket(urlparse(url).netloc).pause(seconds)
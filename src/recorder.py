@@ -0,0 +1,187 @@
+"""
+Raw Steam response recordings, for reprocessing history (see replay.py)
+
+    python src/steam_producer.py --record                # data/steam/recordings
+
+Layout of a recording directory (one per producer process):
+
+    blobs.pack              content-addressed payloads: 16-byte blake2b digest,
+                            u32 length, zlib-compressed canonical JSON
+    index/<YYYYMMDD>.gz     one gzip member per producer cycle, JSON lines
+                            [t, app_id, kind, a, b]
+
+Index kinds:
+    details    full appdetails payload fetched: a = blob of the payload without
+               price_overview, b = blob of price_overview (null = none)
+    price      batched price refresh answered: a = blob of price_overview (or null)
+    region     price refresh in an extra storefront region answered: a = blob of
+               price_overview (or null), b = region
+    sample     the cycle produced a record for the app: a = player count (or null),
+               b = the regions priced, primary first (null = single region)
+    watchlist  app_id 0, a = the app_ids this producer polls from now on
+
+A payload is stored once however many cycles return it. Since appdetails
+is recorded without its price block, a game's static metadata stays one
+blob while its price changes, and repeated prices are shared too.
+
+Blobs are written and flushed before the index lines that refer to them,
+so a crash can only lose the tail of a cycle; torn pack entries are
+dropped when the pack is reopened and a torn index member ends that file.
+"""
+import gzip
+import hashlib
+import json
+import os
+import struct
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import metrics
+
+BLOBS_FILENAME = "blobs.pack"
+INDEX_DIRNAME = "index"
+
+# digest, compressed length
+BLOB_HEADER = struct.Struct("<16sI")
+
+DETAILS, PRICE, REGION, SAMPLE, WATCHLIST = "details", "price", "region", "sample", "watchlist"
+
+RECORDED_EVENTS = metrics.counter("producer_recorded_events_total", "Raw responses recorded by kind", ("kind",))
+RECORDED_BLOBS = metrics.counter("producer_recorded_blobs_total",
+                                 "Payloads offered to the recording, new or already stored", ("result",))
+RECORDED_BYTES = metrics.counter("producer_recorded_bytes_total", "Compressed bytes appended to recordings")
+
+_encode = json.JSONEncoder(separators=(",", ":"), sort_keys=True, ensure_ascii=False).encode
+
+
+def _index_name(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y%m%d") + ".gz"
+
+
+def _scan_pack(path: Path) -> Tuple[Dict[bytes, Tuple[int, int]], int]:
+    """digest -> (data offset, length) for every complete entry, and where the valid data ends"""
+    entries: Dict[bytes, Tuple[int, int]] = {}
+    end = 0
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return entries, 0
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        while end + BLOB_HEADER.size <= size:
+            digest, length = BLOB_HEADER.unpack(f.read(BLOB_HEADER.size))
+            if end + BLOB_HEADER.size + length > size:
+                break
+            entries[digest] = (end + BLOB_HEADER.size, length)
+            end += BLOB_HEADER.size + length
+            f.seek(end)
+    return entries, end
+
+
+class ResponseRecorder:
+    """Appends a producer's raw responses; `flush()` once per cycle"""
+
+    def __init__(self, root: Path, level: int = 6):
+        self.root = Path(root)
+        self.level = level
+        (self.root / INDEX_DIRNAME).mkdir(parents=True, exist_ok=True)
+        pack_path = self.root / BLOBS_FILENAME
+        entries, end = _scan_pack(pack_path)
+        self._known = set(entries)
+        self._pack = open(pack_path, "ab")
+        if self._pack.tell() > end:
+            self._pack.truncate(end)  # drop an entry torn by a crash
+        self._pending: List[list] = []
+
+    def _blob(self, payload: Any) -> Optional[str]:
+        if payload is None:
+            return None
+        data = _encode(payload).encode("utf-8")
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if digest in self._known:
+            RECORDED_BLOBS.labels("duplicate").inc()
+        else:
+            compressed = zlib.compress(data, self.level)
+            self._pack.write(BLOB_HEADER.pack(digest, len(compressed)) + compressed)
+            self._known.add(digest)
+            RECORDED_BLOBS.labels("new").inc()
+            RECORDED_BYTES.inc(BLOB_HEADER.size + len(compressed))
+        return digest.hex()
+
+    def details(self, app_id: int, details: Dict[str, Any]):
+        static = {k: v for k, v in details.items() if k != "price_overview"}
+        self._pending.append([app_id, DETAILS, self._blob(static), self._blob(details.get("price_overview"))])
+
+    def price(self, app_id: int, price_overview: Optional[Dict[str, Any]]):
+        self._pending.append([app_id, PRICE, self._blob(price_overview), None])
+
+    def region_price(self, app_id: int, region: str, price_overview: Optional[Dict[str, Any]]):
+        self._pending.append([app_id, REGION, self._blob(price_overview), region])
+
+    def sample(self, app_id: int, player_count: Optional[int], regions: Optional[List[str]] = None):
+        self._pending.append([app_id, SAMPLE, player_count, regions])
+
+    def watchlist(self, app_ids: List[int], timestamp: Optional[int] = None):
+        self._pending.append([0, WATCHLIST, list(app_ids), None])
+        self.flush(timestamp)
+
+    def flush(self, timestamp: Optional[int] = None):
+        """Write this cycle's index lines, stamped with `timestamp` (default now)"""
+        if not self._pending:
+            return
+        ts = int(timestamp if timestamp is not None else time.time())
+        self._pack.flush()
+        os.fsync(self._pack.fileno())
+        lines = "".join(json.dumps([ts, *event], separators=(",", ":")) + "\n" for event in self._pending)
+        data = gzip.compress(lines.encode("utf-8"))
+        with open(self.root / INDEX_DIRNAME / _index_name(ts), "ab") as f:
+            f.write(data)
+        for event in self._pending:
+            RECORDED_EVENTS.labels(event[1]).inc()
+        RECORDED_BYTES.inc(len(data))
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        self._pack.close()
+
+
+class RecordingReader:
+    """Reads one recording directory: index lines in time order, blobs by digest"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._entries, _ = _scan_pack(self.root / BLOBS_FILENAME)
+        self._pack = None
+
+    def index_files(self) -> List[Path]:
+        return sorted((self.root / INDEX_DIRNAME).glob("*.gz"))
+
+    def events(self) -> Iterator[list]:
+        """[t, app_id, kind, a, b] for every recorded event, oldest first"""
+        for path in self.index_files():
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        yield json.loads(line)
+            except (EOFError, OSError, zlib.error, ValueError) as e:
+                # A cycle torn by a crash: everything before it is still good
+                print(f"⚠️  {path}: stopped at a damaged entry ({e})")
+
+    def blob(self, ref: str) -> Any:
+        offset, length = self._entries[bytes.fromhex(ref)]
+        if self._pack is None:
+            self._pack = open(self.root / BLOBS_FILENAME, "rb")
+        self._pack.seek(offset)
+        return json.loads(zlib.decompress(self._pack.read(length)))
+
+    def __contains__(self, ref: str) -> bool:
+        return bytes.fromhex(ref) in self._entries
+
+    def close(self):
+        if self._pack is not None:
+            self._pack.close()
+            self._pack = None
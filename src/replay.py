@@ -0,0 +1,239 @@
+"""
+Replay recorded Steam responses through extraction and the sinks
+
+    python src/steam_producer.py --replay data/steam/recordings --replay-to data/steam/replay
+
+Rebuilds the snapshot, history (and, with --sink, the event stream) from
+recordings made with --record, without touching Steam: after changing
+extract_game_data, replaying backfills every record it would have made.
+
+The parent walks the recording index in time order (several recordings,
+e.g. one per shard, are merged by time). It only keeps, per app, which
+blobs hold its latest metadata and prices, so planning a cycle costs a few
+dict updates per event. Cycles are handed to a process pool in chunks;
+workers decompress the blobs (each one once per worker) and run
+extract_game_data. The parent then feeds the records, in order, through
+ChangeTracker.update and the history/stream sinks as they come back, so
+memory stays bounded however long the recording is. The snapshot is
+written once, at the end.
+"""
+import heapq
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from change_log import ChangeTracker
+from game_record import GameSnapshot
+from recorder import DETAILS, PRICE, REGION, SAMPLE, WATCHLIST, RecordingReader
+from sinks import SINK_ERRORS, CycleResult, Sink
+from snapshot import SNAPSHOT_FILENAME, SnapshotWriter
+
+# Samples (records to extract) per task sent to a worker
+REPLAY_CHUNK = 20000
+# Seconds between progress lines
+PROGRESS_INTERVAL = 10.0
+
+# (recording index, blob digest)
+BlobRef = Tuple[int, str]
+# app_id, metadata blob, price blob (None = no price), player count,
+# and with several regions the primary one and (region, price blob) for the others
+Sample = Tuple[int, BlobRef, Optional[BlobRef], Optional[int], Optional[str], List[Tuple[str, Optional[BlobRef]]]]
+# timestamp, recording index, samples, new watchlist (None = unchanged)
+Cycle = Tuple[int, int, List[Sample], Optional[List[int]]]
+
+_readers: List[RecordingReader] = []
+
+
+def _init_worker(sources: List[str]):
+    global _readers
+    _readers = [RecordingReader(Path(source)) for source in sources]
+    _load.cache_clear()
+
+
+@lru_cache(maxsize=8192)
+def _load(ref: BlobRef) -> Any:
+    source, digest = ref
+    return _readers[source].blob(digest)
+
+
+def extract_cycles(cycles: List[Cycle]) -> List[Tuple[int, int, List[str], Optional[List[int]]]]:
+    """Worker side: the records each cycle's samples produce, as JSON (cheaper to ship than dicts)"""
+    from steam_producer import extract_game_data
+
+    out = []
+    for ts, source, samples, watchlist in cycles:
+        records = []
+        for app_id, details_ref, price_ref, players, primary, region_refs in samples:
+            details = dict(_load(details_ref))
+            if price_ref is not None:
+                details["price_overview"] = _load(price_ref)
+            prices = None
+            if primary is not None:
+                prices = {primary: details.get("price_overview")}
+                for region, ref in region_refs:
+                    prices[region] = _load(ref) if ref is not None else None
+            records.append(extract_game_data(app_id, details, players, ts * 1000, prices).to_json())
+        out.append((ts, source, records, watchlist))
+    return out
+
+
+def _tagged(reader: RecordingReader, source: int) -> Iterator[Tuple[int, int, list]]:
+    for event in reader.events():
+        yield event[0], source, event
+
+
+def plan_cycles(readers: List[RecordingReader]) -> Iterator[Cycle]:
+    """Cycles in time order, with each sample pointing at the blobs in force at the time"""
+    details: Dict[int, BlobRef] = {}
+    prices: Dict[int, Optional[BlobRef]] = {}
+    region_prices: Dict[int, Dict[str, Optional[BlobRef]]] = {}
+    key: Optional[Tuple[int, int]] = None
+    samples: List[Sample] = []
+    for ts, source, (_, app_id, kind, a, b) in heapq.merge(*(_tagged(r, i) for i, r in enumerate(readers)),
+                                                             key=lambda item: (item[0], item[1])):
+        if (ts, source) != key:
+            if samples:
+                yield key[0], key[1], samples, None
+            key, samples = (ts, source), []
+        if kind == SAMPLE:
+            if app_id in details:  # the producer could not have built a record either
+                primary, region_refs = None, []
+                if b:
+                    known = region_prices.get(app_id, {})
+                    primary, region_refs = b[0], [(region, known.get(region)) for region in b[1:]]
+                samples.append((app_id, details[app_id], prices.get(app_id), a, primary, region_refs))
+        elif kind == DETAILS:
+            details[app_id] = (source, a)
+            prices[app_id] = (source, b) if b else None
+        elif kind == PRICE:
+            prices[app_id] = (source, a) if a else None
+        elif kind == REGION:
+            region_prices.setdefault(app_id, {})[b] = (source, a) if a else None
+        elif kind == WATCHLIST:
+            if samples:
+                yield ts, source, samples, None
+                samples = []
+            yield ts, source, [], a
+    if samples:
+        yield key[0], key[1], samples, None
+
+
+def _chunks(cycles: Iterator[Cycle], size: int) -> Iterator[List[Cycle]]:
+    chunk: List[Cycle] = []
+    count = 0
+    for cycle in cycles:
+        chunk.append(cycle)
+        count += len(cycle[2]) + 1
+        if count >= size:
+            yield chunk
+            chunk, count = [], 0
+    if chunk:
+        yield chunk
+
+
+class Replayer:
+    """Parent side: applies extracted cycles in order and publishes them"""
+
+    def __init__(self, out_dir: Path, sinks: List[Sink]):
+        self.out_dir = Path(out_dir)
+        self.sinks = sinks
+        self.changes = ChangeTracker()
+        self.owner: Dict[int, int] = {}  # app_id -> recording that last refreshed it
+        self.order: Dict[int, List[int]] = {}  # recording -> its latest watchlist
+        self.cycles = 0
+        self.samples = 0
+        self.last_ts = 0
+
+    def apply(self, ts: int, source: int, records: List[str], watchlist: Optional[List[int]]):
+        games = [GameSnapshot.from_dict(json.loads(record)) for record in records]
+        for game in games:
+            self.owner[game.app_id] = source
+        removed: List[int] = []
+        if watchlist is not None:
+            self.order[source] = watchlist
+            keep = set(watchlist)
+            removed = [app_id for app_id, owner in self.owner.items() if owner == source and app_id not in keep]
+            for app_id in removed:
+                del self.owner[app_id]
+        changed, removed = self.changes.update(games, removed)
+        cycle = CycleResult(timestamp=ts, games=[], changed=changed, removed=removed, fetched=games)
+        for sink in self.sinks:
+            try:
+                sink.publish(cycle)
+            except Exception as e:
+                SINK_ERRORS.labels(sink.name).inc()
+                print(f"  ⚠️  Sink {sink.name} failed: {e}")
+        self.cycles += 1
+        self.samples += len(games)
+        self.last_ts = max(self.last_ts, ts)
+
+    def finish(self) -> Dict[str, Any]:
+        """Write the snapshot of the final state, in watchlist order"""
+        records = self.changes.records
+        ordered = list(dict.fromkeys(
+            app_id for source in sorted(self.order) for app_id in self.order[source] if app_id in records
+        ))
+        listed = set(ordered)
+        ordered.extend(sorted(app_id for app_id in records if app_id not in listed))
+        return SnapshotWriter(self.out_dir).write(
+            [records[app_id] for app_id in ordered],
+            dict(self.changes.snapshot_fields(), updated_at=self.last_ts),
+        )
+
+
+def replay(sources: List[Path], out_dir: Path, sinks: List[Sink], workers: Optional[int] = None,
+           chunk: int = REPLAY_CHUNK) -> Dict[str, Any]:
+    """Replay recordings into `out_dir`; returns the final snapshot
+
+    `workers` <= 1 extracts in this process (no pool).
+    """
+    out_dir = Path(out_dir)
+    if (out_dir / SNAPSHOT_FILENAME).exists():
+        raise ValueError(f"{out_dir} already holds a snapshot; replay into an empty directory")
+    workers = workers or os.cpu_count() or 1
+    readers = [RecordingReader(Path(source)) for source in sources]
+    replayer = Replayer(out_dir, sinks)
+    started = last_report = time.monotonic()
+
+    def report(final: bool = False):
+        nonlocal last_report
+        now = time.monotonic()
+        if not final and now - last_report < PROGRESS_INTERVAL:
+            return
+        last_report = now
+        elapsed = max(now - started, 1e-9)
+        print(f"⏩ {replayer.cycles:,} cycles, {replayer.samples:,} records "
+              f"({replayer.samples / elapsed:,.0f}/s), up to {time.strftime('%Y-%m-%d %H:%M', time.gmtime(replayer.last_ts))} UTC")
+
+    chunks = _chunks(plan_cycles(readers), chunk)
+    if workers <= 1:
+        _init_worker([str(source) for source in sources])
+        for cycles in chunks:
+            for result in extract_cycles(cycles):
+                replayer.apply(*result)
+            report()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=([str(source) for source in sources],)) as pool:
+            # Results are applied in submission order; a few chunks in flight keep every worker busy
+            pending: Deque[Future] = deque()
+            for cycles in chunks:
+                pending.append(pool.submit(extract_cycles, cycles))
+                while len(pending) > 2 * workers:
+                    for result in pending.popleft().result():
+                        replayer.apply(*result)
+                    report()
+            while pending:
+                for result in pending.popleft().result():
+                    replayer.apply(*result)
+                report()
+    for reader in readers:
+        reader.close()
+    snapshot = replayer.finish()
+    report(final=True)
+    return snapshot
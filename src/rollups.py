@@ -0,0 +1,155 @@
+"""
+Aggregate stats per genre, category, publisher, developer and discount bucket
+
+Rollups are kept up to date with deltas: when ChangeTracker replaces a
+game's record, the old record's contribution is subtracted from each of
+its groups and the new one's added, so a cycle costs O(changed games)
+instead of a scan of the watchlist. When a game stays in the same groups
+(the usual case: only players or price moved) the difference is applied
+to each group once. Prices are summed in cents and discounts in whole
+percent, so repeated add/subtract never drifts.
+
+Each group holds [games, games with player data, players, price cents,
+games on sale, discount percent sum]; `view()` turns them into the API
+shape with averages.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from game_record import GameSnapshot
+
+DIMENSIONS = ('genre', 'category', 'publisher', 'developer', 'discount')
+
+# Record field holding each dimension's (list) values
+_LIST_FIELDS = (('genre', 'genres'), ('category', 'categories'),
+                ('publisher', 'publishers'), ('developer', 'developers'))
+
+# (lowest percent, label) in ascending order
+DISCOUNT_BUCKETS = ((0, 'none'), (1, '1-24%'), (25, '25-49%'), (50, '50-74%'), (75, '75-100%'))
+
+GAMES, WITH_PLAYERS, PLAYERS, PRICE_CENTS, ON_SALE, DISCOUNT_SUM = range(6)
+
+# GameSnapshot list groups by their (shared) vocabulary id tuples
+_GROUP_CACHE: Dict[Tuple[Tuple[int, ...], ...], Tuple[Tuple[str, str], ...]] = {}
+_GROUP_CACHE_SIZE = 100_000
+
+
+def discount_bucket(discount_percent: int) -> str:
+    label = DISCOUNT_BUCKETS[0][1]
+    for lowest, name in DISCOUNT_BUCKETS:
+        if discount_percent >= lowest:
+            label = name
+    return label
+
+
+def _values(record: Dict[str, Any]) -> Tuple[int, ...]:
+    if isinstance(record, GameSnapshot):
+        players, discount, price = record.current_players, record.discount_percent or 0, record.final_price
+    else:
+        players, discount, price = record.get('current_players'), record.get('discount_percent') or 0, \
+            record.get('final_price')
+    return (
+        1,
+        players is not None,
+        players or 0,
+        round((price or 0) * 100),
+        discount > 0,
+        discount,
+    )
+
+
+def _list_groups(record: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    # A game listing the same publisher twice still counts once
+    return tuple(dict.fromkeys(
+        (dimension, key) for dimension, field in _LIST_FIELDS for key in record.get(field) or ()
+    ))
+
+
+def _groups(record: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    if isinstance(record, GameSnapshot):
+        ids = (record.genre_ids, record.category_ids, record.publisher_ids, record.developer_ids)
+        groups = _GROUP_CACHE.get(ids)
+        if groups is None:
+            if len(_GROUP_CACHE) >= _GROUP_CACHE_SIZE:
+                _GROUP_CACHE.clear()
+            groups = _GROUP_CACHE[ids] = _list_groups(record)
+    else:
+        groups = _list_groups(record)
+    return groups + (('discount', discount_bucket(record.get('discount_percent') or 0)),)
+
+
+class Rollups:
+    """Per-group sums, updated by add/subtract deltas"""
+
+    def __init__(self):
+        self.groups: Dict[str, Dict[str, List[int]]] = {dimension: {} for dimension in DIMENSIONS}
+        self.total = [0] * 6
+
+    def _add(self, groups: Tuple[Tuple[str, str], ...], values: Tuple[int, ...]):
+        for i, value in enumerate(values):
+            self.total[i] += value
+        for dimension, key in groups:
+            stats = self.groups[dimension].get(key)
+            if stats is None:
+                stats = self.groups[dimension][key] = [0] * 6
+            for i, value in enumerate(values):
+                stats[i] += value
+            if stats[GAMES] == 0:
+                del self.groups[dimension][key]
+
+    def _apply(self, record: Dict[str, Any], sign: int):
+        self._add(_groups(record), tuple(sign * value for value in _values(record)))
+
+    def update(self, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        """Replace one game's contribution (None = not present before / removed)"""
+        if old is not None and new is not None:
+            groups = _groups(new)
+            if _groups(old) == groups:
+                delta = tuple(n - o for n, o in zip(_values(new), _values(old)))
+                if any(delta):
+                    self._add(groups, delta)
+                return
+        if old is not None:
+            self._apply(old, -1)
+        if new is not None:
+            self._apply(new, 1)
+
+    def rebuild(self, records: Iterable[Dict[str, Any]]):
+        self.groups = {dimension: {} for dimension in DIMENSIONS}
+        self.total = [0] * 6
+        for record in records:
+            self._apply(record, 1)
+
+    @property
+    def total_players(self) -> int:
+        return self.total[PLAYERS]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact form stored in the snapshot"""
+        return {'total': list(self.total), **{d: {k: list(v) for k, v in g.items()} for d, g in self.groups.items()}}
+
+
+def _row(key: str, stats: List[int]) -> Dict[str, Any]:
+    games = stats[GAMES]
+    return {
+        'key': key,
+        'games': games,
+        'players': stats[PLAYERS],
+        'games_with_players': stats[WITH_PLAYERS],
+        'avg_price': round(stats[PRICE_CENTS] / games / 100, 2) if games else 0,
+        'on_sale': stats[ON_SALE],
+        'avg_discount': round(stats[DISCOUNT_SUM] / games, 1) if games else 0,
+    }
+
+
+def view(stored: Dict[str, Any]) -> Dict[str, Any]:
+    """API shape of `to_dict()` output: per dimension, groups by players (discount buckets in order)"""
+    result: Dict[str, Any] = {'total': _row('all', stored.get('total') or [0] * 6)}
+    bucket_order = {label: i for i, (_, label) in enumerate(DISCOUNT_BUCKETS)}
+    for dimension in DIMENSIONS:
+        rows = [_row(key, stats) for key, stats in (stored.get(dimension) or {}).items()]
+        if dimension == 'discount':
+            rows.sort(key=lambda row: bucket_order.get(row['key'], len(bucket_order)))
+        else:
+            rows.sort(key=lambda row: (-row['players'], -row['games'], row['key']))
+        result[dimension] = rows
+    return result
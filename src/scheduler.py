@@ -0,0 +1,161 @@
+"""
+Adaptive per-game polling scheduler
+
+Each app_id has its own refresh interval and next-due time, kept in a heap.
+After every refresh the interval adapts to how much the game moved: a price
+change or a large relative swing in players halves it (down to
+`min_interval`), a flat reading stretches it by `backoff` (up to
+`max_interval`), and a failed fetch backs off like a flat one. A global
+budget of app refreshes per minute caps the total request rate; when more
+apps are due than the budget allows, the most overdue go first.
+"""
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from rate_limiter import TokenBucket
+
+
+@dataclass
+class AppSchedule:
+    interval: float
+    due: float
+    generation: int
+    last_players: Optional[int] = None
+    last_price: Optional[float] = None
+    last_discount: Optional[int] = None
+
+
+class AdaptiveScheduler:
+    """Priority queue of app_ids by next-due time, with volatility-driven intervals"""
+
+    def __init__(
+        self,
+        initial_interval: float,
+        min_interval: float,
+        max_interval: float,
+        budget_per_minute: Optional[float] = None,
+        fast_change: float = 0.10,
+        flat_change: float = 0.02,
+        backoff: float = 1.5,
+    ):
+        self.initial_interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.fast_change = fast_change
+        self.flat_change = flat_change
+        self.backoff = backoff
+        self.budget = TokenBucket(budget_per_minute / 60, max(1.0, budget_per_minute / 6)) if budget_per_minute else None
+        self._heap: List[Tuple[float, int, int]] = []
+        self._apps: Dict[int, AppSchedule] = {}
+        self._generations = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._apps)
+
+    def __contains__(self, app_id: int) -> bool:
+        return app_id in self._apps
+
+    def app_ids(self) -> List[int]:
+        return list(self._apps)
+
+    def _push(self, app_id: int, entry: AppSchedule):
+        entry.generation = next(self._generations)
+        heapq.heappush(self._heap, (entry.due, entry.generation, app_id))
+
+    def add(self, app_id: int, due: Optional[float] = None):
+        """Schedule an app (immediately by default); re-adding reschedules it"""
+        due = time.time() if due is None else due
+        entry = self._apps.get(app_id)
+        if entry is None:
+            entry = self._apps[app_id] = AppSchedule(interval=self.initial_interval, due=due, generation=0)
+        entry.due = due
+        self._push(app_id, entry)
+
+    def add_many(self, app_ids: Iterable[int], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        for app_id in app_ids:
+            if app_id not in self._apps:
+                self.add(app_id, now)
+
+    def remove(self, app_id: int):
+        # Heap entries for it become stale and are skipped when popped
+        self._apps.pop(app_id, None)
+
+    def next_due(self) -> Optional[float]:
+        while self._heap:
+            due, generation, app_id = self._heap[0]
+            entry = self._apps.get(app_id)
+            if entry is not None and entry.generation == generation:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: Optional[float] = None, slack: float = 0.0, limit: Optional[int] = None) -> List[int]:
+        """App ids due by `now + slack`, most overdue first, within the request budget
+
+        `slack` lets apps that are almost due ride along with the current batch,
+        which keeps batched price requests full.
+        """
+        now = time.time() if now is None else now
+        batch: List[int] = []
+        while self._heap and (limit is None or len(batch) < limit):
+            due, generation, app_id = self._heap[0]
+            entry = self._apps.get(app_id)
+            if entry is None or entry.generation != generation:
+                heapq.heappop(self._heap)
+                continue
+            if due > now + slack:
+                break
+            if self.budget is not None and self.budget.try_acquire() > 0:
+                break
+            heapq.heappop(self._heap)
+            entry.generation = -1  # in flight until record()
+            batch.append(app_id)
+        return batch
+
+    def record(self, app_id: int, game: Optional[Dict[str, Any]], now: Optional[float] = None):
+        """Adapt the app's interval from a refresh result (None = failed) and reschedule it"""
+        entry = self._apps.get(app_id)
+        if entry is None:
+            return  # removed while in flight
+        now = time.time() if now is None else now
+
+        if game is None:
+            entry.interval = min(self.max_interval, entry.interval * self.backoff)
+        else:
+            players = game.get('current_players')
+            price = game.get('final_price')
+            discount = game.get('discount_percent')
+            price_moved = entry.last_price is not None and (
+                price != entry.last_price or discount != entry.last_discount
+            )
+            swing = None
+            if players is not None and entry.last_players is not None:
+                swing = abs(players - entry.last_players) / max(entry.last_players, 1)
+
+            # The first reading has nothing to compare against and keeps the interval
+            if entry.last_price is not None or entry.last_players is not None:
+                if price_moved or (swing is not None and swing >= self.fast_change):
+                    entry.interval = max(self.min_interval, entry.interval / 2)
+                elif swing is None or swing <= self.flat_change:
+                    entry.interval = min(self.max_interval, entry.interval * self.backoff)
+            entry.last_players, entry.last_price, entry.last_discount = players, price, discount
+
+        entry.due = now + entry.interval
+        self._push(app_id, entry)
+
+    def defer(self, app_id: int, delay: float, now: Optional[float] = None):
+        """Retry an app after `delay` without changing its interval (host-side failures)"""
+        entry = self._apps.get(app_id)
+        if entry is None:
+            return
+        now = time.time() if now is None else now
+        entry.due = now + delay
+        self._push(app_id, entry)
+
+    def interval(self, app_id: int) -> Optional[float]:
+        entry = self._apps.get(app_id)
+        return entry.interval if entry else None
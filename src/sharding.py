@@ -0,0 +1,154 @@
+"""
+Splitting the watchlist across several producer processes
+
+Each app_id belongs to one member of a consistent-hash ring (with virtual
+nodes), so when a worker joins or leaves only ~1/N of the apps move. The
+members come either from static `--shard-index/--shard-count` flags or from
+lease files in a directory on a shared volume: every worker rewrites its
+own lease while alive, and leases that are past their expiry are ignored.
+
+Each shard writes a partial snapshot under data/steam/shards/<name>/;
+snapshot_merge combines them into the snapshot the dashboard reads.
+"""
+import bisect
+import hashlib
+import json
+import os
+import socket
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from snapshot import atomic_write_bytes
+
+DEFAULT_VNODES = 256
+DEFAULT_LEASE_TTL = 30.0
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of app_ids onto member names"""
+
+    def __init__(self, members: Iterable[str], vnodes: int = DEFAULT_VNODES):
+        self.members = sorted(set(members))
+        points: List[Tuple[int, str]] = sorted(
+            (_hash(f"{member}#{i}"), member) for member in self.members for i in range(vnodes)
+        )
+        self._hashes = [h for h, _ in points]
+        self._owners = [m for _, m in points]
+
+    def owner(self, app_id: int) -> Optional[str]:
+        if not self._hashes:
+            return None
+        i = bisect.bisect(self._hashes, _hash(str(app_id))) % len(self._hashes)
+        return self._owners[i]
+
+
+class LeaseDirectory:
+    """Worker membership through `<worker_id>.lease` files with an expiry time"""
+
+    def __init__(self, path: Path, worker_id: str, ttl: float = DEFAULT_LEASE_TTL):
+        self.path = Path(path)
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self._file = self.path / f"{worker_id}.lease"
+
+    def heartbeat(self, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        lease = {"worker_id": self.worker_id, "host": socket.gethostname(), "pid": os.getpid(),
+                 "expires_at": now + self.ttl}
+        atomic_write_bytes(self._file, json.dumps(lease).encode("utf-8"))
+
+    def members(self, now: Optional[float] = None) -> List[str]:
+        """Workers whose lease has not expired (always including this one)"""
+        now = time.time() if now is None else now
+        alive = {self.worker_id}
+        for lease_file in self.path.glob("*.lease"):
+            try:
+                with open(lease_file, "r", encoding="utf-8") as f:
+                    lease = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if lease.get("expires_at", 0) > now:
+                alive.add(lease.get("worker_id", lease_file.stem))
+            elif lease.get("expires_at", 0) < now - 10 * self.ttl:
+                # Long dead: tidy up so the directory does not grow forever
+                try:
+                    lease_file.unlink()
+                except OSError:
+                    pass
+        return sorted(alive)
+
+    def release(self):
+        try:
+            self._file.unlink()
+        except OSError:
+            pass
+
+
+class Shard:
+    """Which app_ids this worker owns; static or lease-based membership"""
+
+    def __init__(self, name: str, members: List[str], leases: Optional[LeaseDirectory] = None,
+                 vnodes: int = DEFAULT_VNODES):
+        self.name = name
+        self.leases = leases
+        self.vnodes = vnodes
+        self.ring = HashRing(members, vnodes)
+        self._last_heartbeat = 0.0
+
+    @classmethod
+    def static(cls, index: int, count: int) -> "Shard":
+        if not 0 <= index < count:
+            raise ValueError("--shard-index must be between 0 and --shard-count - 1")
+        return cls(f"shard-{index}", [f"shard-{i}" for i in range(count)])
+
+    @classmethod
+    def leased(cls, lease_dir: Path, worker_id: Optional[str] = None, ttl: float = DEFAULT_LEASE_TTL) -> "Shard":
+        worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        leases = LeaseDirectory(lease_dir, worker_id, ttl)
+        leases.heartbeat()
+        return cls(worker_id, leases.members(), leases)
+
+    @property
+    def members(self) -> List[str]:
+        return self.ring.members
+
+    def owns(self, app_id: int) -> bool:
+        return self.ring.owner(app_id) == self.name
+
+    def select(self, app_ids: Iterable[int]) -> List[int]:
+        return [app_id for app_id in app_ids if self.owns(app_id)]
+
+    def refresh(self, now: Optional[float] = None) -> bool:
+        """Renew the lease and re-read membership (every ttl/3); True if the ring changed"""
+        if self.leases is None:
+            return False
+        now = time.time() if now is None else now
+        if now - self._last_heartbeat < self.leases.ttl / 3:
+            return False
+        self._last_heartbeat = now
+        self.leases.heartbeat(now)
+        members = self.leases.members(now)
+        if members == self.ring.members:
+            return False
+        self.ring = HashRing(members, self.vnodes)
+        return True
+
+    @property
+    def heartbeat_interval(self) -> Optional[float]:
+        return self.leases.ttl / 3 if self.leases else None
+
+    def close(self):
+        if self.leases is not None:
+            self.leases.release()
+
+
+def shard_counts(ring: HashRing, app_ids: Iterable[int]) -> Dict[str, int]:
+    counts: Dict[str, int] = {member: 0 for member in ring.members}
+    for app_id in app_ids:
+        counts[ring.owner(app_id)] += 1
+    return counts
@@ -0,0 +1,154 @@
+"""
+Output sinks for the producer loop
+
+Every cycle is diffed once (see change_log) and the result is handed to
+each configured sink:
+
+- SnapshotSink: the dashboard's atomic snapshot.json (always on)
+- HistorySink:  player/price time series (timeseries.TimeSeriesStore)
+- StreamSink:   one keyed event per changed game (tombstone for removed ones)
+                on any KafkaProducer-compatible producer: the local
+                partitioned event log, or a real broker via kafka-python
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import metrics
+from event_log import DEFAULT_PARTITIONS, LogProducer
+from game_record import record_json
+from snapshot import SnapshotWriter
+from timeseries import TimeSeriesStore
+
+DEFAULT_TOPIC = "steam.games"
+
+SNAPSHOT_STAGE_SECONDS = metrics.histogram(
+    "producer_snapshot_seconds", "Snapshot build+encode (serialize) and atomic write time", ("stage",),
+)
+SNAPSHOT_BYTES = metrics.counter("producer_snapshot_bytes_written_total", "Bytes written to snapshot.json")
+SNAPSHOT_SIZE = metrics.gauge("producer_snapshot_size_bytes", "Size of the last snapshot written")
+SNAPSHOT_SEQ = metrics.gauge("producer_snapshot_seq", "Sequence number of the last snapshot written")
+SNAPSHOT_UPDATED = metrics.gauge("producer_snapshot_updated_timestamp_seconds", "When the last snapshot was written")
+SINK_SECONDS = metrics.histogram("producer_sink_seconds", "Time spent in each sink per cycle", ("sink",))
+SINK_ERRORS = metrics.counter("producer_sink_errors_total", "Sink publish failures", ("sink",))
+STREAM_EVENTS = metrics.counter("producer_stream_events_total", "Events sent to stream sinks", ("sink", "kind"))
+
+
+@dataclass
+class CycleResult:
+    """One producer cycle after change detection"""
+    timestamp: int
+    games: List[Dict[str, Any]]
+    changed: List[Dict[str, Any]]
+    removed: List[int]
+    change_fields: Dict[str, Any] = field(default_factory=dict)
+    # Records actually refreshed this cycle (None = all of `games`)
+    fetched: Optional[List[Dict[str, Any]]] = None
+    snapshot: Optional[Dict[str, Any]] = None
+
+
+class Sink:
+    """Receives every cycle; `close()` is called once on shutdown"""
+
+    name = "sink"
+
+    def publish(self, cycle: CycleResult):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SnapshotSink(Sink):
+    name = "snapshot"
+
+    def __init__(self, writer: SnapshotWriter):
+        self.writer = writer
+
+    def publish(self, cycle: CycleResult):
+        snapshot = self.writer.write(cycle.games, dict(cycle.change_fields, updated_at=cycle.timestamp))
+        cycle.snapshot = snapshot
+        SNAPSHOT_STAGE_SECONDS.labels("serialize").observe(snapshot["serialize_seconds"])
+        SNAPSHOT_STAGE_SECONDS.labels("write").observe(snapshot["write_seconds"])
+        SNAPSHOT_BYTES.inc(snapshot["bytes_written"])
+        SNAPSHOT_SIZE.set(snapshot["bytes_written"])
+        SNAPSHOT_SEQ.set(snapshot["seq"])
+        SNAPSHOT_UPDATED.set(snapshot["updated_at"])
+
+        print(f"\n💾 Snapshot #{snapshot['seq']} saved ({snapshot['bytes_written']:,} bytes):")
+        print(f"   - {snapshot['game_count']} games ({len(cycle.changed)} changed, {len(cycle.removed)} removed)")
+        print(f"   - {len(snapshot['discount_ids'])} on discount")
+        print(f"   - {len(snapshot['player_ids'])} with player stats")
+
+
+class HistorySink(Sink):
+    name = "history"
+
+    def __init__(self, store: TimeSeriesStore):
+        self.store = store
+
+    def publish(self, cycle: CycleResult):
+        self.store.append(cycle.games if cycle.fetched is None else cycle.fetched, cycle.timestamp)
+
+    def close(self):
+        self.store.flush()
+
+
+def _key_bytes(app_id: Any) -> bytes:
+    return str(app_id).encode("utf-8")
+
+
+def _value_bytes(record: Optional[Dict[str, Any]]) -> Optional[bytes]:
+    if record is None:
+        return None  # tombstone
+    return record_json(record).encode("utf-8")
+
+
+class StreamSink(Sink):
+    """Publishes changed records keyed by app_id, so each game stays in one partition"""
+
+    name = "stream"
+
+    def __init__(self, producer: Any, topic: str = DEFAULT_TOPIC):
+        self.producer = producer
+        self.topic = topic
+
+    def publish(self, cycle: CycleResult):
+        for record in cycle.changed:
+            self.producer.send(self.topic, key=record["app_id"], value=record)
+        for app_id in cycle.removed:
+            self.producer.send(self.topic, key=app_id, value=None)
+        self.producer.flush()
+        STREAM_EVENTS.labels(self.name, "change").inc(len(cycle.changed))
+        STREAM_EVENTS.labels(self.name, "tombstone").inc(len(cycle.removed))
+        if cycle.changed or cycle.removed:
+            print(f"📨 {len(cycle.changed) + len(cycle.removed)} events → {self.name}:{self.topic}")
+
+    def close(self):
+        self.producer.close()
+
+
+def event_log_sink(root: Path, topic: str = DEFAULT_TOPIC, partitions: int = DEFAULT_PARTITIONS) -> StreamSink:
+    sink = StreamSink(
+        LogProducer(root, partitions=partitions, key_serializer=_key_bytes, value_serializer=_value_bytes),
+        topic,
+    )
+    sink.name = "eventlog"
+    return sink
+
+
+def kafka_sink(bootstrap_servers: str, topic: str = DEFAULT_TOPIC) -> StreamSink:
+    try:
+        from kafka import KafkaProducer
+    except ImportError as e:
+        raise RuntimeError("The kafka sink needs kafka-python: pip install kafka-python") from e
+    sink = StreamSink(
+        KafkaProducer(
+            bootstrap_servers=bootstrap_servers.split(","),
+            key_serializer=_key_bytes,
+            value_serializer=_value_bytes,
+        ),
+        topic,
+    )
+    sink.name = "kafka"
+    return sink
@@ -0,0 +1,264 @@
+"""
+Canonical producer snapshot shared by the producer and the dashboard
+
+The producer writes a single compact `snapshot.json` per cycle. Every game
+record is stored once; the discount and player views are sorted arrays of
+app_ids that index into it. Writes go to a temp file that is fsynced and
+renamed over the old snapshot, so readers only ever see a complete file.
+
+`seq` increases by one on every write and is the first key in the file, so
+readers can detect a new snapshot with `peek_seq()` without parsing it.
+
+`games` is the last key and each record sits on its own line (format 2),
+so bulk readers can walk the records with `game_lines()` without loading
+the whole document.
+"""
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from game_record import record_json
+from rollups import DIMENSIONS, PLAYERS, Rollups, view as rollups_rows
+
+SNAPSHOT_FORMAT = 2
+SNAPSHOT_FILENAME = "snapshot.json"
+
+_SEQ_RE = re.compile(rb'^\{"seq":(\d+)')
+_GAMES_OPEN = b'"games":[\n'
+
+
+def atomic_write_bytes(path: Path, data: bytes):
+    """Write `data` to `path` via temp file + fsync + rename"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    try:
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def build_snapshot(games_data: List[Dict[str, Any]], seq: int, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Assemble the snapshot document (seq first, views as app_id indexes)"""
+    discount_ids = [
+        g['app_id'] for g in sorted(
+            (g for g in games_data if g['on_sale'] and g['discount_percent'] > 0),
+            key=lambda x: x['discount_percent'], reverse=True,
+        )
+    ]
+    with_players = [g for g in games_data if g['current_players'] is not None]
+    player_ids = [
+        g['app_id'] for g in sorted(with_players, key=lambda x: x['current_players'], reverse=True)
+    ]
+    rollups = (extra or {}).get("rollups")
+    # Kept incrementally by ChangeTracker when available
+    total_players = rollups["total"][PLAYERS] if rollups else sum(g['current_players'] for g in with_players)
+    snapshot = {
+        "seq": seq,
+        "format": SNAPSHOT_FORMAT,
+        "updated_at": int(time.time()),
+        "game_count": len(games_data),
+        "total_players": total_players,
+        "discount_ids": discount_ids,
+        "player_ids": player_ids,
+    }
+    if extra:
+        snapshot.update(extra)
+    snapshot["games"] = games_data
+    return snapshot
+
+
+def encode_snapshot(snapshot: Dict[str, Any]) -> bytes:
+    """Compact JSON, one game record per line; records are written by record_json (cached for GameSnapshot)"""
+    if "games" not in snapshot:
+        return json.dumps(snapshot, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    head = json.dumps({k: v for k, v in snapshot.items() if k != "games"}, separators=(',', ':'), ensure_ascii=False)
+    games = ',\n'.join(record_json(g) for g in snapshot["games"])
+    sep = '' if head == '{}' else ','
+    return f'{head[:-1]}{sep}"games":[\n{games}\n]}}'.encode('utf-8')
+
+
+def peek_seq(path: Path) -> Optional[int]:
+    """Read the snapshot sequence number from the head of the file"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(32)
+    except OSError:
+        return None
+    match = _SEQ_RE.match(head)
+    return int(match.group(1)) if match else None
+
+
+def load_snapshot(path: Path) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def game_lines(f: BinaryIO) -> Optional[Iterator[Tuple[int, bytes]]]:
+    """(offset, JSON text) of each game record in a snapshot file opened in binary mode
+
+    Reads one line at a time. Returns None for a snapshot written before
+    records had their own lines (format 1); use load_snapshot() for those.
+    """
+    head = f.readline()
+    if not head.endswith(_GAMES_OPEN):
+        return None
+
+    def lines() -> Iterator[Tuple[int, bytes]]:
+        offset = len(head)
+        for line in f:
+            record = line.rstrip(b',\n')
+            if record.startswith(b'{'):
+                yield offset, record
+            offset += len(line)
+
+    return lines()
+
+
+class SnapshotWriter:
+    """Writes successive snapshots to one file with an increasing seq"""
+
+    def __init__(self, data_dir: Path):
+        self.path = Path(data_dir) / SNAPSHOT_FILENAME
+        self.seq = peek_seq(self.path) or 0
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """The last snapshot written, if any (for restoring state on restart)"""
+        try:
+            return load_snapshot(self.path)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, games_data: List[Dict[str, Any]], extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self.seq += 1
+        started = time.perf_counter()
+        snapshot = build_snapshot(games_data, self.seq, extra)
+        payload = encode_snapshot(snapshot)
+        encoded = time.perf_counter()
+        atomic_write_bytes(self.path, payload)
+        snapshot["bytes_written"] = len(payload)
+        snapshot["serialize_seconds"] = encoded - started
+        snapshot["write_seconds"] = time.perf_counter() - encoded
+        return snapshot
+
+
+# --- Reader-side views in the dashboard API shapes ---
+
+def empty_snapshot() -> Dict[str, Any]:
+    return {
+        "seq": 0, "format": SNAPSHOT_FORMAT, "updated_at": 0, "game_count": 0,
+        "total_players": 0, "discount_ids": [], "player_ids": [], "change_seq": 0, "changes": [], "games": [],
+    }
+
+
+def games_by_id(snapshot: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+    return {g['app_id']: g for g in snapshot.get("games", [])}
+
+
+def games_view(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "seq": snapshot.get("seq", 0),
+        "change_seq": snapshot.get("change_seq", 0),
+        "updated_at": snapshot.get("updated_at", 0),
+        "game_count": snapshot.get("game_count", 0),
+        "games": snapshot.get("games", []),
+    }
+
+
+def discounts_view(snapshot: Dict[str, Any], by_id: Optional[Dict[int, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    by_id = by_id if by_id is not None else games_by_id(snapshot)
+    discounts = [by_id[app_id] for app_id in snapshot.get("discount_ids", []) if app_id in by_id]
+    return {
+        "seq": snapshot.get("seq", 0),
+        "updated_at": snapshot.get("updated_at", 0),
+        "discount_count": len(discounts),
+        "discounts": discounts,
+    }
+
+
+def players_view(snapshot: Dict[str, Any], by_id: Optional[Dict[int, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    by_id = by_id if by_id is not None else games_by_id(snapshot)
+    games = [by_id[app_id] for app_id in snapshot.get("player_ids", []) if app_id in by_id]
+    return {
+        "seq": snapshot.get("seq", 0),
+        "updated_at": snapshot.get("updated_at", 0),
+        "total_games": len(games),
+        "total_players": snapshot.get("total_players", 0),
+        "games": games,
+    }
+
+
+def price_comparison(game: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """One game's prices across regions, or None for a game priced in a single region"""
+    prices = game.get("prices")
+    if not prices:
+        return None
+    discounts = {region: price["discount_percent"] for region, price in prices.items()}
+    sale_regions = [region for region, discount in discounts.items() if discount > 0]
+    return {
+        "app_id": game["app_id"],
+        "name": game.get("name"),
+        "prices": prices,
+        "sale_regions": sale_regions,
+        "best_region": max(sale_regions, key=discounts.__getitem__) if sale_regions else None,
+        "discount_spread": max(discounts.values()) - min(discounts.values()),
+    }
+
+
+def prices_view(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Cross-region price comparison: per-game prices by region and per-region sale counts"""
+    games = [row for row in map(price_comparison, snapshot.get("games", [])) if row is not None]
+    summary: Dict[str, Dict[str, Any]] = {}
+    for row in games:
+        for region, price in row["prices"].items():
+            stats = summary.setdefault(region, {"games": 0, "on_sale": 0, "max_discount": 0, "_discounts": 0})
+            stats["games"] += 1
+            if price["discount_percent"] > 0:
+                stats["on_sale"] += 1
+                stats["_discounts"] += price["discount_percent"]
+                stats["max_discount"] = max(stats["max_discount"], price["discount_percent"])
+    for stats in summary.values():
+        total = stats.pop("_discounts")
+        stats["average_discount"] = round(total / stats["on_sale"], 1) if stats["on_sale"] else 0
+    return {
+        "seq": snapshot.get("seq", 0),
+        "updated_at": snapshot.get("updated_at", 0),
+        "regions": list(summary),
+        "game_count": len(games),
+        "summary": summary,
+        "games": games,
+    }
+
+
+def rollups_view(snapshot: Dict[str, Any], dimension: Optional[str] = None) -> Dict[str, Any]:
+    """Aggregates per dimension (all, or just `dimension`); rebuilt from games for older snapshots"""
+    stored = snapshot.get("rollups")
+    if stored is None:
+        rollups = Rollups()
+        rollups.rebuild(snapshot.get("games", []))
+        stored = rollups.to_dict()
+    rows = rollups_rows(stored)
+    view = {
+        "seq": snapshot.get("seq", 0),
+        "updated_at": snapshot.get("updated_at", 0),
+        "game_count": snapshot.get("game_count", 0),
+        "total": rows["total"],
+    }
+    for name in DIMENSIONS:
+        if dimension is None or name == dimension:
+            view[name] = rows[name]
+    return view
@@ -0,0 +1,167 @@
+"""
+Combine per-shard partial snapshots into the snapshot the dashboard reads
+
+Sharded producers each write `shards/<name>/snapshot.json` holding only the
+apps they own. A merge takes the newest record per app_id across the
+partials (two shards can briefly hold the same app while the ring
+changes), keeps the watchlist order and writes `snapshot.json` through a
+ChangeTracker restored from the previous merge. The merged snapshot
+therefore has its own increasing `seq` and `change_seq`, and `?since=`
+clients are unaffected by which shard refreshed a game.
+
+A partial not updated within `stale_after` (its shard died) is left out,
+but the apps only it held keep their last merged record until another
+shard picks them up; an app is only removed once it leaves the watchlist.
+
+A merge does not depend on in-memory state, so any shard can run it after
+publishing (under a lock file) or it can run on its own:
+
+    python src/snapshot_merge.py --watch
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from change_log import ChangeTracker
+from game_record import GameSnapshot
+from snapshot import SNAPSHOT_FILENAME, SnapshotWriter, load_snapshot, peek_seq
+
+try:
+    import fcntl
+except ImportError:  # Windows: merges are not serialized across processes
+    fcntl = None
+
+SHARDS_DIRNAME = "shards"
+LOCK_FILENAME = ".merge.lock"
+
+
+def partial_paths(data_dir: Path) -> List[Path]:
+    return sorted((Path(data_dir) / SHARDS_DIRNAME).glob(f"*/{SNAPSHOT_FILENAME}"))
+
+
+def is_stale(partial: Dict[str, Any], stale_after: Optional[float], now: float) -> bool:
+    return stale_after is not None and partial.get("updated_at", 0) < now - stale_after
+
+
+def load_partials(data_dir: Path, stale_after: Optional[float] = None,
+                  now: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Readable partial snapshots, minus those not updated within `stale_after` seconds"""
+    now = time.time() if now is None else now
+    partials = []
+    for path in partial_paths(data_dir):
+        try:
+            partial = load_snapshot(path)
+        except (OSError, ValueError):
+            continue
+        if not is_stale(partial, stale_after, now):
+            partials.append(partial)
+    return partials
+
+
+def merge_games(partials: List[Dict[str, Any]], app_ids: Optional[List[int]] = None,
+                previous: Optional[Dict[int, Any]] = None,
+                orphans: Optional[Set[int]] = None) -> List[GameSnapshot]:
+    """Newest record per app_id, in watchlist order (or app_id order without one)
+
+    Apps no partial holds keep their `previous` record if they are on the
+    watchlist, or without one if they are in `orphans` (the apps of partials
+    left out as stale).
+    """
+    newest: Dict[int, Dict[str, Any]] = {}
+    for partial in partials:
+        for game in partial.get("games", []):
+            held = newest.get(game["app_id"])
+            if held is None or game.get("timestamp", 0) > held.get("timestamp", 0):
+                newest[game["app_id"]] = game
+    games = {app_id: GameSnapshot.from_dict(game) for app_id, game in newest.items()}
+    for app_id, record in (previous or {}).items():
+        if app_id not in games and (app_ids is not None or app_id in (orphans or ())):
+            games[app_id] = record
+    order = app_ids if app_ids is not None else sorted(games)
+    return [games[app_id] for app_id in order if app_id in games]
+
+
+class _MergeLock:
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def merge_snapshots(data_dir: Path, app_ids: Optional[List[int]] = None,
+                    stale_after: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Write a merged snapshot.json; returns it, or None when nothing changed"""
+    data_dir = Path(data_dir)
+    with _MergeLock(data_dir / SHARDS_DIRNAME / LOCK_FILENAME):
+        now = time.time()
+        partials = load_partials(data_dir)
+        if not partials:
+            return None
+        live = [partial for partial in partials if not is_stale(partial, stale_after, now)]
+        orphans = {game["app_id"] for partial in partials if is_stale(partial, stale_after, now)
+                   for game in partial.get("games", [])}
+        writer = SnapshotWriter(data_dir)
+        changes = ChangeTracker()
+        previous = writer.load()
+        if previous:
+            changes.restore(previous)
+        published, changed, removed = changes.apply(merge_games(live, app_ids, changes.records, orphans))
+        if previous and not changed and not removed:
+            return None
+        updated_at = max(partial.get("updated_at", 0) for partial in live or partials)
+        snapshot = writer.write(published, dict(changes.snapshot_fields(), updated_at=updated_at,
+                                                shards=len(live)))
+        snapshot["changed"] = len(changed)
+        snapshot["removed"] = len(removed)
+        return snapshot
+
+
+def main():
+    from steam_producer import DATA_DIR, load_watchlist
+
+    parser = argparse.ArgumentParser(description="Merge sharded producer snapshots for the dashboard")
+    parser.add_argument("--data-dir", default=str(DATA_DIR), help=f"Producer data directory (default: {DATA_DIR})")
+    parser.add_argument("--watchlist", default="config/watchlist.db",
+                        help="Only merge apps on this watchlist, in its order ('' = every app found)")
+    parser.add_argument("--stale-after", type=float, default=3 * 1800,
+                        help="Ignore partials not updated for this many seconds (default: 5400)")
+    parser.add_argument("--watch", action="store_true", help="Keep merging whenever a partial changes")
+    parser.add_argument("--poll", type=float, default=2.0, help="Seconds between checks with --watch (default: 2)")
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    seen: Dict[Path, Optional[int]] = {}
+    try:
+        while True:
+            # peek_seq reads a few bytes per partial, so polling stays cheap
+            current = {path: peek_seq(path) for path in partial_paths(data_dir)}
+            if current != seen:
+                seen = current
+                app_ids = load_watchlist(args.watchlist) if args.watchlist else None
+                snapshot = merge_snapshots(data_dir, app_ids, args.stale_after)
+                if snapshot:
+                    print(f"🔀 Snapshot #{snapshot['seq']} merged from {snapshot['shards']} shards: "
+                          f"{snapshot['game_count']} games ({snapshot['changed']} changed, "
+                          f"{snapshot['removed']} removed)")
+            if not args.watch:
+                break
+            time.sleep(args.poll)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
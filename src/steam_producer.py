@@ -4,48 +4,209 @@ No Spark/Kafka required - Simple and standalone
 """
 import argparse
 import json
+import os
 import time
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, Iterable, List, Optional, Any, Sequence, Tuple
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from alerts import ALERTS_FILENAME, AlertEngine, AlertFile, AlertOutput, AlertSink, WebhookOutput
+from change_log import ChangeTracker
+from game_record import GameSnapshot
+from http_resilience import RETRYABLE, FetchResult, FetchStatus, HostBreakers, RetryPolicy, parse_retry_after
+from metadata_cache import MetadataCache
+from rate_limiter import HostRateLimiter
+from recorder import ResponseRecorder
+from replay import replay
+from scheduler import AdaptiveScheduler
+from sharding import DEFAULT_LEASE_TTL, Shard
+from sinks import (
+    DEFAULT_TOPIC, SINK_ERRORS, SINK_SECONDS, CycleResult, HistorySink, Sink, SnapshotSink, event_log_sink, kafka_sink,
+)
+from snapshot import SnapshotWriter
+from snapshot_merge import SHARDS_DIRNAME, merge_snapshots
+from timeseries import TimeSeriesStore
+from watchlist_store import is_store_path, open_watchlist
+from watchlist_watcher import WatchlistWatcher
 
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "steam"
+METRICS_FILE = DATA_DIR / "producer_metrics.prom"
+
+STEAM_REQUESTS = metrics.counter(
+    "steam_api_requests_total", "Steam API request attempts by endpoint and outcome", ("endpoint", "status"),
+)
+STEAM_REQUEST_SECONDS = metrics.histogram(
+    "steam_api_request_seconds", "Steam API response time per attempt", ("endpoint",),
+)
+PHASE_SECONDS = metrics.histogram(
+    "producer_phase_seconds", "Time per producer cycle phase (fetch, extract, publish)", ("phase",),
+)
+CYCLE_SECONDS = metrics.histogram("producer_cycle_seconds", "Wall time of one producer cycle")
+CYCLE_GAMES = metrics.counter("producer_games_refreshed_total", "Game records produced by refreshes")
+FETCH_FAILURES = metrics.counter("producer_fetch_failures_total", "Apps without a record after a refresh", ("status",))
+WATCHED_GAMES = metrics.gauge("producer_watched_games", "Games on the watchlist")
+OWNED_GAMES = metrics.gauge("producer_owned_games", "Watchlist games this shard refreshes")
+SHARD_MEMBERS = metrics.gauge("producer_shard_members", "Producer shards sharing the watchlist")
+WATCHLIST_RELOADS = metrics.counter("producer_watchlist_reloads_total", "Watchlist changes applied while running")
 
 
 class SteamAPIClient:
-    """Client for Steam Web API"""
+    """Client for Steam Web API
+    
+    Every call returns a FetchResult. Requests wait for the host's rate budget,
+    retry 429/5xx/network failures with jittered exponential backoff (honouring
+    Retry-After, which also pauses the whole host), and stop while the host's
+    circuit breaker is open.
+    """
     
     BASE_URL = "https://store.steampowered.com/api"
     STATS_URL = "https://api.steampowered.com"
+    STORE_HOST = "store.steampowered.com"
+    STATS_HOST = "api.steampowered.com"
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        retry: Optional[RetryPolicy] = None,
+        breakers: Optional[HostBreakers] = None,
+        pool_size: int = 10,
+        timeout: float = 10,
+        region: str = 'us',
+    ):
         self.api_key = api_key
+        self.region = region
+        self.rate_limiter = rate_limiter
+        self.retry = retry or RetryPolicy()
+        self.breakers = breakers or HostBreakers()
+        self.timeout = timeout
         self.session = requests.Session()
         self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (compatible; SteamMonitor/1.0)'
+            'User-Agent': 'Mozilla/5.0 (compatible; SteamMonitor/1.0)',
+            'Accept-Encoding': 'gzip, deflate',
         })
+        # One keep-alive pool per Steam host, sized for the fetch workers; retries are ours
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size), max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
     
-    def get_app_details(self, app_id: int) -> Optional[Dict[str, Any]]:
-        """Fetch game details from Steam Store API"""
-        url = f"{self.BASE_URL}/appdetails"
-        params = {'appids': app_id, 'cc': 'us', 'l': 'english'}
+    def _request(self, endpoint: str, url: str, params: Dict[str, Any],
+                 parse: Callable[[Any], FetchResult]) -> FetchResult:
+        """GET with rate limiting, retries and the host's circuit breaker
+        
+        Every attempt is counted under `endpoint` in the steam_api_* metrics.
+        """
+        breaker = self.breakers.get(urlparse(url).netloc)
+        result = FetchResult(FetchStatus.NETWORK_ERROR, error="no attempt made", attempts=0)
         
+        for attempt in range(1, self.retry.max_attempts + 1):
+            if not breaker.allow():
+                STEAM_REQUESTS.labels(endpoint, FetchStatus.CIRCUIT_OPEN.value).inc()
+                return FetchResult(FetchStatus.CIRCUIT_OPEN, error=f"circuit open for {urlparse(url).netloc}",
+                                   retry_after=breaker.retry_in(), attempts=attempt - 1)
+            if self.rate_limiter:
+                self.rate_limiter.acquire(url)
+            
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                result = FetchResult(FetchStatus.NETWORK_ERROR, error=str(e))
+            else:
+                STEAM_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+                result = self._classify(response, parse)
+            result.attempts = attempt
+            STEAM_REQUESTS.labels(endpoint, result.status.value).inc()
+            
+            if result.status not in RETRYABLE:
+                # The host answered; whatever is wrong is about this request
+                breaker.record_success()
+                return result
+            breaker.record_failure()
+            if attempt == self.retry.max_attempts:
+                break
+            if result.retry_after is not None and self.rate_limiter:
+                # Everyone waits: the next acquire() blocks until the host's pause is over
+                self.rate_limiter.pause(url, result.retry_after)
+            else:
+                time.sleep(self.retry.delay(attempt, result.retry_after))
+        
+        return result
+    
+    @staticmethod
+    def _classify(response: requests.Response, parse: Callable[[Any], FetchResult]) -> FetchResult:
+        """One response as a FetchResult; statuses in RETRYABLE make _request try again"""
+        code = response.status_code
+        if code == 429 or code >= 500:
+            return FetchResult(
+                FetchStatus.RATE_LIMITED if code == 429 else FetchStatus.SERVER_ERROR,
+                error=f"HTTP {code}",
+                retry_after=parse_retry_after(response.headers.get('Retry-After')),
+            )
+        if code >= 400:
+            return FetchResult(FetchStatus.CLIENT_ERROR, error=f"HTTP {code}")
         try:
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
             data = response.json()
-            
-            if str(app_id) in data and data[str(app_id)].get('success'):
-                return data[str(app_id)]['data']
-            return None
-        except Exception as e:
-            print(f"Error fetching app {app_id}: {e}")
-            return None
+        except ValueError as e:
+            # A 200 with a truncated or garbled body is an upstream or transfer fault: try again
+            return FetchResult(FetchStatus.SERVER_ERROR, error=f"invalid JSON: {e}")
+        return parse(data)
     
-    def get_player_count(self, app_id: int) -> Optional[int]:
+    def get_app_details(self, app_id: int) -> FetchResult:
+        """Fetch game details from Steam Store API, priced in the client's region"""
+        url = f"{self.BASE_URL}/appdetails"
+        params = {'appids': app_id, 'cc': self.region, 'l': 'english'}
+        
+        def parse(data: Any) -> FetchResult:
+            entry = (data or {}).get(str(app_id)) or {}
+            if entry.get('success') and entry.get('data'):
+                return FetchResult.success(entry['data'])
+            return FetchResult(FetchStatus.NO_DATA, error="appdetails success=false")
+        
+        result = self._request('appdetails', url, params, parse)
+        if not result.ok and result.status is not FetchStatus.NO_DATA:
+            print(f"Error fetching app {app_id}: {result.status.value} ({result.error})")
+        return result
+    
+    def get_price_overviews(self, app_ids: List[int], region: Optional[str] = None) -> FetchResult:
+        """Fetch only price_overview for several apps in one appdetails call
+        
+        On success the value maps app_id -> price_overview for every app Steam
+        answered; free apps (or apps not sold in `region`, default the client's)
+        map to None. Apps missing from it should fall back to their last known price.
+        """
+        url = f"{self.BASE_URL}/appdetails"
+        params = {
+            'appids': ','.join(str(app_id) for app_id in app_ids),
+            'filters': 'price_overview',
+            'cc': region or self.region,
+            'l': 'english',
+        }
+        
+        def parse(data: Any) -> FetchResult:
+            prices = {}
+            for app_id in app_ids:
+                entry = (data or {}).get(str(app_id))
+                if not entry or not entry.get('success'):
+                    continue
+                # Steam returns an empty list instead of an object when there is no price
+                payload = entry.get('data') or {}
+                prices[app_id] = payload.get('price_overview') if isinstance(payload, dict) else None
+            return FetchResult.success(prices)
+        
+        result = self._request('price_overview', url, params, parse)
+        if not result.ok:
+            print(f"Error fetching {region or self.region} prices for {len(app_ids)} apps: "
+                  f"{result.status.value} ({result.error})")
+        return result
+    
+    def get_player_count(self, app_id: int) -> FetchResult:
         """Get current player count for a game"""
         if not self.api_key:
             # Try without API key
@@ -55,103 +216,180 @@ class SteamAPIClient:
             url = f"{self.STATS_URL}/ISteamUserStats/GetNumberOfCurrentPlayers/v1/"
             params = {'appid': app_id, 'key': self.api_key}
         
-        try:
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get('response', {}).get('result') == 1:
-                return data['response'].get('player_count', 0)
-            return None
-        except Exception as e:
-            return None
+        def parse(data: Any) -> FetchResult:
+            response = (data or {}).get('response', {})
+            if response.get('result') == 1:
+                return FetchResult.success(response.get('player_count', 0))
+            return FetchResult(FetchStatus.NO_DATA, error="no player count")
+        
+        return self._request('player_count', url, params, parse)
 
 
-def extract_game_data(app_id: int, details: Dict[str, Any], player_count: Optional[int]) -> Dict[str, Any]:
-    """Extract relevant fields from Steam API response"""
-    
-    # Price information
-    price_overview = details.get('price_overview', {})
-    initial_price = price_overview.get('initial', 0) / 100 if price_overview else 0
-    final_price = price_overview.get('final', 0) / 100 if price_overview else 0
-    discount_percent = price_overview.get('discount_percent', 0) if price_overview else 0
-    is_free = details.get('is_free', False)
-    
-    # Rating and reviews
-    metacritic = details.get('metacritic', {})
-    metacritic_score = metacritic.get('score', None) if metacritic else None
-    
-    recommendations = details.get('recommendations', {})
-    total_recommendations = recommendations.get('total', 0) if recommendations else 0
-    
-    # DLC count
-    dlc_list = details.get('dlc', [])
-    dlc_count = len(dlc_list) if dlc_list else 0
+def extract_game_data(app_id: int, details: Dict[str, Any], player_count: Optional[int],
+                      timestamp: Optional[int] = None,
+                      prices: Optional[Dict[str, Optional[Dict[str, Any]]]] = None) -> GameSnapshot:
+    """Extract relevant fields from Steam API response (`timestamp` in ms, default now)
     
-    # Genres
-    genres = details.get('genres', [])
-    genre_list = [g.get('description', '') for g in genres] if genres else []
+    `prices` maps region -> price_overview when several storefront regions are tracked.
+    """
+    return GameSnapshot.from_details(app_id, details, player_count, timestamp, prices)
+
+
+def _chunks(items: List[int], size: int) -> List[List[int]]:
+    return [items[i:i + size] for i in range(0, len(items), max(1, size))]
+
+
+def fetch_games(
+    steam_client: SteamAPIClient,
+    app_ids: List[int],
+    workers: int = 8,
+    metadata: Optional[MetadataCache] = None,
+    price_chunk: int = 100,
+    recorder: Optional[ResponseRecorder] = None,
+    regions: Sequence[str] = (),
+) -> Tuple[List[Dict[str, Any]], Dict[int, FetchResult]]:
+    """Fetch game data for all apps concurrently
     
-    # Categories
-    categories = details.get('categories', [])
-    category_list = [c.get('description', '') for c in categories] if categories else []
+    Without a metadata cache every app gets a full appdetails call. With one,
+    polling is two-tier: apps whose static metadata is missing or past its TTL
+    get a full appdetails call, everything else only gets a batched
+    price_overview refresh (`price_chunk` apps per request). Player counts are
+    always fetched. All requests are independent jobs so they overlap; pacing
+    comes from the client's per-host rate limiter. Each host gets its own pool
+    of `workers`, so jobs waiting for store.steampowered.com's budget never
+    hold up player counts on api.steampowered.com. Results keep watchlist order.
+    A recorder, when given, keeps the raw responses for replay.py.
     
-    # Release date
-    release_date = details.get('release_date', {})
-    release_date_str = release_date.get('date', 'TBA') if release_date else 'TBA'
-    is_coming_soon = release_date.get('coming_soon', False) if release_date else False
+    `regions` are extra storefront regions besides the client's own: each
+    gets batched price_overview requests only (metadata is region-independent
+    and fetched once), through the same rate limiter, so N regions cost about
+    N × apps / `price_chunk` extra requests per cycle. A region whose refresh
+    fails falls back to its last known prices in the metadata cache.
     
-    now = datetime.now(timezone.utc)
-    ts_ms = int(now.timestamp() * 1000)
+    Returns the game records and, for apps that produced none, the failed
+    FetchResult that explains why.
+    """
+    full_ids = metadata.stale_ids(app_ids) if metadata is not None else list(app_ids)
+    full_set = set(full_ids)
+    price_ids = [app_id for app_id in app_ids if app_id not in full_set]
     
-    return {
-        'app_id': app_id,
-        'name': details.get('name', 'Unknown'),
-        'type': details.get('type', 'game'),
-        'timestamp': ts_ms,
-        'event_time': now.isoformat(),
-        
-        # Price & Discount
-        'is_free': is_free,
-        'initial_price': initial_price,
-        'final_price': final_price,
-        'discount_percent': discount_percent,
-        'on_sale': discount_percent > 0,
-        'currency': price_overview.get('currency', 'USD') if price_overview else 'USD',
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="store") as store_pool, \
+            ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="stats") as stats_pool:
+        player_jobs = {app_id: stats_pool.submit(steam_client.get_player_count, app_id) for app_id in app_ids}
+        details_jobs = {app_id: store_pool.submit(steam_client.get_app_details, app_id) for app_id in full_ids}
+        price_jobs = [store_pool.submit(steam_client.get_price_overviews, chunk)
+                      for chunk in _chunks(price_ids, price_chunk)]
+        region_jobs = {
+            region: [store_pool.submit(steam_client.get_price_overviews, chunk, region)
+                     for chunk in _chunks(app_ids, price_chunk)]
+            for region in regions
+        }
         
-        # Rating & Reviews
-        'metacritic_score': metacritic_score,
-        'total_recommendations': total_recommendations,
+        prices: Dict[int, Optional[Dict[str, Any]]] = {}
+        for job in price_jobs:
+            price_result = job.result()
+            if price_result.ok:
+                prices.update(price_result.value)
+        region_prices: Dict[str, Dict[int, Optional[Dict[str, Any]]]] = {}
+        for region, jobs in region_jobs.items():
+            region_prices[region] = {}
+            for job in jobs:
+                price_result = job.result()
+                if price_result.ok:
+                    region_prices[region].update(price_result.value)
         
-        # DLC
-        'dlc_count': dlc_count,
-        'has_dlc': dlc_count > 0,
-        
-        # Genre & Categories
-        'genres': genre_list,
-        'categories': category_list,
-        
-        # Release
-        'release_date': release_date_str,
-        'is_coming_soon': is_coming_soon,
-        
-        # Players
-        'current_players': player_count,
-        
-        # Additional info
-        'short_description': details.get('short_description', '')[:200],
-        'header_image': details.get('header_image', ''),
-        'developers': details.get('developers', []),
-        'publishers': details.get('publishers', []),
-    }
+        games_data = []
+        failures: Dict[int, FetchResult] = {}
+        extract_seconds = 0.0
+        for app_id in app_ids:
+            details = None
+            if app_id in details_jobs:
+                details_result = details_jobs[app_id].result()
+                if details_result.ok:
+                    details = details_result.value
+                    if metadata is not None:
+                        metadata.put_details(app_id, details)
+                    if recorder is not None:
+                        recorder.details(app_id, details)
+                elif metadata is not None:
+                    # Refresh failed; serve the expired metadata rather than drop the game
+                    details = metadata.merged_details(app_id)
+                if not details:
+                    failures[app_id] = details_result
+            else:
+                if app_id in prices:
+                    metadata.put_price(app_id, prices[app_id])
+                    if recorder is not None:
+                        recorder.price(app_id, prices[app_id])
+                details = metadata.merged_details(app_id)
+            
+            players_result = player_jobs[app_id].result()
+            player_count = players_result.value if players_result.ok else None
+            if not details:
+                print(f"  ⚠️  Failed to fetch details for {app_id}")
+                failures.setdefault(app_id, FetchResult(FetchStatus.NO_DATA, error="no metadata"))
+                continue
+            
+            by_region = None
+            if regions:
+                by_region = {steam_client.region: details.get('price_overview')}
+                for region in regions:
+                    if app_id in region_prices[region]:
+                        by_region[region] = region_prices[region][app_id]
+                        if metadata is not None:
+                            metadata.put_region_price(app_id, region, by_region[region])
+                        if recorder is not None:
+                            recorder.region_price(app_id, region, by_region[region])
+                    elif metadata is not None:
+                        by_region[region] = metadata.region_price(app_id, region)
+            
+            started = time.perf_counter()
+            game_data = extract_game_data(app_id, details, player_count, prices=by_region)
+            extract_seconds += time.perf_counter() - started
+            games_data.append(game_data)
+            if recorder is not None:
+                recorder.sample(app_id, player_count, [steam_client.region, *regions] if regions else None)
+            
+            print(f"  ✅ {game_data['name']}")
+            print(f"     Price: ${game_data['final_price']:.2f} (discount: {game_data['discount_percent']}%)")
+            if player_count:
+                print(f"     Players: {player_count:,}")
+    
+    if recorder is not None:
+        recorder.flush()
+    if metadata is not None:
+        metadata.save()
+        print(f"   {len(full_ids)} full detail fetches, {len(price_ids)} price-only refreshes"
+              + (f", {len(app_ids)} × {len(regions)} regional prices" if regions else ""))
+    
+    PHASE_SECONDS.labels("extract").observe(extract_seconds)
+    CYCLE_GAMES.inc(len(games_data))
+    for failure in failures.values():
+        FETCH_FAILURES.labels(failure.status.value).inc()
+    return games_data, failures
+
+
+def parse_regions(value: str) -> List[str]:
+    """`us,GB, de` -> ['us', 'gb', 'de'] (argparse type for --regions)"""
+    regions = list(dict.fromkeys(part.strip().lower() for part in value.split(',') if part.strip()))
+    if not regions or not all(len(region) == 2 and region.isalpha() for region in regions):
+        raise argparse.ArgumentTypeError("expected comma-separated two-letter country codes, e.g. us,gb,de")
+    return regions
+
+
+def read_watchlist(filepath: str) -> List[int]:
+    """Game IDs from the watchlist store or a JSON file; raises on a missing or unreadable file"""
+    if is_store_path(filepath):
+        return open_watchlist(Path(filepath)).app_ids()
+    with open(filepath, 'r') as f:
+        data = json.load(f)
+    return [int(app_id) for app_id in data.get('games', [])]
 
 
 def load_watchlist(filepath: str) -> List[int]:
     """Load game IDs from watchlist file"""
     try:
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-            return data.get('games', [])
+        return read_watchlist(filepath)
     except FileNotFoundError:
         print(f"Watchlist file not found: {filepath}")
         return []
@@ -160,110 +398,366 @@ def load_watchlist(filepath: str) -> List[int]:
         return []
 
 
-def save_data(games_data: List[Dict[str, Any]]):
-    """Save data directly to JSON files"""
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    
-    # Save all games
-    latest_games = {
-        "updated_at": int(time.time()),
-        "game_count": len(games_data),
-        "games": games_data
-    }
-    
-    with open(DATA_DIR / "latest_games.json", "w") as f:
-        json.dump(latest_games, f, indent=2)
-    
-    # Save discounts
-    discounts = [g for g in games_data if g['on_sale'] and g['discount_percent'] > 0]
-    discount_data = {
-        "updated_at": int(time.time()),
-        "discount_count": len(discounts),
-        "discounts": sorted(discounts, key=lambda x: x['discount_percent'], reverse=True)
-    }
-    
-    with open(DATA_DIR / "discounts.json", "w") as f:
-        json.dump(discount_data, f, indent=2)
-    
-    # Save player stats
-    with_players = [g for g in games_data if g['current_players'] is not None]
-    player_data = {
-        "updated_at": int(time.time()),
-        "total_games": len(with_players),
-        "total_players": sum(g['current_players'] for g in with_players),
-        "games": sorted(with_players, key=lambda x: x['current_players'], reverse=True)
-    }
-    
-    with open(DATA_DIR / "player_stats.json", "w") as f:
-        json.dump(player_data, f, indent=2)
+def reassign(scheduler: AdaptiveScheduler, current: Dict[int, Dict[str, Any]],
+             app_ids: List[int]) -> Tuple[List[int], List[int]]:
+    """Point the scheduler at a new set of app_ids; returns (added, removed)
+
+    New apps are due immediately. Removed apps leave the schedule and the
+    current records, so the next publish reports them as removed.
+    """
+    wanted = set(app_ids)
+    removed = [app_id for app_id in scheduler.app_ids() if app_id not in wanted]
+    for app_id in removed:
+        scheduler.remove(app_id)
+        current.pop(app_id, None)
+    added = [app_id for app_id in app_ids if app_id not in scheduler]
+    scheduler.add_many(added)
+    return added, removed
+
+
+def carry_records(current: Dict[int, Dict[str, Any]], records: Dict[int, Dict[str, Any]], app_ids: Iterable[int]):
+    """Seed `current` with the last published record of apps not fetched yet
+
+    Publishing is a full-state diff, so an owned app missing from `current`
+    (not fetched since a restart or since this shard took it over, or its
+    first fetch failed) would otherwise be published as removed.
+    """
+    for app_id in app_ids:
+        if app_id not in current and app_id in records:
+            current[app_id] = records[app_id]
+
+
+def publish_cycle(
+    games_data: List[Dict[str, Any]],
+    changes: ChangeTracker,
+    sinks: List[Sink],
+    fetched: Optional[List[Dict[str, Any]]] = None,
+) -> CycleResult:
+    """Diff against the previous cycle and hand the result to every sink
     
-    print(f"\n💾 Data saved:")
-    print(f"   - {len(games_data)} games")
-    print(f"   - {len(discounts)} on discount")
-    print(f"   - {len(with_players)} with player stats")
+    `games_data` is the full current state; `fetched` the records refreshed
+    this time, when that is only a subset.
+    """
+    published, changed, removed = changes.apply(games_data)
+    cycle = CycleResult(
+        timestamp=int(time.time()),
+        games=published,
+        changed=changed,
+        removed=removed,
+        change_fields=changes.snapshot_fields(),
+        fetched=fetched,
+    )
+    for sink in sinks:
+        started = time.perf_counter()
+        try:
+            sink.publish(cycle)
+        except Exception as e:
+            SINK_ERRORS.labels(sink.name).inc()
+            print(f"  ⚠️  Sink {sink.name} failed: {e}")
+        SINK_SECONDS.labels(sink.name).observe(time.perf_counter() - started)
+    return cycle
 
 
 def main():
     parser = argparse.ArgumentParser(description="Steam Game Data Producer")
-    parser.add_argument("--watchlist", default="config/games_watchlist.json", help="Path to watchlist JSON")
-    parser.add_argument("--interval", type=int, default=300, help="Fetch interval in seconds (default: 5 min)")
+    parser.add_argument("--watchlist", default="config/watchlist.db",
+                        help="Watchlist store (.db, shared with the dashboard) or a plain JSON file")
+    parser.add_argument("--interval", type=int, default=300,
+                        help="Starting per-game fetch interval in seconds (default: 5 min)")
+    parser.add_argument("--min-interval", type=int, default=60,
+                        help="Shortest per-game interval for fast-moving games (default: 60)")
+    parser.add_argument("--max-interval", type=int, default=1800,
+                        help="Longest per-game interval for flat games (default: 30 min)")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Max game refreshes per minute across the watchlist (default: unlimited)")
+    parser.add_argument("--batch-window", type=float, default=15.0,
+                        help="Seconds ahead of schedule a game may be refreshed to join a batch (default: 15)")
     parser.add_argument("--steam-api-key", help="Steam API key for player stats (optional)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent fetch workers per Steam host (default: 8)")
+    parser.add_argument("--store-rate", type=float, default=1.0,
+                        help="Requests/sec budget for store.steampowered.com (default: 1.0)")
+    parser.add_argument("--api-rate", type=float, default=10.0,
+                        help="Requests/sec budget for api.steampowered.com (default: 10.0)")
+    parser.add_argument("--retries", type=int, default=4,
+                        help="Attempts per request on 429/5xx/network errors (default: 4)")
+    parser.add_argument("--burst", type=float, default=5.0, help="Token bucket burst size per host (default: 5)")
+    parser.add_argument("--metadata-ttl", type=int, default=24 * 3600,
+                        help="Seconds before static game metadata is re-fetched (default: 24h, 0 = every cycle)")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Do not record player/price history under data/steam/history")
+    parser.add_argument("--price-chunk", type=int, default=100,
+                        help="App ids per batched price refresh request (default: 100)")
+    parser.add_argument("--regions", type=parse_regions, default=None, metavar="CC,CC,...",
+                        help="Track prices in several storefront regions (country codes, e.g. us,gb,de,jp); "
+                             "the first gets full details, the others batched price-only refreshes")
+    parser.add_argument("--sink", action="append", choices=["eventlog", "kafka"], default=[],
+                        help="Also publish changed games to a stream (repeatable): "
+                             "eventlog = local partitioned log in data/steam/events, kafka = real broker")
+    parser.add_argument("--topic", default=DEFAULT_TOPIC, help=f"Stream topic (default: {DEFAULT_TOPIC})")
+    parser.add_argument("--partitions", type=int, default=8, help="Event log partitions for new topics (default: 8)")
+    parser.add_argument("--metrics-file", default=str(METRICS_FILE),
+                        help="Where to write producer metrics after each cycle for the dashboard's /metrics "
+                             "(Prometheus text format, '' to disable)")
+    parser.add_argument("--kafka-bootstrap", default=os.environ.get("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092"),
+                        help="Kafka bootstrap servers for --sink kafka")
+    parser.add_argument("--alert-rules", default="config/alert_rules.json",
+                        help="Alert rules file, reloaded when it changes (see src/alerts.py; '' to disable)")
+    parser.add_argument("--alert-webhook", action="append", default=[],
+                        help="Also POST alerts to this URL (repeatable); they always go to data/steam/alerts.jsonl")
+    parser.add_argument("--record", nargs="?", const="", metavar="DIR",
+                        help="Keep raw Steam responses (compressed, deduplicated) for --replay "
+                             "(default DIR: recordings/ in the data directory)")
+    parser.add_argument("--replay", action="append", metavar="DIR",
+                        help="Do not poll Steam: rebuild snapshot and history from a recording "
+                             "(repeatable, e.g. one per shard) and exit")
+    parser.add_argument("--replay-to", default=str(DATA_DIR / "replay"),
+                        help="Empty directory the replay writes to (default: data/steam/replay)")
+    parser.add_argument("--replay-workers", type=int, default=os.cpu_count() or 1,
+                        help="Extraction processes for --replay (default: CPU count, 1 = no pool)")
+    parser.add_argument("--shard-index", type=int, help="This worker's shard (0-based, with --shard-count)")
+    parser.add_argument("--shard-count", type=int, help="Number of producer shards sharing the watchlist")
+    parser.add_argument("--lease-dir",
+                        help="Shared directory for automatic shard membership (instead of --shard-index/--shard-count)")
+    parser.add_argument("--worker-id", help="Shard name with --lease-dir (default: <hostname>-<pid>)")
+    parser.add_argument("--lease-ttl", type=float, default=DEFAULT_LEASE_TTL,
+                        help=f"Seconds a worker's lease lasts without renewal (default: {DEFAULT_LEASE_TTL:.0f})")
+    parser.add_argument("--watch-poll", type=float, default=2.0,
+                        help="Seconds between watchlist checks when inotify is unavailable (default: 2)")
+    parser.add_argument("--no-merge", action="store_true",
+                        help="Sharded mode: do not merge partial snapshots after publishing "
+                             "(run src/snapshot_merge.py --watch instead)")
     args = parser.parse_args()
     
-    # Initialize Steam API client
-    steam_client = SteamAPIClient(api_key=args.steam_api_key)
+    if args.replay:
+        out_dir = Path(args.replay_to)
+        replay_sinks: List[Sink] = []
+        if not args.no_history:
+            replay_sinks.append(HistorySink(TimeSeriesStore(out_dir / "history")))
+        if "eventlog" in args.sink:
+            replay_sinks.append(event_log_sink(out_dir / "events", args.topic, args.partitions))
+        if "kafka" in args.sink:
+            replay_sinks.append(kafka_sink(args.kafka_bootstrap, args.topic))
+        print(f"⏩ Replaying {', '.join(args.replay)} into {out_dir} ({args.replay_workers} workers)")
+        try:
+            snapshot = replay([Path(source) for source in args.replay], out_dir, replay_sinks, args.replay_workers)
+        except ValueError as e:
+            parser.error(str(e))
+        finally:
+            for sink in replay_sinks:
+                sink.close()
+        print(f"✅ Snapshot #{snapshot['seq']} with {snapshot['game_count']} games written to {out_dir}")
+        return
+    
+    shard: Optional[Shard] = None
+    if args.lease_dir:
+        if args.shard_index is not None or args.shard_count is not None:
+            parser.error("--lease-dir cannot be combined with --shard-index/--shard-count")
+        shard = Shard.leased(Path(args.lease_dir), args.worker_id, args.lease_ttl)
+    elif args.shard_index is not None or args.shard_count is not None:
+        if args.shard_index is None or args.shard_count is None:
+            parser.error("--shard-index and --shard-count go together")
+        try:
+            shard = Shard.static(args.shard_index, args.shard_count)
+        except ValueError as e:
+            parser.error(str(e))
+    # A shard keeps its partial snapshot, metadata, events and metrics to itself;
+    # history is per app, so it stays shared
+    work_dir = DATA_DIR / SHARDS_DIRNAME / shard.name if shard else DATA_DIR
+    metrics_file = args.metrics_file
+    if shard and metrics_file == str(METRICS_FILE):
+        metrics_file = str(work_dir / METRICS_FILE.name)
+    
+    # Initialize Steam API client with one shared rate limiter per Steam host
+    rate_limiter = HostRateLimiter({
+        SteamAPIClient.STORE_HOST: args.store_rate,
+        SteamAPIClient.STATS_HOST: args.api_rate,
+    }, burst=args.burst)
+    steam_client = SteamAPIClient(
+        api_key=args.steam_api_key,
+        rate_limiter=rate_limiter,
+        retry=RetryPolicy(max_attempts=max(1, args.retries)),
+        pool_size=args.workers,
+        region=args.regions[0] if args.regions else 'us',
+    )
+    extra_regions = args.regions[1:] if args.regions else []
+    if extra_regions:
+        print(f"🌍 Prices in {', '.join(args.regions)} ({steam_client.region} is the primary region)")
+    metadata = MetadataCache(work_dir / "metadata_cache.json", ttl=args.metadata_ttl)
+    snapshot_writer = SnapshotWriter(work_dir)
+    changes = ChangeTracker()
+    previous = snapshot_writer.load()
+    if previous:
+        changes.restore(previous)
+    
+    # Output sinks; the snapshot is always written since the dashboard reads it
+    sinks: List[Sink] = [SnapshotSink(snapshot_writer)]
+    history: Optional[TimeSeriesStore] = None
+    if not args.no_history:
+        history = TimeSeriesStore(DATA_DIR / "history")
+        sinks.append(HistorySink(history))
+    if "eventlog" in args.sink:
+        sinks.append(event_log_sink(work_dir / "events", args.topic, args.partitions))
+    if "kafka" in args.sink:
+        sinks.append(kafka_sink(args.kafka_bootstrap, args.topic))
+    if args.alert_rules:
+        # Shards own disjoint games, so they can share one alerts file
+        outputs: List[AlertOutput] = [AlertFile(DATA_DIR / ALERTS_FILENAME)]
+        outputs.extend(WebhookOutput(url) for url in args.alert_webhook)
+        engine = AlertEngine()
+        engine.prime(changes.records.values())
+        sinks.append(AlertSink(engine, outputs, Path(args.alert_rules)))
     
     # Load watchlist
-    app_ids = load_watchlist(args.watchlist)
+    watchlist = load_watchlist(args.watchlist)
     
-    if not app_ids:
-        print("❌ No games in watchlist. Add games to config/games_watchlist.json")
-        return
+    if not watchlist:
+        print("⚠️  No games in watchlist yet. Add games in the Game Manager (picked up while running)")
+    app_ids = shard.select(watchlist) if shard else watchlist
     
     print(f"🎮 Steam Game Monitor")
     print(f"📋 Monitoring {len(app_ids)} games from watchlist")
-    print(f"⏱️  Update interval: {args.interval} seconds")
-    print(f"💾 Saving to: {DATA_DIR}")
+    if shard:
+        print(f"🧩 Shard {shard.name}: {len(app_ids)} of {len(watchlist)} games, {len(shard.members)} shards")
+    print(f"⏱️  Update interval: {args.interval}s per game, adapting within {args.min_interval}-{args.max_interval}s")
+    print(f"💾 Saving to: {work_dir} ({', '.join(sink.name for sink in sinks)})")
     print(f"🎮 Games: {app_ids}\n")
     
+    scheduler = AdaptiveScheduler(
+        initial_interval=args.interval,
+        min_interval=min(args.min_interval, args.interval),
+        max_interval=max(args.max_interval, args.interval),
+        budget_per_minute=args.budget,
+    )
+    scheduler.add_many(app_ids)
+    WATCHED_GAMES.set(len(watchlist))
+    OWNED_GAMES.set(len(app_ids))
+    SHARD_MEMBERS.set(len(shard.members) if shard else 1)
+    current: Dict[int, Dict[str, Any]] = {}
+    carry_records(current, changes.records, app_ids)
+    watcher = WatchlistWatcher(
+        Path(args.watchlist), poll_interval=args.watch_poll,
+        stamp=open_watchlist(Path(args.watchlist)).version if is_store_path(args.watchlist) else None,
+    )
+    print(f"👀 Watching {args.watchlist} for changes ({watcher.mode})")
+    recorder: Optional[ResponseRecorder] = None
+    if args.record is not None:
+        # One recording per process: shards record into their own work directory
+        recorder = ResponseRecorder(Path(args.record) if args.record else work_dir / "recordings")
+        recorder.watchlist(app_ids)
+        print(f"📼 Recording raw responses to {recorder.root}")
+    
+    def publish(fetched: List[Dict[str, Any]]):
+        publish_cycle([current[a] for a in app_ids if a in current], changes, sinks, fetched=fetched)
+        if shard and not args.no_merge:
+            try:
+                merged = merge_snapshots(DATA_DIR, watchlist, stale_after=3 * args.max_interval)
+            except (OSError, ValueError) as e:
+                merged = None
+                print(f"  ⚠️  Could not merge shard snapshots: {e}")
+            if merged:
+                print(f"🔀 Merged snapshot #{merged['seq']} from {merged['shards']} shards")
+    
+    reload_watchlist = False
+    removals_pending = False
     try:
         while True:
-            games_data = []
+            if reload_watchlist:
+                reload_watchlist = False
+                try:
+                    new_watchlist = read_watchlist(args.watchlist)
+                except (OSError, ValueError) as e:
+                    # Possibly caught mid-write; the next change event retries
+                    print(f"  ⚠️  Watchlist not reloaded: {e}")
+                else:
+                    dropped = set(watchlist) - set(new_watchlist)
+                    watchlist = new_watchlist
+                    app_ids = shard.select(watchlist) if shard else watchlist
+                    added, removed = reassign(scheduler, current, app_ids)
+                    carry_records(current, changes.records, added)
+                    for app_id in removed:
+                        metadata.discard(app_id)
+                        if history is not None and app_id in dropped:
+                            history.drop(app_id)
+                    removals_pending = removals_pending or bool(removed)
+                    if recorder is not None and (added or removed):
+                        recorder.watchlist(app_ids)
+                    WATCHLIST_RELOADS.inc()
+                    WATCHED_GAMES.set(len(watchlist))
+                    OWNED_GAMES.set(len(app_ids))
+                    if added or removed:
+                        print(f"📋 Watchlist reloaded: +{len(added)} / -{len(removed)} games, now {len(app_ids)}")
             
-            for app_id in app_ids:
-                print(f"Fetching data for app_id: {app_id}")
-                
-                # Fetch game details
-                details = steam_client.get_app_details(app_id)
-                if not details:
-                    print(f"  ⚠️  Failed to fetch details for {app_id}")
-                    time.sleep(2)
-                    continue
-                
-                # Fetch player count
-                player_count = steam_client.get_player_count(app_id)
-                
-                # Extract and structure data
-                game_data = extract_game_data(app_id, details, player_count)
-                games_data.append(game_data)
+            if shard and shard.refresh():
+                app_ids = shard.select(watchlist)
+                added, removed = reassign(scheduler, current, app_ids)
+                carry_records(current, changes.records, added)
+                for app_id in removed:
+                    metadata.discard(app_id)
+                removals_pending = removals_pending or bool(removed)
+                if recorder is not None and (added or removed):
+                    recorder.watchlist(app_ids)
+                OWNED_GAMES.set(len(app_ids))
+                SHARD_MEMBERS.set(len(shard.members))
+                print(f"🧩 Shard membership changed ({len(shard.members)} shards): "
+                      f"+{len(added)} / -{len(removed)} games, now {len(app_ids)}")
+            
+            batch = scheduler.pop_due(slack=args.batch_window)
+            if batch:
+                cycle_start = time.monotonic()
+                print(f"Fetching data for {len(batch)} of {len(scheduler)} apps ({args.workers} workers)")
+                fetched, failures = fetch_games(
+                    steam_client, batch, workers=args.workers, metadata=metadata, price_chunk=args.price_chunk,
+                    recorder=recorder, regions=extra_regions,
+                )
+                fetch_seconds = time.monotonic() - cycle_start
+                PHASE_SECONDS.labels("fetch").observe(fetch_seconds)
+                print(f"⏱️  Batch fetched in {fetch_seconds:.1f}s")
                 
-                print(f"  ✅ {game_data['name']}")
-                print(f"     Price: ${game_data['final_price']:.2f} (discount: {game_data['discount_percent']}%)")
-                if player_count:
-                    print(f"     Players: {player_count:,}")
+                by_id = {game['app_id']: game for game in fetched}
+                now = time.time()
+                for app_id in batch:
+                    failure = failures.get(app_id)
+                    if failure is not None and failure.status.host_problem:
+                        # Not this game's fault: retry when the host should be back
+                        scheduler.defer(app_id, failure.retry_after or args.min_interval, now)
+                    else:
+                        scheduler.record(app_id, by_id.get(app_id), now)
+                current.update(by_id)
                 
-                # Rate limiting
-                time.sleep(2)
-            
-            # Save all data
-            save_data(games_data)
+                # Save all data; games that failed this time keep their last record
+                publish_start = time.monotonic()
+                publish(fetched)
+                removals_pending = False
+                PHASE_SECONDS.labels("publish").observe(time.monotonic() - publish_start)
+                CYCLE_SECONDS.observe(time.monotonic() - cycle_start)
+                if metrics_file:
+                    try:
+                        metrics.REGISTRY.write_textfile(Path(metrics_file))
+                    except OSError as e:
+                        print(f"  ⚠️  Could not write metrics: {e}")
+            elif removals_pending:
+                # Nothing due, but removed games should leave the dashboard now
+                publish([])
+                removals_pending = False
             
-            print(f"\n⏳ Waiting {args.interval} seconds before next update...\n")
-            time.sleep(args.interval)
+            next_due = scheduler.next_due()
+            wait = args.interval if next_due is None else max(1.0, next_due - time.time())
+            if shard and shard.heartbeat_interval:
+                wait = min(wait, shard.heartbeat_interval)
+            if batch:
+                print(f"\n⏳ Next refresh in {wait:.0f} seconds...\n")
+            reload_watchlist = watcher.wait(wait)
             
     except KeyboardInterrupt:
         print("\n\n🛑 Stopping producer...")
     finally:
+        for sink in sinks:
+            sink.close()
+        if shard:
+            shard.close()
+        if recorder is not None:
+            recorder.close()
+        watcher.close()
         print("✅ Producer closed.")
 
 
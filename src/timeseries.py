@@ -0,0 +1,351 @@
+"""
+Append-only time-series store for player counts and prices
+
+Layout under the history directory:
+
+    <resolution>/<app_id>/<segment>.seg
+
+`raw` segments hold one fixed-width record per producer sample (timestamp,
+current_players, final_price in cents, discount_percent). The `1m`, `1h`
+and `1d` rollups hold one record per bucket with count/min/max/sum per
+metric, maintained incrementally as samples arrive: each open bucket is
+appended when the next sample lands in a later bucket (or on close).
+
+Segments cover a fixed time span per resolution (a day of raw/1m data, a
+month of 1h, a year of 1d), so a range query only opens the segments that
+overlap it and retention is enforced by deleting whole files.
+"""
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# ts, current_players (-1 = unknown), final_price_cents, discount_percent
+RAW_RECORD = struct.Struct('<qiih')
+# ts, samples, player samples, players min/max/sum, price min/max/sum, discount min/max/sum
+ROLLUP_RECORD = struct.Struct('<qIIiiqiiqhhi')
+
+RESOLUTIONS: Dict[str, int] = {'raw': 0, '1m': 60, '1h': 3600, '1d': 86400}
+ROLLUPS = ('1m', '1h', '1d')
+
+# Segment file naming per resolution (strftime pattern on the record's UTC time)
+SEGMENT_FORMAT = {'raw': '%Y%m%d', '1m': '%Y%m%d', '1h': '%Y%m', '1d': '%Y'}
+
+DEFAULT_RETENTION: Dict[str, Optional[int]] = {
+    'raw': 7 * 86400,
+    '1m': 30 * 86400,
+    '1h': 400 * 86400,
+    '1d': None,  # keep forever
+}
+
+RETENTION_CHECK_INTERVAL = 3600
+
+
+def _segment_name(resolution: str, ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime(SEGMENT_FORMAT[resolution]) + '.seg'
+
+
+def _segment_bounds(resolution: str, name: str) -> Tuple[int, int]:
+    """[start, end) epoch seconds covered by a segment file"""
+    stem = name.split('.', 1)[0]
+    if resolution in ('raw', '1m'):
+        start = datetime.strptime(stem, '%Y%m%d').replace(tzinfo=timezone.utc)
+        return int(start.timestamp()), int(start.timestamp()) + 86400
+    if resolution == '1h':
+        start = datetime.strptime(stem, '%Y%m').replace(tzinfo=timezone.utc)
+        nxt = start.replace(year=start.year + (start.month == 12), month=start.month % 12 + 1)
+        return int(start.timestamp()), int(nxt.timestamp())
+    start = datetime.strptime(stem, '%Y').replace(tzinfo=timezone.utc)
+    return int(start.timestamp()), int(start.replace(year=start.year + 1).timestamp())
+
+
+class Bucket:
+    """Running count/min/max/sum for one rollup bucket"""
+
+    __slots__ = ('ts', 'n', 'pn', 'p_min', 'p_max', 'p_sum',
+                 'c_min', 'c_max', 'c_sum', 'd_min', 'd_max', 'd_sum')
+
+    def __init__(self, ts: int):
+        self.ts = ts
+        self.n = self.pn = 0
+        self.p_min = self.p_max = self.p_sum = 0
+        self.c_min = self.c_max = self.c_sum = 0
+        self.d_min = self.d_max = self.d_sum = 0
+
+    def add_sample(self, players: int, price: int, discount: int):
+        if self.n == 0:
+            self.c_min = self.c_max = price
+            self.d_min = self.d_max = discount
+        else:
+            self.c_min, self.c_max = min(self.c_min, price), max(self.c_max, price)
+            self.d_min, self.d_max = min(self.d_min, discount), max(self.d_max, discount)
+        self.n += 1
+        self.c_sum += price
+        self.d_sum += discount
+        if players >= 0:
+            if self.pn == 0:
+                self.p_min = self.p_max = players
+            else:
+                self.p_min, self.p_max = min(self.p_min, players), max(self.p_max, players)
+            self.pn += 1
+            self.p_sum += players
+
+    def merge(self, other: 'Bucket'):
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.c_min, self.c_max, self.d_min, self.d_max = other.c_min, other.c_max, other.d_min, other.d_max
+        else:
+            self.c_min, self.c_max = min(self.c_min, other.c_min), max(self.c_max, other.c_max)
+            self.d_min, self.d_max = min(self.d_min, other.d_min), max(self.d_max, other.d_max)
+        self.n += other.n
+        self.c_sum += other.c_sum
+        self.d_sum += other.d_sum
+        if other.pn:
+            if self.pn == 0:
+                self.p_min, self.p_max = other.p_min, other.p_max
+            else:
+                self.p_min, self.p_max = min(self.p_min, other.p_min), max(self.p_max, other.p_max)
+            self.pn += other.pn
+            self.p_sum += other.p_sum
+
+    def pack(self) -> bytes:
+        return ROLLUP_RECORD.pack(self.ts, self.n, self.pn, self.p_min, self.p_max, self.p_sum,
+                                  self.c_min, self.c_max, self.c_sum, self.d_min, self.d_max, self.d_sum)
+
+    @classmethod
+    def unpack(cls, record: Tuple) -> 'Bucket':
+        bucket = cls(record[0])
+        (_, bucket.n, bucket.pn, bucket.p_min, bucket.p_max, bucket.p_sum,
+         bucket.c_min, bucket.c_max, bucket.c_sum, bucket.d_min, bucket.d_max, bucket.d_sum) = record
+        return bucket
+
+
+def _sample_values(game: Dict[str, Any]) -> Tuple[int, int, int]:
+    players = game.get('current_players')
+    return (
+        -1 if players is None else int(players),
+        int(round((game.get('final_price') or 0) * 100)),
+        int(game.get('discount_percent') or 0),
+    )
+
+
+class TimeSeriesStore:
+    """Per-app columnar history with raw samples and 1m/1h/1d rollups"""
+
+    def __init__(self, root: Path, retention: Optional[Dict[str, Optional[int]]] = None):
+        self.root = Path(root)
+        self.retention = dict(DEFAULT_RETENTION, **(retention or {}))
+        self._open: Dict[Tuple[str, int], Bucket] = {}
+        self._lock = threading.Lock()
+        self._last_retention_check = 0.0
+
+    # --- Writing (producer) ---
+
+    def _append(self, resolution: str, app_id: int, ts: int, data: bytes):
+        path = self.root / resolution / str(app_id) / _segment_name(resolution, ts)
+        try:
+            f = open(path, 'ab')
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            f = open(path, 'ab')
+        with f:
+            f.write(data)
+
+    def append(self, games: Iterable[Dict[str, Any]], ts: Optional[int] = None):
+        """Record one sample per game and advance the rollups"""
+        ts = int(ts if ts is not None else time.time())
+        with self._lock:
+            for game in games:
+                app_id = int(game['app_id'])
+                players, price, discount = _sample_values(game)
+                self._append('raw', app_id, ts, RAW_RECORD.pack(ts, players, price, discount))
+                for resolution in ROLLUPS:
+                    width = RESOLUTIONS[resolution]
+                    bucket_ts = ts - ts % width
+                    key = (resolution, app_id)
+                    bucket = self._open.get(key)
+                    if bucket is not None and bucket.ts != bucket_ts:
+                        self._append(resolution, app_id, bucket.ts, bucket.pack())
+                        bucket = None
+                    if bucket is None:
+                        bucket = self._open[key] = Bucket(bucket_ts)
+                    bucket.add_sample(players, price, discount)
+        if time.time() - self._last_retention_check >= RETENTION_CHECK_INTERVAL:
+            self.enforce_retention()
+
+    def flush(self):
+        """Write all open rollup buckets (partial buckets are merged again on read)"""
+        with self._lock:
+            for (resolution, app_id), bucket in self._open.items():
+                self._append(resolution, app_id, bucket.ts, bucket.pack())
+            self._open.clear()
+
+    def drop(self, app_id: int):
+        """Forget open buckets for an app (its files stay until retention removes them)"""
+        with self._lock:
+            for resolution in ROLLUPS:
+                self._open.pop((resolution, app_id), None)
+
+    def enforce_retention(self, now: Optional[float] = None):
+        """Delete whole segments that end before each resolution's retention window"""
+        now = now or time.time()
+        self._last_retention_check = now
+        for resolution, keep in self.retention.items():
+            if not keep:
+                continue
+            cutoff = now - keep
+            res_dir = self.root / resolution
+            if not res_dir.is_dir():
+                continue
+            for app_dir in res_dir.iterdir():
+                for segment in app_dir.glob('*.seg'):
+                    if _segment_bounds(resolution, segment.name)[1] <= cutoff:
+                        try:
+                            segment.unlink()
+                        except OSError:
+                            pass
+
+    # --- Reading (dashboard) ---
+
+    def _segments(self, resolution: str, app_id: int, start: int, end: int) -> List[Path]:
+        app_dir = self.root / resolution / str(app_id)
+        try:
+            names = sorted(os.listdir(app_dir))
+        except FileNotFoundError:
+            return []
+        segments = []
+        for name in names:
+            if not name.endswith('.seg'):
+                continue
+            seg_start, seg_end = _segment_bounds(resolution, name)
+            if seg_end > start and seg_start < end:
+                segments.append(app_dir / name)
+        return segments
+
+    def _records(self, resolution: str, app_id: int, start: int, end: int) -> Iterator[Tuple]:
+        record = RAW_RECORD if resolution == 'raw' else ROLLUP_RECORD
+        for path in self._segments(resolution, app_id, start, end):
+            with open(path, 'rb') as f:
+                data = f.read()
+            usable = len(data) - len(data) % record.size  # ignore a torn trailing write
+            for values in record.iter_unpack(data[:usable]):
+                if start <= values[0] < end:
+                    yield values
+
+    def app_ids(self, resolution: str = 'raw') -> List[int]:
+        """Apps with stored history at `resolution`, ascending"""
+        try:
+            names = os.listdir(self.root / resolution)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name) for name in names if name.isdigit())
+
+    def records(self, resolution: str, app_id: int, start: int, end: int) -> Iterator[Tuple]:
+        """Stored records of one app in [start, end), oldest first, one segment in memory at a time
+
+        RAW_RECORD fields for `raw`, ROLLUP_RECORD fields for the rollups.
+        """
+        return self._records(resolution, app_id, start, end)
+
+    def _buckets(self, resolution: str, app_id: int, start: int, end: int) -> Iterator[Bucket]:
+        if resolution == 'raw':
+            for ts, players, price, discount in self._records('raw', app_id, start, end):
+                bucket = Bucket(ts)
+                bucket.add_sample(players, price, discount)
+                yield bucket
+        else:
+            for values in self._records(resolution, app_id, start, end):
+                yield Bucket.unpack(values)
+
+    def _last_bucket(self, resolution: str, app_id: int) -> Optional[int]:
+        """Start of the newest bucket written to a rollup, None if nothing was"""
+        app_dir = self.root / resolution / str(app_id)
+        try:
+            names = sorted((name for name in os.listdir(app_dir) if name.endswith('.seg')), reverse=True)
+        except FileNotFoundError:
+            return None
+        for name in names:
+            with open(app_dir / name, 'rb') as f:
+                size = f.seek(0, os.SEEK_END)
+                usable = size - size % ROLLUP_RECORD.size  # ignore a torn trailing write
+                if usable:
+                    f.seek(usable - ROLLUP_RECORD.size)
+                    return ROLLUP_RECORD.unpack(f.read(ROLLUP_RECORD.size))[0]
+        return None
+
+    def pick_resolution(self, start: int, step: int, now: Optional[float] = None) -> str:
+        """Coarsest resolution that divides `step` and is still retained at `start`"""
+        now = now or time.time()
+        best = 'raw'
+        for resolution in ROLLUPS:
+            width = RESOLUTIONS[resolution]
+            keep = self.retention.get(resolution)
+            if step % width == 0 and (not keep or start >= now - keep):
+                best = resolution
+        return best
+
+    def query(self, app_id: int, start: int, end: int, step: int, now: Optional[float] = None) -> Dict[str, Any]:
+        """Downsample [start, end) into `step`-second buckets as parallel columns
+
+        Buckets come from the chosen rollup up to the last one written to it.
+        Later buckets are still open in the producer (a bucket is written when
+        the app's next sample lands in a later one), so those are filled from
+        raw samples, however long ago they ended.
+        """
+        now = int(now or time.time())
+        step = max(1, int(step))
+        resolution = self.pick_resolution(start, step, now)
+        out: Dict[int, Bucket] = {}
+
+        def merge_into(buckets: Iterable[Bucket]):
+            for bucket in buckets:
+                key = bucket.ts - bucket.ts % step
+                target = out.get(key)
+                if target is None:
+                    target = out[key] = Bucket(key)
+                target.merge(bucket)
+
+        if resolution == 'raw':
+            merge_into(self._buckets('raw', app_id, start, end))
+        else:
+            width = RESOLUTIONS[resolution]
+            last = self._last_bucket(resolution, app_id)
+            raw_from = start if last is None else max(start, last + width)
+            # Rollup records are stamped with their bucket start, so widen to include the first one
+            merge_into(self._buckets(resolution, app_id, start - start % width, min(end, raw_from)))
+            if end > raw_from:
+                merge_into(self._buckets('raw', app_id, raw_from, end))
+
+        columns: Dict[str, List] = {
+            't': [], 'samples': [],
+            'players_min': [], 'players_max': [], 'players_avg': [],
+            'price_min': [], 'price_max': [], 'price_avg': [],
+            'discount_min': [], 'discount_max': [], 'discount_avg': [],
+        }
+        for key in sorted(out):
+            b = out[key]
+            columns['t'].append(key)
+            columns['samples'].append(b.n)
+            columns['players_min'].append(b.p_min if b.pn else None)
+            columns['players_max'].append(b.p_max if b.pn else None)
+            columns['players_avg'].append(round(b.p_sum / b.pn, 1) if b.pn else None)
+            columns['price_min'].append(b.c_min / 100)
+            columns['price_max'].append(b.c_max / 100)
+            columns['price_avg'].append(round(b.c_sum / b.n / 100, 2))
+            columns['discount_min'].append(b.d_min)
+            columns['discount_max'].append(b.d_max)
+            columns['discount_avg'].append(round(b.d_sum / b.n, 1))
+
+        return {
+            'app_id': app_id,
+            'from': start,
+            'to': end,
+            'step': step,
+            'resolution': resolution,
+            'points': len(columns['t']),
+            'columns': columns,
+        }
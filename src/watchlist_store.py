@@ -0,0 +1,238 @@
+"""
+Watchlist storage shared by the dashboard and the producer
+
+The watchlist lives in a small SQLite database (config/watchlist.db) instead
+of a JSON file that every request rewrote whole. Each app is one row, so
+adding or removing a game touches one row, and every change runs in a
+`BEGIN IMMEDIATE` transaction: concurrent requests (several dashboard tabs,
+several dashboard processes) are serialized by SQLite rather than racing
+on a read-modify-write and losing updates.
+
+`version` goes up by one with every transaction that changed something.
+Reading it is a single-row query, so the producer and the dashboard's
+event stream can poll it every second or so and only reload on a change.
+
+On first use the old config/games_watchlist.json is imported, if present.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+WATCHLIST_DB_FILENAME = "watchlist.db"
+LEGACY_FILENAME = "games_watchlist.json"
+DEFAULT_DESCRIPTION = "Steam games watchlist"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    app_id INTEGER PRIMARY KEY,
+    name TEXT,
+    added_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class WatchlistError(ValueError):
+    """Malformed watchlist change"""
+
+
+def parse_entry(entry: Any) -> Tuple[int, Optional[str]]:
+    """(app_id, name) from `730`, `"730"` or `{"app_id": 730, "name": "..."}`"""
+    name = None
+    if isinstance(entry, dict):
+        name = entry.get("name")
+        entry = entry.get("app_id")
+    if isinstance(entry, bool):
+        raise WatchlistError(f"Invalid app_id: {entry!r}")
+    try:
+        app_id = int(entry)
+    except (TypeError, ValueError):
+        raise WatchlistError(f"Invalid app_id: {entry!r}") from None
+    if app_id <= 0:
+        raise WatchlistError(f"Invalid app_id: {entry!r}")
+    return app_id, (str(name) if name is not None else None)
+
+
+class WatchlistStore:
+    """SQLite-backed watchlist with a change counter"""
+
+    def __init__(self, path: Path, migrate_from: Optional[Path] = None):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._document: Tuple[int, Optional[Dict[str, Any]]] = (-1, None)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as conn:
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            created = conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0')").rowcount
+        if created and migrate_from is not None:
+            self._import_json(Path(migrate_from))
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; writes open their own BEGIN IMMEDIATE transaction
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._conn())
+
+    def _import_json(self, legacy: Path):
+        try:
+            with open(legacy, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        info = data.get("game_info") or {}
+        entries = [{"app_id": app_id, "name": info.get(str(app_id))} for app_id in data.get("games", [])]
+        try:
+            self.replace(entries, data.get("description"))
+        except WatchlistError as e:
+            print(f"Could not import {legacy}: {e}")
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection) -> int:
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('updated_at', ?)", (str(int(time.time())),))
+        return int(conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+
+    # --- reads ---
+
+    def version(self) -> int:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def app_ids(self) -> List[int]:
+        return [row[0] for row in self._conn().execute("SELECT app_id FROM games ORDER BY app_id")]
+
+    def __contains__(self, app_id: int) -> bool:
+        return self._conn().execute("SELECT 1 FROM games WHERE app_id = ?", (app_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def document(self) -> Dict[str, Any]:
+        """The watchlist in the old games_watchlist.json shape, plus `version` (cached per version)"""
+        version = self.version()
+        cached_version, cached = self._document
+        if cached is not None and cached_version == version:
+            return cached
+        conn = self._conn()
+        # One read transaction so the rows match the version reported
+        conn.execute("BEGIN")
+        try:
+            version = int(conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+            meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+            rows = conn.execute("SELECT app_id, name FROM games ORDER BY app_id").fetchall()
+        finally:
+            conn.execute("COMMIT")
+        document = {
+            "description": meta.get("description", DEFAULT_DESCRIPTION),
+            "games": [app_id for app_id, _ in rows],
+            "game_info": {str(app_id): name for app_id, name in rows if name is not None},
+            "version": version,
+            "updated_at": int(meta.get("updated_at", 0)),
+        }
+        self._document = (version, document)
+        return document
+
+    # --- writes (one transaction each) ---
+
+    def apply(self, add: Iterable[Any] = (), remove: Iterable[Any] = ()) -> Dict[str, Any]:
+        """Add and remove many apps at once; returns the new version and what actually changed
+
+        Adding an app that is already present only updates its name (when one
+        is given); removing one that is absent is a no-op.
+        """
+        additions = [parse_entry(entry) for entry in add]
+        removals = [parse_entry(entry)[0] for entry in remove]
+        added: List[int] = []
+        removed: List[int] = []
+        now = int(time.time())
+        with self._transaction() as conn:
+            before = conn.total_changes
+            for app_id in removals:
+                if conn.execute("DELETE FROM games WHERE app_id = ?", (app_id,)).rowcount:
+                    removed.append(app_id)
+            for app_id, name in additions:
+                if conn.execute("INSERT OR IGNORE INTO games (app_id, name, added_at) VALUES (?, ?, ?)",
+                                (app_id, name, now)).rowcount:
+                    added.append(app_id)
+                elif name is not None:
+                    conn.execute("UPDATE games SET name = ? WHERE app_id = ? AND name IS NOT ?", (name, app_id, name))
+            version = self._bump(conn) if conn.total_changes != before else self.version()
+        return {"version": version, "added": added, "removed": removed}
+
+    def replace(self, entries: Iterable[Any], description: Optional[str] = None) -> Dict[str, Any]:
+        """Make the watchlist exactly `entries` (the old full POST)"""
+        wanted = dict(parse_entry(entry) for entry in entries)
+        now = int(time.time())
+        with self._transaction() as conn:
+            before = conn.total_changes
+            current = {row[0] for row in conn.execute("SELECT app_id FROM games")}
+            removed = sorted(current - wanted.keys())
+            added = [app_id for app_id in wanted if app_id not in current]
+            conn.executemany("DELETE FROM games WHERE app_id = ?", [(app_id,) for app_id in removed])
+            conn.executemany("INSERT INTO games (app_id, name, added_at) VALUES (?, ?, ?)",
+                             [(app_id, wanted[app_id], now) for app_id in added])
+            conn.executemany("UPDATE games SET name = ? WHERE app_id = ? AND name IS NOT ?",
+                             [(name, app_id, name) for app_id, name in wanted.items() if name is not None])
+            if description is not None:
+                conn.execute("INSERT INTO meta (key, value) VALUES ('description', ?) ON CONFLICT (key) "
+                             "DO UPDATE SET value = excluded.value WHERE value IS NOT excluded.value", (description,))
+            changed = conn.total_changes != before
+            version = self._bump(conn) if changed else self.version()
+        return {"version": version, "added": added, "removed": removed}
+
+    def remove(self, app_id: int) -> bool:
+        return bool(self.apply(remove=[app_id])["removed"])
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class _Transaction:
+    """`BEGIN IMMEDIATE` ... COMMIT/ROLLBACK: takes the write lock up front"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+_stores: Dict[Path, WatchlistStore] = {}
+_stores_lock = threading.Lock()
+
+
+def is_store_path(path: Any) -> bool:
+    return Path(path).suffix in (".db", ".sqlite", ".sqlite3")
+
+
+def open_watchlist(path: Path) -> WatchlistStore:
+    """The store at `path` (one per process), importing a games_watchlist.json next to it on first use"""
+    path = Path(path).resolve()
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = WatchlistStore(path, migrate_from=path.with_name(LEGACY_FILENAME))
+        return store
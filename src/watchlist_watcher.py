@@ -0,0 +1,111 @@
+"""
+Notice edits to the watchlist file while the producer runs
+
+On Linux the file's directory is watched with inotify (through libc, no
+extra package); the dashboard may rewrite the file in place or rename a
+new one over it, so directory events are the reliable signal. Elsewhere,
+or if inotify is unavailable, the file's (mtime, size, inode) is polled
+every `poll_interval` seconds. Either way `wait()` doubles as the
+producer's sleep, so an edit wakes it up straight away.
+
+For the SQLite watchlist store the stamp is its change counter instead of
+file attributes; writes touch the database's -wal file in the same
+directory, so inotify still wakes the producer.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+# IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_IN_MASK = 0x002 | 0x008 | 0x080 | 0x100 | 0x200
+
+
+def _inotify_fd(directory: Path) -> Optional[int]:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), _IN_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class WatchlistWatcher:
+    """Sleep-until-timeout-or-watchlist-change"""
+
+    def __init__(self, path: Path, poll_interval: float = 2.0, stamp: Optional[Callable[[], Any]] = None):
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self._stamp_fn = stamp or self._file_stamp
+        self._stamp: Any = None
+        self._stamp = self._read_stamp()
+        self._fd = _inotify_fd(self.path.parent) if self.path.parent.is_dir() else None
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self._fd is not None else "polling"
+
+    def _read_stamp(self) -> Any:
+        try:
+            return self._stamp_fn()
+        except Exception as e:
+            print(f"  ⚠️  Could not check the watchlist: {e}")
+            return self._stamp
+
+    def _file_stamp(self) -> Any:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _changed(self) -> bool:
+        stamp = self._read_stamp()
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        return True
+
+    def _drain(self):
+        try:
+            while os.read(self._fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to `timeout` seconds; True as soon as the watchlist file changes"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return self._changed()
+            if self._fd is not None:
+                readable, _, _ = select.select([self._fd], [], [], remaining)
+                if readable:
+                    # Events for other files in the directory are filtered by the stamp
+                    self._drain()
+                    if self._changed():
+                        return True
+                continue
+            time.sleep(min(self.poll_interval, remaining))
+            if self._changed():
+                return True
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None